@@ -0,0 +1,166 @@
+import argparse
+import csv
+import gzip
+import io
+import itertools
+import json
+import os
+import sys
+import zipfile
+
+from chat_archive import unpack_messages
+from repositories import JSON_COLUMNS, TABLE_COLUMNS, iter_keyset
+
+# Everything a user owns, in export order: (table, column holding their id, keyset pagination key).
+# Rollups and running mood statistics are derived from mood_logs and left out.
+EXPORT_TABLES = (
+    ('profiles', 'id', ('created_at', 'id')),
+    ('chat_sessions', 'user_id', ('created_at', 'id')),
+    ('chat_history', 'user_id', ('timestamp', 'id')),
+    ('mood_logs', 'user_id', ('created_at', 'id')),
+    ('questionnaire_responses', 'user_id', ('created_at', 'id')),
+    ('user_feedback', 'user_id', ('created_at', 'id')),
+)
+
+# Output formats and the extension of the file each writes
+EXPORT_FORMATS = {'jsonl': '.jsonl.gz', 'csv': '.csv.zip'}
+
+PAGE_SIZE = 500
+
+# Archive payloads hold whole sessions, so they are read a few at a time
+ARCHIVE_PAGE_SIZE = 20
+
+# Rows encoded before each write to the compressor
+CHUNK_ROWS = 500
+
+
+def account_rows(repository, user_id, page_size=PAGE_SIZE):
+    """
+    (table, row) for every row the user owns, table by table in EXPORT_TABLES
+    order, read one keyset page at a time. Messages of archived sessions are
+    unpacked from chat_archives and exported with chat_history.
+    """
+    for table, owner, key in EXPORT_TABLES:
+        columns = ', '.join(TABLE_COLUMNS[table])
+        for row in iter_keyset(repository, table, columns, filters={owner: user_id}, key=key, page_size=page_size):
+            yield table, row
+        if table == 'chat_history':
+            for archive in iter_keyset(repository, 'chat_archives', 'session_id, payload, archived_at',
+                                       filters={'user_id': user_id}, key=('archived_at', 'session_id'),
+                                       page_size=ARCHIVE_PAGE_SIZE):
+                for row in unpack_messages(archive['payload']):
+                    yield table, row
+
+
+def write_jsonl(rows, out):
+    """
+    Gzipped JSON lines, one {"table": ..., "row": {...}} object per row, on the
+    binary file object `out`. Returns the number of rows per table.
+    """
+    counts = {}
+    with gzip.GzipFile(fileobj=out, mode='wb', compresslevel=6) as compressed:
+        chunk = []
+        for table, row in rows:
+            chunk.append(json.dumps({'table': table, 'row': row}, ensure_ascii=False, default=str))
+            counts[table] = counts.get(table, 0) + 1
+            if len(chunk) >= CHUNK_ROWS:
+                compressed.write(('\n'.join(chunk) + '\n').encode('utf-8'))
+                chunk.clear()
+        if chunk:
+            compressed.write(('\n'.join(chunk) + '\n').encode('utf-8'))
+    return counts
+
+
+def write_csv(rows, out):
+    """
+    A ZIP with one CSV per table, columns as in TABLE_COLUMNS and JSON columns
+    as JSON text, on the binary file object `out`. Each CSV is compressed as
+    it is written, so `out` can be a pipe. Returns the number of rows per table.
+    """
+    counts = {}
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for table, group in itertools.groupby(rows, key=lambda item: item[0]):
+            with archive.open(f"{table}.csv", 'w', force_zip64=True) as raw, \
+                    io.TextIOWrapper(raw, encoding='utf-8', newline='') as text:
+                writer = csv.writer(text)
+                writer.writerow(TABLE_COLUMNS[table])
+                count = 0
+                for chunk in _chunks(group):
+                    writer.writerows([_csv_value(column, row.get(column)) for column in TABLE_COLUMNS[table]]
+                                     for _, row in chunk)
+                    count += len(chunk)
+                counts[table] = count
+    return counts
+
+
+def _chunks(iterable, size=CHUNK_ROWS):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _csv_value(column, value):
+    if value is None:
+        return ''
+    if column in JSON_COLUMNS and not isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def export_account(repository, user_id, out, format='jsonl', page_size=PAGE_SIZE):
+    """Write everything the user owns to `out` in the given EXPORT_FORMATS format. Returns rows per table."""
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {format}")
+    write = write_jsonl if format == 'jsonl' else write_csv
+    return write(account_rows(repository, user_id, page_size), out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export users' data as compressed JSON lines or CSV")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--user', help="export this user's data")
+    target.add_argument('--all', action='store_true', help="export every user, one file each, into --output-dir")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='jsonl')
+    parser.add_argument('--output', help="file for --user (default: standard output)")
+    parser.add_argument('--output-dir', default='.', help="directory for --all")
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    from repositories import SQLiteRepository, SupabaseRepository
+    load_dotenv()
+    if os.getenv("ANIMOA_STORAGE", "supabase") == "sqlite":
+        repository = SQLiteRepository(os.getenv("ANIMOA_SQLITE_PATH", "animoa.db"))
+    else:
+        from supabase import create_client
+        # The service role key lets the export read every user's rows
+        repository = SupabaseRepository(create_client(os.getenv("SUPABASE_URL"),
+                                                      os.getenv("SUPABASE_SERVICE_KEY")))
+
+    if args.user:
+        if args.output:
+            with open(args.output, 'wb') as out:
+                counts = export_account(repository, args.user, out, args.format, args.page_size)
+        else:
+            counts = export_account(repository, args.user, sys.stdout.buffer, args.format, args.page_size)
+        print(f"[export] user={args.user} " + " ".join(f"{t}={n}" for t, n in counts.items()), file=sys.stderr)
+        return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    users = 0
+    for profile in iter_keyset(repository, 'profiles', 'id, created_at', page_size=args.page_size):
+        path = os.path.join(args.output_dir, f"{profile['id']}{EXPORT_FORMATS[args.format]}")
+        # Written under a temporary name, so an interrupted run leaves no partial export behind
+        with open(path + '.tmp', 'wb') as out:
+            counts = export_account(repository, profile['id'], out, args.format, args.page_size)
+        os.replace(path + '.tmp', path)
+        users += 1
+        print(f"[export] user={profile['id']} rows={sum(counts.values())}", file=sys.stderr)
+    print(f"[export] users={users} dir={args.output_dir}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
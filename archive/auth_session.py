@@ -0,0 +1,111 @@
+import base64
+import json
+import threading
+import time
+
+from gotrue.errors import AuthRetryableError
+
+
+def token_expiry(access_token):
+    """Read the exp claim (unix seconds) from a JWT without verifying it, or None"""
+    try:
+        payload = access_token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except Exception:
+        return None
+
+
+class SessionManager:
+    """
+    Keeps one browser session's Supabase auth valid without a network call per rerun.
+
+    While the access token is valid it is applied to the client locally. Within
+    `refresh_margin` seconds of expiry a refresh starts on a background thread
+    and the current token keeps being used. Only an already expired token makes
+    the render wait for a refresh.
+    """
+
+    def __init__(self, access_token, refresh_token, refresh_margin=120, max_retries=3):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.expires_at = token_expiry(access_token)
+        self.refresh_margin = refresh_margin
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._refreshing = False
+        # Client and token last applied; the client itself, not id(), since a new client can reuse an address
+        self._applied_client = None
+        self._applied_token = None
+        self.error = None
+        # Milliseconds spent on auth in the last ensure() call and in recent refreshes
+        self.last_latency_ms = 0.0
+        self.refresh_latencies_ms = []
+
+    def seconds_left(self):
+        if self.expires_at is None:
+            return 0
+        return self.expires_at - time.time()
+
+    def ensure(self, client):
+        """Make sure the client sends a valid token; blocks only if the token has expired"""
+        started = time.perf_counter()
+        remaining = self.seconds_left()
+        if remaining <= 0:
+            self._refresh(client)
+        elif remaining <= self.refresh_margin:
+            self._refresh_in_background(client)
+        self._apply(client)
+        self.last_latency_ms = (time.perf_counter() - started) * 1000
+
+    def _apply(self, client):
+        """Point the client's database requests at the current token (local, no network)"""
+        with self._lock:
+            token = self.access_token
+            if self._applied_client is client and self._applied_token == token:
+                return
+            self._applied_client = client
+            self._applied_token = token
+        client.postgrest.auth(token)
+
+    def _refresh(self, client):
+        started = time.perf_counter()
+        for attempt in range(self.max_retries):
+            try:
+                response = client.auth.refresh_session(self.refresh_token)
+                break
+            except AuthRetryableError:
+                # Short backoff: 0.2s, 0.4s, ...
+                time.sleep(0.2 * (attempt + 1))
+        else:
+            raise AuthRetryableError("Could not refresh the session", 0)
+        with self._lock:
+            self.access_token = response.session.access_token
+            self.refresh_token = response.session.refresh_token
+            self.expires_at = token_expiry(self.access_token)
+            self.refresh_latencies_ms = (self.refresh_latencies_ms + [(time.perf_counter() - started) * 1000])[-20:]
+
+    def _refresh_in_background(self, client):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._refresh(client)
+                self._apply(client)
+                self.error = None
+            except Exception as e:
+                # The next rerun retries, blocking only once the token has expired
+                self.error = e
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="animoa-auth-refresh", daemon=True).start()
+
+    def summary(self):
+        recent = self.refresh_latencies_ms
+        refresh = f"{recent[-1]:.0f}ms" if recent else "-"
+        return f"auth_ms={self.last_latency_ms:.1f} last_refresh={refresh} expires_in={self.seconds_left():.0f}s"
@@ -0,0 +1,172 @@
+import concurrent.futures
+import datetime
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from collections import namedtuple
+
+from chat_archive import unpack_messages
+from repositories import iter_keyset
+
+# Reports rendered at once per worker; bounds the PDFs held in memory while the ZIP is written
+JOBS_PER_WORKER = 2
+
+# One file in the export: `render` is a module-level function (so it can be sent to a
+# worker process) called with `args`, returning bytes or a BytesIO; or `data` is ready
+ExportJob = namedtuple('ExportJob', 'name render args data', defaults=((), None))
+
+_pool = None
+_pool_workers = None
+_pool_lock = threading.Lock()
+
+
+def export_pool(workers=None):
+    """
+    (pool, workers): worker processes shared by every export in this process,
+    started on first use. Spawned rather than forked, since the app process
+    runs threads.
+    """
+    global _pool, _pool_workers
+    workers = workers or os.cpu_count() or 1
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=_warm_worker)
+            _pool_workers = workers
+        return _pool, workers
+
+
+def _reset_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+
+def _warm_worker():
+    # Import reportlab and build the report template before the first job arrives
+    import wellness_pdf
+    wellness_pdf.get_template()
+
+
+def _run(render, args):
+    result = render(*args)
+    return result.getvalue() if hasattr(result, 'getvalue') else result
+
+
+def write_zip(jobs, out, total=None, workers=None, progress=None):
+    """
+    Render `jobs` (ExportJob, any iterable, consumed lazily) and write each
+    result into a ZIP on the file object `out` as soon as it is ready, in
+    completion order. At most JOBS_PER_WORKER reports per worker are in flight,
+    so memory does not grow with the number of files.
+
+    Rendering runs in the shared process pool (one worker per core by
+    default), or in this process when there is only one worker to use.
+    `progress(done, total, name)` is called after each file. Returns the
+    number of files written.
+    """
+    done = 0
+    names = set()
+
+    def add(archive, name, data):
+        nonlocal done
+        # Two reports from the same second would otherwise share a name
+        stem, extension = os.path.splitext(name)
+        copy = 1
+        while name in names:
+            copy += 1
+            name = f"{stem}_{copy}{extension}"
+        names.add(name)
+        # PDFs are compressed inside already
+        compression = zipfile.ZIP_STORED if name.endswith('.pdf') else zipfile.ZIP_DEFLATED
+        info = zipfile.ZipInfo(name, datetime.datetime.now().timetuple()[:6])
+        archive.writestr(info, data, compress_type=compression)
+        done += 1
+        if progress:
+            progress(done, total, name)
+
+    workers = workers if workers is not None else os.cpu_count() or 1
+    with zipfile.ZipFile(out, 'w') as archive:
+        if workers <= 1:
+            for job in jobs:
+                add(archive, job.name, job.data if job.data is not None else _run(job.render, job.args))
+            return done
+
+        pool, workers = export_pool(workers)
+        window = workers * JOBS_PER_WORKER
+        pending = {}
+        jobs = iter(jobs)
+        try:
+            while True:
+                for job in jobs:
+                    if job.data is not None:
+                        add(archive, job.name, job.data)
+                        continue
+                    pending[pool.submit(_run, job.render, job.args)] = job.name
+                    if len(pending) >= window:
+                        break
+                if not pending:
+                    return done
+                finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    add(archive, pending.pop(future), future.result())
+        except concurrent.futures.process.BrokenProcessPool:
+            # A worker died; start a fresh pool for the next export
+            _reset_pool(pool)
+            raise
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _file_name(text, fallback):
+    name = re.sub(r'[^\w\- ]+', '', text or '').strip().replace(' ', '_')[:60]
+    return name or fallback
+
+
+def account_export_jobs(repository, user_id):
+    """
+    (total, jobs) for a user's bulk export: one PDF per assessment, a mood
+    journal PDF and one transcript PDF per chat session. Rows are read as the
+    jobs are consumed, a session's messages only when its transcript is next.
+    Archived sessions are read from their compressed archive, not restored.
+    """
+    from wellness_pdf import create_wellness_pdf, mood_journal_pdf, transcript_pdf
+
+    filters = {'user_id': user_id}
+    total = (repository.count('questionnaire_responses', filters=filters)
+             + repository.count('chat_sessions', filters=filters) + 1)
+
+    def jobs():
+        for row in iter_keyset(repository, 'questionnaire_responses', 'id, responses, recommendations, created_at',
+                               filters=filters):
+            if not row.get('responses'):
+                continue
+            taken = str(row['created_at'])[:19].replace(':', '-').replace('T', '_')
+            recommendations = row.get('recommendations') or "No recommendations were generated for this assessment."
+            yield ExportJob(f"assessments/Wellness_Assessment_{taken}.pdf", create_wellness_pdf,
+                            (row['responses'], recommendations))
+
+        logs = list(iter_keyset(repository, 'mood_logs', 'id, date, mood, note', filters=filters, key=('date', 'id')))
+        yield ExportJob("mood/Mood_Journal.pdf", mood_journal_pdf, (logs,))
+
+        for session in iter_keyset(repository, 'chat_sessions', 'id, title, created_at, archived_at',
+                                   filters=filters):
+            if session.get('archived_at'):
+                rows = repository.select('chat_archives', 'payload', filters={'session_id': session['id']})
+                messages = unpack_messages(rows[0]['payload']) if rows else []
+            else:
+                messages = list(iter_keyset(repository, 'chat_history', 'id, message, sender, timestamp',
+                                            filters={'session_id': session['id']}, in_={'sender': ['user', 'bot']},
+                                            key=('timestamp', 'id')))
+            messages = [m for m in messages if m.get('sender') in ('user', 'bot')]
+            started = str(session['created_at'])[:10]
+            name = f"chats/{started}_{_file_name(session.get('title'), 'Chat')}_{str(session['id'])[:8]}.pdf"
+            yield ExportJob(name, transcript_pdf, (session.get('title'), session['created_at'], messages))
+
+    return total, jobs()
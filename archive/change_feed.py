@@ -0,0 +1,244 @@
+import asyncio
+import json
+import threading
+import time
+import weakref
+
+# Tables whose row changes invalidate cached reads
+WATCHED_TABLES = ('profiles', 'chat_sessions', 'chat_history', 'mood_logs', 'questionnaire_responses')
+
+# Channel used by the LISTEN/NOTIFY trigger in migrations/006_change_feed.sql
+NOTIFY_CHANNEL = 'animoa_changes'
+
+
+def invalidations(event):
+    """(table, filters) pairs of cached reads made stale by one row-change event"""
+    table = event.get('table')
+    record = event.get('record') or event.get('old_record') or {}
+    user_id = record.get('user_id')
+    if table == 'profiles':
+        return [('profiles', {'id': record.get('id')})]
+    if table == 'chat_history':
+        if record.get('session_id') is not None:
+            return [('chat_history', {'session_id': record['session_id']})]
+        return [('chat_history', {'user_id': user_id})]
+    if table == 'mood_logs':
+        return [('mood_logs', {'user_id': user_id}), ('mood_rollups', {'user_id': user_id}),
+                ('mood_stats', {'user_id': user_id})]
+    if table == 'questionnaire_responses':
+        return [('questionnaire_responses', {'user_id': user_id}),
+                ('questionnaire_responses', {'id': record.get('id')})]
+    # chat_sessions is not read through the cache; sessions watch versions() instead
+    return []
+
+
+class ChangeFeedHub:
+    """
+    Fans row-change events out to the read caches of every open session of a user.
+
+    Each browser tab registers its QueryCache; an event for the user drops the
+    matching entries in all of them, so tabs stay consistent without polling.
+    Per-table version counters let sessions notice changes to data they keep
+    outside the cache, such as the chat session list.
+    """
+
+    def __init__(self):
+        self._caches = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.stats = {"events": 0, "invalidations": 0}
+
+    def register(self, user_id, cache):
+        with self._lock:
+            self._caches.setdefault(user_id, weakref.WeakSet()).add(cache)
+
+    def version(self, user_id, table):
+        with self._lock:
+            return self._versions.get((user_id, table), 0)
+
+    def publish(self, user_id, event):
+        with self._lock:
+            caches = list(self._caches.get(user_id, ()))
+            key = (user_id, event.get('table'))
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self.stats["events"] += 1
+        for table, filters in invalidations(event):
+            filters = {name: value for name, value in filters.items() if value is not None}
+            for cache in caches:
+                cache.invalidate(table, **filters)
+                self.stats["invalidations"] += 1
+
+
+class SupabaseRealtimeFeed:
+    """
+    Subscribes to Supabase Realtime row changes for each signed-in user.
+
+    The realtime client is asyncio based, so it runs on its own event loop in a
+    daemon thread; subscribe() is safe to call from Streamlit reruns. Row level
+    security applies to the events, so each user gets their own connection
+    authorised with their token. is_live() is per user: a user whose channel is
+    not (or no longer) subscribed keeps the normal cache TTLs.
+
+    Only inserts and updates are subscribed to: Realtime cannot filter DELETE
+    events by user, so every user's channel would receive every delete. The app
+    publishes its own deletes to the hub instead (publish_delete in the app),
+    which reaches the user's tabs in this process; a delete made elsewhere ages
+    out with the cache TTL.
+    """
+
+    def __init__(self, url, key, hub):
+        self.url = url.rstrip('/').replace('https://', 'wss://').replace('http://', 'ws://') + '/realtime/v1'
+        self.key = key
+        self.hub = hub
+        self._loop = asyncio.new_event_loop()
+        # Clients are only touched on the event loop; tokens, live users and errors are
+        # also read and written from Streamlit threads, under the lock
+        self._clients = {}
+        self._tokens = {}
+        self._live = set()
+        self._lock = threading.Lock()
+        self.errors = {}
+        threading.Thread(target=self._loop.run_forever, name="animoa-realtime", daemon=True).start()
+
+    def is_live(self, user_id):
+        """Whether this user's change events are currently being received"""
+        with self._lock:
+            return user_id in self._live
+
+    def subscribe(self, user_id, access_token):
+        """Start (or re-authorise) the user's change subscription; returns immediately"""
+        with self._lock:
+            if self._tokens.get(user_id) == access_token:
+                return
+            self._tokens[user_id] = access_token
+        asyncio.run_coroutine_threadsafe(self._subscribe(user_id, access_token), self._loop)
+
+    def unsubscribe(self, user_id):
+        """Close the user's channel and client, e.g. on logout; other open tabs subscribe again on their next rerun"""
+        with self._lock:
+            self._tokens.pop(user_id, None)
+            self._live.discard(user_id)
+        asyncio.run_coroutine_threadsafe(self._unsubscribe(user_id), self._loop)
+
+    def _failed(self, user_id, error):
+        """Back to normal TTLs for the user until a later subscribe() succeeds"""
+        with self._lock:
+            self._tokens.pop(user_id, None)
+            self._live.discard(user_id)
+            if error is not None:
+                self.errors[user_id] = error
+
+    async def _unsubscribe(self, user_id):
+        client = self._clients.pop(user_id, None)
+        if client is None:
+            return
+        try:
+            await client.remove_all_channels()
+            await client.close()
+        except Exception as e:
+            with self._lock:
+                self.errors[user_id] = e
+
+    async def _subscribe(self, user_id, access_token):
+        try:
+            if user_id in self._clients:
+                await self._clients[user_id].set_auth(access_token)
+                return
+
+            from realtime import AsyncRealtimeClient
+            client = AsyncRealtimeClient(self.url, self.key)
+            await client.connect()
+            await client.set_auth(access_token)
+
+            def on_change(payload, user_id=user_id):
+                data = payload.get('data', payload)
+                self.hub.publish(user_id, {'table': data.get('table'), 'type': data.get('type'),
+                                           'record': data.get('record'), 'old_record': data.get('old_record')})
+
+            def on_status(status, error=None, user_id=user_id):
+                if getattr(status, 'value', status) == 'SUBSCRIBED':
+                    with self._lock:
+                        self._live.add(user_id)
+                        self.errors.pop(user_id, None)
+                else:
+                    # Channel error, timeout or close
+                    self._failed(user_id, error)
+                    self._loop.create_task(self._unsubscribe(user_id))
+
+            channel = client.channel(f"animoa-changes-{user_id}")
+            for table in WATCHED_TABLES:
+                column = 'id' if table == 'profiles' else 'user_id'
+                for event in ("INSERT", "UPDATE"):
+                    channel.on_postgres_changes(event, schema="public", table=table,
+                                                filter=f"{column}=eq.{user_id}", callback=on_change)
+            self._clients[user_id] = client
+            await channel.subscribe(on_status)
+        except Exception as e:
+            self._clients.pop(user_id, None)
+            self._failed(user_id, e)
+
+
+class PostgresNotifyFeed:
+    """
+    LISTEN/NOTIFY stand-in for Realtime when running against a local Postgres.
+
+    One connection listens on NOTIFY_CHANNEL and publishes events for the users
+    that have subscribed in this process. A lost connection is reopened after a
+    delay that doubles up to max_retry_delay; notifications sent while it was
+    down are missed, so reads keep their normal TTLs until it is back. Needs
+    psycopg (v3).
+    """
+
+    def __init__(self, dsn, hub, retry_delay=1, max_retry_delay=60):
+        self.dsn = dsn
+        self.hub = hub
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._users = set()
+        self._lock = threading.Lock()
+        self.connected = False
+        self.error = None
+        threading.Thread(target=self._run, name="animoa-notify", daemon=True).start()
+
+    def is_live(self, user_id):
+        with self._lock:
+            return self.connected and user_id in self._users
+
+    def subscribe(self, user_id, access_token=None):
+        with self._lock:
+            self._users.add(user_id)
+
+    def unsubscribe(self, user_id):
+        with self._lock:
+            self._users.discard(user_id)
+
+    def _run(self):
+        delay = self.retry_delay
+        while True:
+            if self._listen():
+                delay = self.retry_delay
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def _listen(self):
+        """Listen until the connection fails; True if it was established first"""
+        import psycopg
+        listened = False
+        try:
+            with psycopg.connect(self.dsn, autocommit=True) as conn:
+                conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                self.connected = listened = True
+                self.error = None
+                for notify in conn.notifies():
+                    event = json.loads(notify.payload)
+                    record = event.get('record') or event.get('old_record') or {}
+                    user_id = record.get('id') if event.get('table') == 'profiles' else record.get('user_id')
+                    with self._lock:
+                        subscribed = user_id in self._users
+                    if subscribed:
+                        self.hub.publish(user_id, event)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.connected = False
+        return listened
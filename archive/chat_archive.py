@@ -0,0 +1,110 @@
+import argparse
+import base64
+import datetime
+import gzip
+import json
+import os
+import sys
+
+from repositories import iter_keyset
+
+# Sessions with no new message for this many days move to cold storage
+ARCHIVE_AFTER_DAYS = 90
+
+
+def pack_messages(rows):
+    """Compress chat_history rows into the text payload stored in chat_archives"""
+    jsonl = "\n".join(json.dumps(row, ensure_ascii=False, sort_keys=True) for row in rows)
+    return base64.b64encode(gzip.compress(jsonl.encode('utf-8'), compresslevel=9)).decode('ascii')
+
+
+def unpack_messages(payload):
+    jsonl = gzip.decompress(base64.b64decode(payload)).decode('utf-8')
+    return [json.loads(line) for line in jsonl.splitlines() if line]
+
+
+def archive_session(repository, session_id):
+    """
+    Move one session's messages into its archive blob. Returns the number of
+    messages archived, 0 if the session is empty or received a new message
+    while it was being read.
+    """
+    # Paged, since PostgREST caps a single read at 1000 rows and the last message must be the real last one
+    rows = list(iter_keyset(repository, 'chat_history', filters={'session_id': session_id},
+                            key=('timestamp', 'id')))
+    if not rows:
+        return 0
+    return repository.rpc('archive_chat_session', {
+        'p_session_id': session_id,
+        'p_payload': pack_messages(rows),
+        'p_message_count': len(rows),
+        'p_last_message_at': rows[-1]['timestamp'],
+    }) or 0
+
+
+def archive_inactive_sessions(repository, inactive_days=ARCHIVE_AFTER_DAYS, batch_size=100, user_id=None):
+    """
+    Archive every session whose last message is older than `inactive_days`,
+    optionally for one user only. Returns counts for logging.
+    """
+    cutoff = (datetime.datetime.now() - datetime.timedelta(days=inactive_days)).isoformat()
+    filters = {'archived_at': None}
+    if user_id is not None:
+        filters['user_id'] = user_id
+    stats = {'sessions': 0, 'messages': 0, 'skipped': 0}
+    skipped = set()
+    while True:
+        sessions = [session for session in repository.select(
+                        'chat_sessions', 'id, user_id', filters=filters, lt={'last_message_at': cutoff},
+                        order=[('last_message_at', False), ('id', False)], limit=batch_size + len(skipped))
+                    if session['id'] not in skipped]
+        if not sessions:
+            break
+        for session in sessions:
+            # Server-side functions act for the session's owner
+            try:
+                archived = archive_session(repository.for_user(session['user_id']), session['id'])
+            except Exception as e:
+                # One session must not stop the batch; it is tried again on the next run
+                print(f"[archive] session={session['id']} failed: {e}", file=sys.stderr)
+                archived = 0
+            if archived:
+                stats['sessions'] += 1
+                stats['messages'] += archived
+            else:
+                stats['skipped'] += 1
+                skipped.add(session['id'])
+    return stats
+
+
+def hydrate_session(repository, session_id):
+    """Restore an archived session's messages into chat_history. Returns the number restored."""
+    rows = repository.select('chat_archives', 'payload', filters={'session_id': session_id})
+    messages = unpack_messages(rows[0]['payload']) if rows else []
+    return repository.rpc('restore_chat_session', {'p_session_id': session_id, 'p_rows': messages}) or 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move inactive chat sessions to compressed cold storage")
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS,
+                        help="archive sessions without messages for this many days")
+    parser.add_argument('--user', help="only archive this user's sessions")
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    from repositories import SQLiteRepository, SupabaseRepository
+    load_dotenv()
+    if os.getenv("ANIMOA_STORAGE", "supabase") == "sqlite":
+        repository = SQLiteRepository(os.getenv("ANIMOA_SQLITE_PATH", "animoa.db"))
+    else:
+        from supabase import create_client
+        # The service role key lets the job read every user's sessions
+        repository = SupabaseRepository(create_client(os.getenv("SUPABASE_URL"),
+                                                      os.getenv("SUPABASE_SERVICE_KEY")))
+    stats = archive_inactive_sessions(repository, args.days, args.batch_size, args.user)
+    print(f"[archive] sessions={stats['sessions']} messages={stats['messages']} skipped={stats['skipped']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+from supabase import ClientOptions, create_client
+
+
+class SupabaseClientPool:
+    """
+    Bounded pool of Supabase clients, one per browser session.
+
+    Each session gets its own client so auth state (set_session, refresh,
+    sign_out) never leaks between users. All clients share one keep-alive
+    HTTP connection pool. When the pool is full, the least recently used
+    client is dropped; its session gets a fresh client and re-authenticates
+    from the tokens it keeps in session state.
+    """
+
+    def __init__(self, url, key, max_clients=100, max_connections=50):
+        self.url = url
+        self.key = key
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self.http = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections,
+                                keepalive_expiry=60),
+            timeout=30,
+        )
+        self.stats = {"created": 0, "evicted": 0}
+
+    def _create(self):
+        try:
+            options = ClientOptions(httpx_client=self.http)
+        except TypeError:
+            # Older supabase-py releases manage their own HTTP clients
+            options = ClientOptions()
+        return create_client(self.url, self.key, options=options)
+
+    def acquire(self, session_key):
+        """Return this session's client, creating it on first use. Second value is True if new."""
+        with self._lock:
+            if session_key in self._clients:
+                client, _ = self._clients.pop(session_key)
+                self._clients[session_key] = (client, time.monotonic())
+                return client, False
+            while len(self._clients) >= self.max_clients:
+                self._clients.popitem(last=False)
+                self.stats["evicted"] += 1
+            client = self._create()
+            self._clients[session_key] = (client, time.monotonic())
+            self.stats["created"] += 1
+            return client, True
+
+    def release(self, session_key):
+        """Forget a session's client, e.g. after logout"""
+        with self._lock:
+            self._clients.pop(session_key, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._clients)
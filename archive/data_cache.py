@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueryCache:
+    """Read-through cache for table reads, keyed by table and filters.
+
+    One instance lives in each user's Streamlit session. Entries expire after
+    their TTL and are dropped early when the app writes to a matching table.
+    Past max_entries, a store drops the expired entries and then the least
+    recently used ones, so paging through history cannot grow it without bound.
+    """
+
+    def __init__(self, default_ttl=60, max_entries=256):
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "invalidations": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(table, columns="*", filters=None, extra=None):
+        """Build a hashable key from a table read description."""
+        filter_items = tuple(sorted((filters or {}).items()))
+        return (table, columns, filter_items, extra)
+
+    def get_or_load(self, table, loader, columns="*", filters=None, extra=None, ttl=None):
+        """Return cached rows for this read, calling loader() on a miss or expiry."""
+        key = self.make_key(table, columns, filters, extra)
+        found, value = self.lookup(key)
+        if found:
+            return value
+        value = loader()
+        self.store(key, value, ttl)
+        return value
+
+    def lookup(self, key):
+        """Return (True, value) for a fresh entry, else (False, None), counting the hit or miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at, entry_ttl = entry
+                if now - stored_at < entry_ttl:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return True, value
+                del self._entries[key]
+                self.stats["stale"] += 1
+            self.stats["misses"] += 1
+        return False, None
+
+    def store(self, key, value, ttl=None):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (value, now, self.default_ttl if ttl is None else ttl)
+            self._entries.move_to_end(key)
+            if len(self._entries) <= self.max_entries:
+                return
+            expired = [k for k, (_, stored_at, entry_ttl) in self._entries.items() if now - stored_at >= entry_ttl]
+            for k in expired:
+                del self._entries[k]
+            self.stats["evictions"] += len(expired)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self, table, **filters):
+        """Drop entries for a table whose filters do not contradict the given ones.
+
+        invalidate('mood_logs', user_id=uid) drops every cached mood_logs read
+        for that user, whatever else it filtered on.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                entry_table, _, entry_filters, _ = key
+                if entry_table != table:
+                    continue
+                entry_filters = dict(entry_filters)
+                if all(entry_filters.get(name, value) == value for name, value in filters.items()):
+                    del self._entries[key]
+                    self.stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def summary(self):
+        """One-line description of cache effectiveness for logs."""
+        with self._lock:
+            stats = dict(self.stats)
+            size = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = (stats["hits"] / lookups * 100) if lookups else 0.0
+        return (f"entries={size} hits={stats['hits']} misses={stats['misses']} "
+                f"stale={stats['stale']} invalidations={stats['invalidations']} evictions={stats['evictions']} "
+                f"hit_rate={hit_rate:.0f}%")
+
+
+class ResultCache:
+    """
+    LRU cache of results derived from versioned data, shared by all sessions
+    (built chart specs, mood correlations).
+
+    Keys include the data version of the source series, so a new or edited log
+    produces a new key instead of needing invalidation; old keys age out.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "builds": 0}
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._results[key]
+        result = build()
+        with self._lock:
+            self._results[key] = result
+            self.stats["builds"] += 1
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return result
+
+
+class RoundTripCounter:
+    """Counts requests sent to the database, e.g. during one rerun."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def record(self):
+        with self._lock:
+            self.count += 1
+
+
+# Shared by all sessions; reads are I/O bound so a few threads go a long way
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor(max_workers=8):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="animoa-read")
+        return _executor
+
+
+class RequestLoader:
+    """
+    Collects the reads a page needs, then loads them together.
+
+    Reads with the same key are sent once, reads already cached are not sent,
+    and the remaining ones run in parallel. Loaders run on worker threads, so
+    they must not touch Streamlit session state.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._pending = {}
+        self._results = {}
+
+    def add(self, table, loader, columns="*", filters=None, extra=None, ttl=None):
+        """Register a read and return its key for get()."""
+        key = self.cache.make_key(table, columns, filters, extra)
+        if key not in self._pending and key not in self._results:
+            self._pending[key] = (loader, ttl)
+        return key
+
+    def load(self):
+        """Serve pending reads from the cache and fetch the rest concurrently."""
+        misses = {}
+        for key, (loader, ttl) in self._pending.items():
+            found, value = self.cache.lookup(key)
+            if found:
+                self._results[key] = value
+            else:
+                misses[key] = (loader, ttl)
+        self._pending = {}
+
+        if len(misses) == 1:
+            # Nothing to overlap with, skip the thread hop
+            results = {key: loader() for key, (loader, _) in misses.items()}
+        else:
+            futures = {key: get_executor().submit(loader) for key, (loader, _) in misses.items()}
+            results = {key: future.result() for key, future in futures.items()}
+        for key, value in results.items():
+            self._results[key] = value
+            self.cache.store(key, value, misses[key][1])
+
+    def get(self, key):
+        if key in self._pending:
+            self.load()
+        return self._results[key]
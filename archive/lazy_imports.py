@@ -0,0 +1,70 @@
+import importlib
+import threading
+import time
+
+# Seconds the first import of each lazily loaded module took, read by startup_profile.py
+IMPORT_TIMES = {}
+
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """
+    Stands in for a module until one of its attributes is first used, then
+    imports it. Lets main_app_v7 name heavy subsystems (numpy, pandas, groq,
+    the chart and analytics modules) at the top without paying for them on
+    pages that never use them.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            with _lock:
+                if self._module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self._name)
+                    IMPORT_TIMES.setdefault(self._name, time.perf_counter() - started)
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+class LazyAttribute:
+    """A function or class of a lazy module, importing the module when called or used"""
+
+    def __init__(self, module, name):
+        self._module = module
+        self._name = name
+
+    def __call__(self, *args, **kwargs):
+        return getattr(self._module, self._name)(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(getattr(self._module, self._name), name)
+
+    def __repr__(self):
+        return f"<lazy {self._module._name}.{self._name}>"
+
+
+def lazy_import(name):
+    """A module imported on first use, e.g. np = lazy_import('numpy')"""
+    return LazyModule(name)
+
+
+def lazy_from(name, *attributes):
+    """
+    Functions or classes of a module imported on first use, the lazy form of
+    `from name import a, b`. Constants must be imported where they are used.
+    """
+    module = LazyModule(name)
+    proxies = tuple(LazyAttribute(module, attribute) for attribute in attributes)
+    return proxies[0] if len(proxies) == 1 else proxies
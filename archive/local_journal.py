@@ -0,0 +1,315 @@
+import contextlib
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+# How each journaled table is written remotely: the conflict target makes replays idempotent.
+# Tables sync in this order, so a session created offline is stored before its messages.
+SYNC_CONFLICT_TARGETS = {
+    'chat_sessions': 'id',
+    'mood_logs': 'user_id,date',
+    'chat_history': 'client_id',
+    'mood_stats': 'user_id',
+}
+
+# Tables whose rows are replaced wholesale by a sync: the row records when it
+# was edited, and a pending edit older than the stored row's is dropped
+SYNC_VERSION_COLUMNS = {
+    'mood_logs': 'updated_at',
+    'mood_stats': 'updated_at',
+}
+
+# SQLSTATE classes of errors the database will raise again for the same row:
+# data exceptions, constraint violations, and access or schema errors
+REJECTED_SQLSTATE_CLASSES = ('22', '23', '42')
+
+
+def is_rejection(error):
+    """True if the database refused the row itself, so retrying it can never succeed"""
+    if isinstance(error, (ValueError, sqlite3.IntegrityError)):
+        return True
+    code = getattr(error, 'code', None)
+    return isinstance(code, str) and code[:2] in REJECTED_SQLSTATE_CLASSES
+
+
+def _instant(value):
+    """An aware datetime from an ISO timestamp; naive values are local time"""
+    moment = datetime.datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return moment if moment.tzinfo else moment.astimezone()
+
+
+class LocalJournal:
+    """
+    Append-only local journal of user writes, one JSONL file per user.
+
+    record() appends the write and returns at once; a SyncEngine later pushes
+    it to the database and appends an acknowledgement. Entries without an
+    acknowledgement are pending and are merged into reads so the UI always
+    shows what the user entered, even while the database is unreachable.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, user_id):
+        with self._locks_lock:
+            return self._locks.setdefault(user_id, threading.Lock())
+
+    def _path(self, user_id, suffix='.jsonl'):
+        # User ids are UUIDs, but never let one escape the journal directory
+        safe_id = "".join(c for c in str(user_id) if c.isalnum() or c == '-')
+        return os.path.join(self.directory, f"{safe_id}{suffix}")
+
+    def _append(self, user_id, entries, suffix='.jsonl'):
+        with open(self._path(user_id, suffix), 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _read(self, user_id, suffix='.jsonl'):
+        path = self._path(user_id, suffix)
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn last line from a crash mid-write; the write never returned
+                    continue
+        return entries
+
+    def record(self, table, row):
+        """Journal a write and return the stored row, which carries its idempotency key"""
+        if table not in SYNC_CONFLICT_TARGETS:
+            raise ValueError(f"Table {table} is not journaled")
+        op_id = str(uuid.uuid4())
+        if SYNC_CONFLICT_TARGETS[table] == 'id':
+            # Rows created with a client-side id are their own idempotency key
+            row = dict(row, id=row.get('id', op_id))
+        else:
+            row = dict(row, client_id=row.get('client_id', op_id))
+        entry = {'op': op_id, 'table': table, 'row': row,
+                 'recorded_at': datetime.datetime.now(datetime.timezone.utc).isoformat()}
+        with self._lock(row['user_id']):
+            self._append(row['user_id'], [entry])
+        return row
+
+    def pending(self, user_id, table=None):
+        """Entries not yet acknowledged by the database, oldest first"""
+        with self._lock(user_id):
+            entries = self._read(user_id)
+        acked = {entry['ack'] for entry in entries if 'ack' in entry}
+        return [entry for entry in entries
+                if 'op' in entry and entry['op'] not in acked
+                and (table is None or entry['table'] == table)]
+
+    def pending_rows(self, user_id, table, **filters):
+        """Rows of pending writes to a table matching the equality filters"""
+        return [entry['row'] for entry in self.pending(user_id, table)
+                if all(entry['row'].get(name) == value for name, value in filters.items())]
+
+    def acknowledge(self, user_id, op_ids):
+        """Mark writes as stored remotely, compacting the file once nothing is pending"""
+        with self._lock(user_id):
+            self._append(user_id, [{'ack': op_id} for op_id in op_ids])
+            entries = self._read(user_id)
+            acked = {entry['ack'] for entry in entries if 'ack' in entry}
+            if all(entry['op'] in acked for entry in entries if 'op' in entry):
+                os.remove(self._path(user_id))
+
+    def discard(self, user_id, table=None, **filters):
+        """Drop pending writes that must not be synced, e.g. to a deleted chat session"""
+        ops = [entry['op'] for entry in self.pending(user_id, table)
+               if all(entry['row'].get(name) == value for name, value in filters.items())]
+        if ops:
+            self.acknowledge(user_id, ops)
+
+    def has_pending(self, user_id):
+        """Cheap check for unsynced writes: the file only exists while some are pending"""
+        return os.path.exists(self._path(user_id))
+
+    def reject(self, user_id, entry, error):
+        """
+        Keep a write the database refused in the user's dead-letter file, to be
+        shown to the user; acknowledging it then stops it blocking later writes
+        """
+        with self._lock(user_id):
+            self._append(user_id, [dict(entry, error=str(error),
+                                        rejected_at=datetime.datetime.now(datetime.timezone.utc).isoformat())],
+                         suffix='.rejected.jsonl')
+
+    def rejected(self, user_id):
+        """Writes the database refused, oldest first"""
+        with self._lock(user_id):
+            return self._read(user_id, suffix='.rejected.jsonl')
+
+    def clear_rejected(self, user_id):
+        with self._lock(user_id):
+            try:
+                os.remove(self._path(user_id, '.rejected.jsonl'))
+            except FileNotFoundError:
+                pass
+
+
+class SyncEngine:
+    """
+    Pushes pending journal entries to a repository in batches.
+
+    Writes are upserts on an idempotency target, so replaying an entry after
+    a crash or timeout never duplicates it. Mood logs follow the one-mood-per-day
+    rule: of several pending entries for the same day only the latest is sent,
+    and it replaces what the database holds for that day unless that was edited
+    later, e.g. on another device.
+
+    A batch the database refuses is retried row by row. Rows refused for good
+    (is_rejection) go to the journal's dead-letter file; any other failure, such
+    as a lost connection, ends the sync with the remaining entries pending.
+    """
+
+    def __init__(self, journal, batch_size=50):
+        self.journal = journal
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._running = set()
+        # Per user: number of successful syncs, so sessions know when to drop cached reads
+        self.generations = {}
+        self.errors = {}
+
+    @staticmethod
+    def _resolve(table, entries):
+        """
+        Collapse entries that target the same row into (latest entry, ops it settles):
+        the superseded entries are settled once the latest one is.
+        """
+        groups = {}
+        for entry in entries:
+            key = tuple(entry['row'][column] for column in SYNC_CONFLICT_TARGETS[table].split(','))
+            groups.setdefault(key, []).append(entry)
+        return [(group[-1], [entry['op'] for entry in group]) for group in groups.values()]
+
+    @staticmethod
+    def _outdated(repository, table, user_id, winners):
+        """Entries whose row the database holds in a version edited after them"""
+        column = SYNC_VERSION_COLUMNS.get(table)
+        if column is None:
+            return set()
+        if table == 'mood_logs':
+            stored = repository.select(table, f'date, {column}', filters={'user_id': user_id},
+                                       in_={'date': sorted({entry['row']['date'] for entry, _ in winners})})
+            versions = {str(row['date'])[:10]: row[column] for row in stored}
+            key = lambda entry: str(entry['row']['date'])[:10]
+        else:
+            stored = repository.select(table, column, filters={'user_id': user_id})
+            versions = {user_id: stored[0][column]} if stored else {}
+            key = lambda entry: user_id
+        return {entry['op'] for entry, _ in winners
+                if versions.get(key(entry)) and _instant(versions[key(entry)]) > _instant(entry['recorded_at'])}
+
+    @staticmethod
+    def _row(table, entry):
+        column = SYNC_VERSION_COLUMNS.get(table)
+        if column is None or entry['row'].get(column):
+            return entry['row']
+        return dict(entry['row'], **{column: entry['recorded_at']})
+
+    def _push(self, repository, user_id, table, on_conflict, batch):
+        """Upsert a batch of (entry, ops it settles), row by row if the batch is refused. Returns ops settled."""
+        try:
+            repository.upsert(table, [self._row(table, entry) for entry, _ in batch], on_conflict)
+            refused = []
+        except Exception as e:
+            if not is_rejection(e):
+                raise
+            refused = [(batch[0][0], e)] if len(batch) == 1 else self._push_rows(repository, table, on_conflict, batch)
+        for entry, error in refused:
+            self.journal.reject(user_id, entry, error)
+        # A refused entry takes the entries it superseded with it
+        ops = [op for _, ops in batch for op in ops]
+        self.journal.acknowledge(user_id, ops)
+        return len(ops)
+
+    def _push_rows(self, repository, table, on_conflict, batch):
+        """Upsert entries one at a time, returning the (entry, error) pairs the database refused"""
+        refused = []
+        for entry, _ in batch:
+            try:
+                repository.upsert(table, [self._row(table, entry)], on_conflict)
+            except Exception as e:
+                if not is_rejection(e):
+                    raise
+                refused.append((entry, e))
+        return refused
+
+    def sync(self, repository, user_id, wait=False):
+        """
+        Push everything pending for a user. Returns the number of entries acknowledged.
+        If a sync for the user is already running, returns 0 at once, or with `wait`
+        lets it finish first and then syncs whatever is still pending.
+        """
+        with self._lock:
+            while user_id in self._running:
+                if not wait:
+                    return 0
+                self._idle.wait()
+            self._running.add(user_id)
+        synced = 0
+        try:
+            for table, on_conflict in SYNC_CONFLICT_TARGETS.items():
+                winners = self._resolve(table, self.journal.pending(user_id, table))
+                for start in range(0, len(winners), self.batch_size):
+                    batch = winners[start:start + self.batch_size]
+                    # Edits already overtaken in the database are settled without being sent
+                    outdated = self._outdated(repository, table, user_id, batch)
+                    if outdated:
+                        ops = [op for entry, ops in batch if entry['op'] in outdated for op in ops]
+                        self.journal.acknowledge(user_id, ops)
+                        synced += len(ops)
+                        batch = [item for item in batch if item[0]['op'] not in outdated]
+                    if batch:
+                        synced += self._push(repository, user_id, table, on_conflict, batch)
+            self.errors.pop(user_id, None)
+        except Exception as e:
+            # Entries stay pending and are retried on the next sync
+            self.errors[user_id] = e
+        finally:
+            with self._lock:
+                self._running.discard(user_id)
+                if synced:
+                    self.generations[user_id] = self.generations.get(user_id, 0) + 1
+                self._idle.notify_all()
+        return synced
+
+    @contextlib.contextmanager
+    def paused(self, user_id):
+        """
+        Wait for the user's running sync and keep new ones from starting inside
+        the block, e.g. while their data is deleted: a sync that had already
+        read the journal would otherwise store its rows again afterwards.
+        """
+        with self._lock:
+            while user_id in self._running:
+                self._idle.wait()
+            self._running.add(user_id)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._running.discard(user_id)
+                self._idle.notify_all()
+
+    def sync_in_background(self, repository, user_id):
+        threading.Thread(target=self.sync, args=(repository, user_id),
+                         name="animoa-journal-sync", daemon=True).start()
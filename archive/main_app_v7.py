@@ -92,19 +92,54 @@ st.markdown("""
 
 # Rest of your imports and code follow
 
-from groq import Groq
-from supabase import create_client, Client
 from dotenv import load_dotenv
 import datetime
+import logging
 import os
+import tempfile
 import time
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from io import BytesIO
+import uuid
 from gotrue.errors import AuthRetryableError
-import pandas as pd
-
 
+from auth_session import SessionManager
+from chat_archive import hydrate_session
+from data_cache import QueryCache, RequestLoader, ResultCache, RoundTripCounter
+from lazy_imports import lazy_from, lazy_import
+from local_journal import LocalJournal, SyncEngine
+from pdf_cache import PDF_TEMPLATE_VERSION, PdfCache, report_key
+from search_index import SEARCH_PAGE_SIZE, snippet
+
+# ANIMOA_LOG_LEVEL=DEBUG also logs each rerun's database round-trips and cache stats
+logger = logging.getLogger("animoa")
+logger.setLevel(os.getenv("ANIMOA_LOG_LEVEL", "WARNING").upper())
+if not logger.handlers:
+    # The script runs again on every rerun, the logger and its handler stay
+    logger.addHandler(logging.StreamHandler())
+
+# Heavy subsystems load on first use, so pages that never need them never pay for them
+groq = lazy_import('groq')
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# The mood page's numpy and altair based modules
+MoodSeries, day_number, mood_lookup = lazy_from('mood_analytics', 'MoodSeries', 'day_number', 'mood_lookup')
+calendar_html, series_years, year_heatmap_svg = lazy_from('mood_calendar', 'calendar_html', 'series_years',
+                                                          'year_heatmap_svg')
+trend_spec = lazy_from('mood_charts', 'trend_spec')
+DailyTimeline, describe, lagged_correlations, notable_correlations = lazy_from(
+    'mood_correlations', 'DailyTimeline', 'describe', 'lagged_correlations', 'notable_correlations')
+MoodSignals, signals_for_series = lazy_from('mood_signals', 'MoodSignals', 'signals_for_series')
+# Report template (reportlab styles, table style, logo) is built once, on the first download
+create_wellness_pdf = lazy_from('wellness_pdf', 'create_wellness_pdf')
+
+# Storage, change feed and export subsystems, loaded by the first page that uses them
+SupabaseClientPool = lazy_from('client_pool', 'SupabaseClientPool')
+CountingRepository, SQLiteRepository, SupabaseRepository = lazy_from(
+    'repositories', 'CountingRepository', 'SQLiteRepository', 'SupabaseRepository')
+ChangeFeedHub, PostgresNotifyFeed, SupabaseRealtimeFeed, invalidations = lazy_from(
+    'change_feed', 'ChangeFeedHub', 'PostgresNotifyFeed', 'SupabaseRealtimeFeed', 'invalidations')
+export_account = lazy_from('account_export', 'export_account')
+account_export_jobs, write_zip = lazy_from('bulk_export', 'account_export_jobs', 'write_zip')
 from translations import load_translations
 # Dictionary for UI translations - English, Spanish, and Mandarin Chinese
 TRANSLATIONS = load_translations()
@@ -127,13 +162,377 @@ def get_api_key(key_name):
         st.error(f"Missing API key: {key_name}")
         st.stop()
 
-# Initialize API keys
+# Initialize API keys; the Groq key is read when the first model call needs it
 supabase_url = get_api_key("SUPABASE_URL")
 supabase_key = get_api_key("SUPABASE_KEY")
-groq_api_key = get_api_key("GROQ_API_KEY")
 
-# Initialize Supabase client
-supabase: Client = create_client(supabase_url, supabase_key)
+@st.cache_resource
+def get_groq_client():
+    """One Groq client shared by all sessions, created on first use"""
+    return groq.Groq(api_key=get_api_key("GROQ_API_KEY"))
+
+# ============================================================================
+# SUPABASE CLIENTS - One auth-scoped client per browser session
+# ============================================================================
+
+@st.cache_resource
+def get_client_pool():
+    """Supabase clients for every session in this process, sharing HTTP connections"""
+    return SupabaseClientPool(supabase_url, supabase_key)
+
+def get_supabase():
+    """Get the current session's own Supabase client"""
+    if "client_key" not in st.session_state:
+        st.session_state.client_key = str(uuid.uuid4())
+    client, _ = get_client_pool().acquire(st.session_state.client_key)
+    return client
+
+def release_supabase():
+    """Return the current session's client to the pool, e.g. on logout"""
+    if "client_key" in st.session_state:
+        get_client_pool().release(st.session_state.client_key)
+
+# ============================================================================
+# STORAGE - All table reads and writes go through a repository
+# ============================================================================
+
+# "supabase" (default) or "sqlite" to keep app data in a local file
+STORAGE_BACKEND = os.getenv("ANIMOA_STORAGE", "supabase")
+SQLITE_PATH = os.getenv("ANIMOA_SQLITE_PATH", "animoa.db")
+
+@st.cache_resource
+def get_sqlite_repository():
+    """One embedded database shared by all sessions in this process"""
+    return SQLiteRepository(SQLITE_PATH)
+
+def get_repository():
+    """Get the storage repository for the current user"""
+    if STORAGE_BACKEND == "sqlite":
+        repository = get_sqlite_repository()
+    else:
+        repository = SupabaseRepository(get_supabase())
+    if "user" in st.session_state:
+        repository = repository.for_user(st.session_state.user.id)
+    return CountingRepository(repository, get_round_trip_counter())
+
+def get_round_trip_counter():
+    """Counter of database requests made during the current rerun"""
+    if "round_trips" not in st.session_state:
+        st.session_state.round_trips = RoundTripCounter()
+    return st.session_state.round_trips
+
+# ============================================================================
+# READ CACHE - Avoid re-querying Supabase on every Streamlit rerun
+# ============================================================================
+
+# Seconds before a cached read is considered stale, per table
+CACHE_TTLS = {
+    'profiles': 300,
+    'chat_history': 120,
+    'mood_logs': 120,
+    'mood_rollups': 120,
+    'mood_stats': 120,
+    'questionnaire_responses': 120,
+}
+
+# While the user's change subscription is live, their cached reads are invalidated on
+# every row change, so the TTL only guards against missed events
+LIVE_CACHE_TTL = 900
+
+def cache_ttl(table):
+    """Seconds a read of this table stays cached"""
+    feed = get_change_feed()
+    if feed is not None and "user" in st.session_state and feed.is_live(st.session_state.user.id):
+        return LIVE_CACHE_TTL
+    return CACHE_TTLS.get(table)
+
+def get_query_cache():
+    """Get the read cache for the current user's session"""
+    if "query_cache" not in st.session_state:
+        st.session_state.query_cache = QueryCache()
+    return st.session_state.query_cache
+
+def select_request(table, columns='*', filters=None, gte=None, order=None, desc=False, limit=None, offset=0,
+                   lt=None):
+    """Describe a cached table read. Filters are equality matches, gte are lower bounds, lt upper bounds."""
+    filters = filters or {}
+    gte = gte or {}
+    lt = lt or {}
+    # Resolve the repository now, the read may run on a worker thread without session state
+    repository = get_repository()
+
+    def load():
+        return repository.select(table, columns, filters=filters, gte=gte, lt=lt,
+                                 order=[(order, desc)] if order else None,
+                                 limit=limit, offset=offset)
+
+    extra = (tuple(sorted(gte.items())), order, desc, limit, offset) + ((tuple(sorted(lt.items())),) if lt else ())
+    return dict(table=table, loader=load, columns=columns, filters=filters,
+                extra=extra, ttl=cache_ttl(table))
+
+def cached_select(table, columns='*', filters=None, gte=None, order=None, desc=False, limit=None, offset=0):
+    """Select rows through the session cache"""
+    return get_query_cache().get_or_load(**select_request(table, columns, filters, gte, order, desc, limit, offset))
+
+def load_together(*requests):
+    """
+    Load several independent reads as one batch: duplicates are sent once,
+    cached reads are not sent, and the rest run in parallel.
+    """
+    loader = RequestLoader(get_query_cache())
+    keys = [loader.add(**request) for request in requests]
+    loader.load()
+    return [loader.get(key) for key in keys]
+
+def invalidate_cache(table, **filters):
+    """Drop cached reads made stale by a write to this table"""
+    get_query_cache().invalidate(table, **filters)
+
+def get_profile(user_id):
+    """Get the user's profile row (or None) through the cache"""
+    rows = cached_select('profiles', filters={'id': user_id})
+    return rows[0] if rows else None
+
+# ============================================================================
+# CHANGE FEED - Row changes invalidate cached reads in every open tab
+# ============================================================================
+
+# "supabase" for Supabase Realtime, "postgres" for LISTEN/NOTIFY on a local database, or "off"
+CHANGE_FEED = os.getenv("ANIMOA_CHANGE_FEED", "supabase" if STORAGE_BACKEND == "supabase" else "off")
+
+@st.cache_resource
+def get_change_feed_hub():
+    return ChangeFeedHub()
+
+@st.cache_resource
+def get_change_feed():
+    """One change subscription per process, shared by all sessions"""
+    if CHANGE_FEED == "supabase":
+        return SupabaseRealtimeFeed(supabase_url, supabase_key, get_change_feed_hub())
+    if CHANGE_FEED == "postgres":
+        return PostgresNotifyFeed(os.getenv("ANIMOA_DATABASE_URL"), get_change_feed_hub())
+    return None
+
+def watch_changes():
+    """Subscribe this session's cache to the user's row changes"""
+    feed = get_change_feed()
+    if feed is None:
+        return
+    user_id = st.session_state.user.id
+    hub = get_change_feed_hub()
+    hub.register(user_id, get_query_cache())
+    feed.subscribe(user_id, st.session_state.get("access_token"))
+
+    # The session list lives in session state, reload it when sessions change elsewhere
+    version = hub.version(user_id, 'chat_sessions')
+    if st.session_state.get("chat_sessions_version", version) != version:
+        st.session_state.chat_sessions_loaded_for = None
+    st.session_state.chat_sessions_version = version
+
+def unwatch_changes():
+    """Close the user's change subscription, e.g. on logout"""
+    feed = get_change_feed()
+    if feed is not None and "user" in st.session_state:
+        feed.unsubscribe(st.session_state.user.id)
+
+def publish_delete(user_id, table, record):
+    """
+    Drop cached reads of a row the user deleted, in this session and the user's
+    other open tabs. The change feed carries no deletes (see SupabaseRealtimeFeed).
+    """
+    event = {'table': table, 'type': 'DELETE', 'old_record': record}
+    for stale_table, filters in invalidations(event):
+        invalidate_cache(stale_table, **{name: value for name, value in filters.items() if value is not None})
+    get_change_feed_hub().publish(user_id, event)
+
+# ============================================================================
+# LOCAL JOURNAL - Mood logs and chat messages are saved locally, then synced
+# ============================================================================
+
+JOURNAL_DIR = os.getenv("ANIMOA_JOURNAL_DIR", ".animoa_journal")
+
+@st.cache_resource
+def get_local_journal():
+    """Journal of unsynced writes shared by all sessions in this process"""
+    return LocalJournal(JOURNAL_DIR)
+
+@st.cache_resource
+def get_sync_engine():
+    return SyncEngine(get_local_journal())
+
+def journal_write(table, row):
+    """Record a write locally and start syncing it without waiting for the database"""
+    row = get_local_journal().record(table, row)
+    invalidate_cache(table, user_id=row['user_id'])
+    sync_journal()
+    return row
+
+def sync_journal():
+    """Push the current user's pending writes on a background thread"""
+    user_id = st.session_state.user.id
+    if get_local_journal().has_pending(user_id):
+        # Resolve the repository here, the sync thread has no session state
+        get_sync_engine().sync_in_background(get_repository(), user_id)
+
+def refresh_after_sync():
+    """Drop cached reads once a background sync has stored the user's pending writes"""
+    user_id = st.session_state.user.id
+    generation = get_sync_engine().generations.get(user_id, 0)
+    if st.session_state.get("sync_generation", 0) != generation:
+        st.session_state.sync_generation = generation
+        for table in ('mood_logs', 'mood_rollups', 'mood_stats', 'chat_history'):
+            invalidate_cache(table)
+
+def show_rejected_writes():
+    """Tell the user about saved entries the database refused, which will not be retried"""
+    user_id = st.session_state.user.id
+    rejected = get_local_journal().rejected(user_id)
+    if not rejected:
+        return
+    st.warning(f"{len(rejected)} saved change(s) could not be stored and were set aside.")
+    with st.expander("Show changes that were not saved"):
+        for entry in rejected:
+            row = entry['row']
+            text = row.get('message') or row.get('note') or row.get('title') or row.get('mood') or ''
+            st.caption(f"{entry['table']} · {str(entry['recorded_at'])[:16].replace('T', ' ')} · "
+                       f"{text[:120]} ({entry['error']})")
+        if st.button("Dismiss", key="dismiss_rejected_writes"):
+            get_local_journal().clear_rejected(user_id)
+            st.rerun()
+
+# ============================================================================
+# SEARCH - Mood notes and past conversations, through the indexed search function
+# ============================================================================
+
+SEARCH_SCOPES = {"All": None, "Mood notes": ['mood'], "Chats": ['chat']}
+
+def search_section():
+    """Sidebar search over the user's mood notes and chat messages, one page at a time"""
+    user_id = st.session_state.user.id
+    with st.sidebar.expander("🔎 Search notes and chats", expanded=bool(st.session_state.get("search_query"))):
+        query = st.text_input("Search", key="search_query", placeholder="e.g. sleep, exams, 工作",
+                              label_visibility="collapsed").strip()
+        scope = st.radio("Search in", list(SEARCH_SCOPES), horizontal=True, key="search_scope",
+                         label_visibility="collapsed")
+        if not query:
+            return
+
+        # A new query or scope starts again from the first page
+        if st.session_state.get("search_for") != (query, scope):
+            st.session_state.search_for = (query, scope)
+            st.session_state.search_page = 0
+        page = st.session_state.search_page
+
+        # Results stay in session state until the query, page or synced data change
+        language = st.session_state.get("language", 'en')
+        key = (query, scope, page, language, get_sync_engine().generations.get(user_id, 0))
+        if st.session_state.get("search_results", (None,))[0] != key:
+            try:
+                found = get_repository().rpc('search_user_content', {
+                    'p_query': query, 'p_language': language, 'p_kinds': SEARCH_SCOPES[scope],
+                    'p_limit': SEARCH_PAGE_SIZE, 'p_offset': page * SEARCH_PAGE_SIZE
+                })
+            except Exception as e:
+                st.warning(f"Search is unavailable right now: {str(e)}")
+                return
+            st.session_state.search_results = (key, found)
+        found = st.session_state.search_results[1]
+
+        # Archived conversations are stored compressed and only searched once reopened
+        archived = found.get('archived_sessions') or 0
+        if archived:
+            st.caption(f"{archived} archived conversation{'s' if archived != 1 else ''} not searched; "
+                       "open one from the chat list to include it.")
+        if not found['total']:
+            st.caption("No matches.")
+            return
+        first = page * SEARCH_PAGE_SIZE
+        st.caption(f"{first + 1}-{first + len(found['results'])} of {found['total']} matches")
+        for result in found['results']:
+            when = datetime.date.fromisoformat(str(result['date'])[:10]).strftime('%b %d, %Y')
+            icon = "😊" if result['kind'] == 'mood' else "💬"
+            st.markdown(f"<small>{icon} {when}</small><br>{snippet(result['content'], query)}",
+                        unsafe_allow_html=True)
+            if result['kind'] == 'chat' and result.get('session_id'):
+                if st.button("Open chat", key=f"search_open_{result['id']}"):
+                    st.session_state.open_session_id = result['session_id']
+                    st.session_state.menu = "Chat"
+                    st.rerun()
+
+        previous_col, next_col = st.columns(2)
+        with previous_col:
+            if page > 0 and st.button("← Newer", key="search_newer", use_container_width=True):
+                st.session_state.search_page = page - 1
+                st.rerun()
+        with next_col:
+            if first + SEARCH_PAGE_SIZE < found['total'] and st.button("Older →", key="search_older",
+                                                                      use_container_width=True):
+                st.session_state.search_page = page + 1
+                st.rerun()
+
+# Prepared bulk exports wait here until downloaded; ones older than this are removed
+EXPORT_DIR = os.getenv("ANIMOA_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "animoa_exports"))
+EXPORT_KEEP_SECONDS = 3600
+
+def new_export_file(suffix):
+    """(fd, path) of a new owner-only file in EXPORT_DIR, removing expired exports first"""
+    os.makedirs(EXPORT_DIR, mode=0o700, exist_ok=True)
+    for entry in os.scandir(EXPORT_DIR):
+        try:
+            if entry.stat().st_mtime < time.time() - EXPORT_KEEP_SECONDS:
+                os.remove(entry.path)
+        except OSError:
+            pass  # Removed by another session meanwhile
+    return tempfile.mkstemp(dir=EXPORT_DIR, suffix=suffix)
+
+def discard_export_file(path):
+    """on_click of an export's download button: the bytes went out with the page, the file is not needed"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def export_section():
+    """Sidebar bulk export: every assessment, the mood journal and all chats as PDFs in one ZIP"""
+    user_id = st.session_state.user.id
+    with st.sidebar.expander("📦 Export my data"):
+        st.caption("All your assessments, your mood journal and every chat as PDF files in one ZIP.")
+        if st.button("Prepare export", key="prepare_bulk_export", use_container_width=True):
+            previous = st.session_state.pop("bulk_export_path", None)
+            if previous and os.path.exists(previous):
+                os.remove(previous)
+
+            progress_bar = st.progress(0.0, text="Gathering your data...")
+
+            def progress(done, total, name):
+                progress_bar.progress(min(done / max(total, 1), 1.0), text=f"{done} of {total}: {os.path.basename(name)}")
+
+            # Reports render in worker processes and go straight into the ZIP on disk
+            fd, path = new_export_file('.zip')
+            try:
+                with os.fdopen(fd, 'wb') as out:
+                    # Entries still in the local journal belong in the export too
+                    get_sync_engine().sync(get_repository(), user_id, wait=True)
+                    if get_local_journal().has_pending(user_id):
+                        st.warning("Some of your latest entries are not saved to the server yet and are "
+                                   "not in this export.")
+                    total, jobs = account_export_jobs(get_repository(), user_id)
+                    write_zip(jobs, out, total=total, progress=progress)
+                st.session_state.bulk_export_path = path
+            except Exception as e:
+                os.remove(path)
+                st.warning(f"Could not prepare your export: {str(e)}")
+            progress_bar.empty()
+
+        path = st.session_state.get("bulk_export_path")
+        if path and os.path.exists(path):
+            # download_button reads the whole file into Streamlit's in-memory media store, so
+            # the file on disk keeps memory flat while the export is built, not while it is served
+            with open(path, 'rb') as f:
+                st.download_button("⬇️ Download ZIP", data=f, key="download_bulk_export",
+                                   file_name=f"Animoa_Export_{datetime.date.today().isoformat()}.zip",
+                                   mime="application/zip", use_container_width=True,
+                                   on_click=discard_export_file, args=(path,))
 
 # Function to log in or sign up
 def auth_ui(supabase):
@@ -165,9 +564,10 @@ def auth_ui(supabase):
             # If logged in, save preference
             if "user" in st.session_state:
                 try:
-                    supabase.table('profiles').update({
+                    get_repository().update('profiles', {
                         'preferred_language': selected_lang
-                    }).eq('id', st.session_state.user.id).execute()
+                    }, {'id': st.session_state.user.id})
+                    invalidate_cache('profiles', id=st.session_state.user.id)
                 except:
                     pass
             st.rerun()
@@ -232,18 +632,18 @@ def auth_ui(supabase):
                         st.session_state.logged_in = True
                         st.session_state.access_token = result.session.access_token
                         st.session_state.refresh_token = result.session.refresh_token
+                        st.session_state.auth_session = SessionManager(result.session.access_token,
+                                                                       result.session.refresh_token)
                         
                         # Get user's preferred language
                         try:
-                            response = supabase.table('profiles').select('preferred_language').eq('id', result.user.id).execute()
-                            if response.data and len(response.data) > 0 and response.data[0]['preferred_language']:
-                                st.session_state.language = response.data[0]['preferred_language']
+                            profile = get_profile(result.user.id)
+                            if profile and profile.get('preferred_language'):
+                                st.session_state.language = profile['preferred_language']
                         except:
                             pass
                             
                         st.success("Login successful!")
-                        # Enable RLS for this user
-                        supabase.auth.set_session(result.session.access_token, result.session.refresh_token)
                         st.rerun()
                 except Exception as e:
                     st.error(f"Authentication error: {str(e)}")
@@ -296,14 +696,13 @@ def ensure_profile_exists(user_id, email):
     """Make sure a profile exists for the user"""
     try:
         # Check if profile exists
-        response = supabase.table('profiles').select('*').eq('id', user_id).execute()
-        
-        if not response.data:
+        if get_profile(user_id) is None:
             # Create a new profile if it doesn't exist
-            supabase.table('profiles').insert({
+            get_repository().insert('profiles', {
                 'id': user_id,
                 'email': email
-            }).execute()
+            })
+            invalidate_cache('profiles', id=user_id)
             
     except Exception as e:
         st.sidebar.warning(f"Profile setup issue: {str(e)}")
@@ -324,11 +723,10 @@ def profile_manager(supabase):
     ensure_profile_exists(user_id, email)
     
     try:
-        response = supabase.table('profiles').select('*').eq('id', user_id).execute()
-        profile_data = response.data
+        profile = get_profile(user_id)
         
-        if profile_data and len(profile_data) > 0:
-            existing_data = profile_data[0]
+        if profile:
+            existing_data = profile
         else:
             existing_data = {'full_name': '', 'age': None, 'goals': '', 'stress_level': '', 'interests': '', 'preferred_language': 'en'}
             
@@ -406,14 +804,15 @@ def profile_manager(supabase):
         
         if submit_button:
             try:
-                supabase.table('profiles').update({
+                get_repository().update('profiles', {
                     'full_name': full_name,
                     'age': age,
                     'stress_level': stress_level,
                     'goals': goals,
                     'interests': interests,
                     'preferred_language': preferred_language
-                }).eq('id', user_id).execute()
+                }, {'id': user_id})
+                invalidate_cache('profiles', id=user_id)
                 
                 # Update session state with new language preference
                 if 'language' not in st.session_state or st.session_state.language != preferred_language:
@@ -425,6 +824,98 @@ def profile_manager(supabase):
             except Exception as e:
                 st.error(f"Error updating profile: {str(e)}")
 
+    download_all_data_section()
+    delete_all_data_section()
+
+def download_all_data_section():
+    """Let the user download everything Animoa stores about them as compressed JSON lines or CSV"""
+    from account_export import EXPORT_FORMATS
+
+    st.markdown("---")
+    st.markdown("### Download My Data")
+    st.write("A copy of your profile, conversations, mood logs, assessments and feedback.")
+    user_id = st.session_state.user.id
+    labels = {'jsonl': "JSON lines (.jsonl.gz)", 'csv': "CSV files (.zip)"}
+    export_format = st.radio("Format", list(EXPORT_FORMATS), format_func=labels.get, horizontal=True,
+                             key="data_export_format")
+
+    if st.button("Prepare my data", key="prepare_data_export"):
+        previous = st.session_state.pop("data_export", None)
+        if previous and os.path.exists(previous[0]):
+            os.remove(previous[0])
+        fd, path = new_export_file(EXPORT_FORMATS[export_format])
+        try:
+            with st.spinner("Collecting your data..."), os.fdopen(fd, 'wb') as out:
+                # Writes still waiting in the local journal belong in the export too; a sync
+                # already running on another thread is waited for rather than skipped
+                get_sync_engine().sync(get_repository(), user_id, wait=True)
+                if get_local_journal().has_pending(user_id):
+                    st.warning("Some of your latest entries are not saved to the server yet and are "
+                               "not in this export. Try again once you are back online.")
+                # Read a page at a time and compressed as it goes, so memory stays flat
+                export_account(get_repository(), user_id, out, export_format)
+            st.session_state.data_export = (path, export_format)
+        except Exception as e:
+            os.remove(path)
+            st.error(f"Could not export your data: {str(e)}")
+
+    prepared = st.session_state.get("data_export")
+    if prepared and os.path.exists(prepared[0]):
+        path, prepared_format = prepared
+        # As with the PDF export, the button serves the bytes from memory; the file is only a staging area
+        with open(path, 'rb') as f:
+            st.download_button("⬇️ Download my data", data=f, key="download_data_export",
+                               file_name=f"Animoa_Data_{datetime.date.today().isoformat()}"
+                                         f"{EXPORT_FORMATS[prepared_format]}",
+                               mime="application/zip" if prepared_format == 'csv' else "application/gzip",
+                               on_click=discard_export_file, args=(path,))
+
+def delete_all_data_section():
+    """Let the user delete everything Animoa stores about them in one step"""
+    from change_feed import WATCHED_TABLES
+
+    st.markdown("---")
+    st.markdown("### Delete My Data")
+    st.write("Permanently delete your profile, conversations, mood logs, assessments and feedback.")
+
+    if not st.session_state.get("confirm_delete_all_data"):
+        if st.button("🗑️ Delete all my data", key="delete_all_data", type="secondary"):
+            st.session_state.confirm_delete_all_data = True
+            st.rerun()
+        return
+
+    st.warning("⚠️ This will permanently delete all of your data and log you out. This cannot be undone.")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Yes, delete everything", key="confirm_delete_all_data_button", type="primary"):
+            try:
+                # One round-trip: the server deletes across every table in a single transaction.
+                # Unsynced writes must not recreate data after it is deleted, so no sync may run meanwhile
+                with get_sync_engine().paused(st.session_state.user.id):
+                    get_local_journal().discard(st.session_state.user.id)
+                    get_repository().rpc('delete_all_user_data')
+            except Exception as e:
+                st.error(f"Error deleting your data: {str(e)}")
+                return
+            # The user's other open tabs drop their cached reads too
+            user_id = st.session_state.user.id
+            for table in WATCHED_TABLES:
+                publish_delete(user_id, table, {'id': user_id} if table == 'profiles' else {'user_id': user_id})
+            try:
+                get_supabase().auth.sign_out()
+            except:
+                pass
+            unwatch_changes()
+            release_supabase()
+            # Clear session state, including cached reads
+            for key in list(st.session_state.keys()):
+                del st.session_state[key]
+            st.rerun()
+    with col2:
+        if st.button("Cancel", key="cancel_delete_all_data"):
+            del st.session_state.confirm_delete_all_data
+            st.rerun()
+
 # ============================================================================
 # CRISIS DETECTION - Critical safety feature for mental health application
 # ============================================================================
@@ -503,11 +994,18 @@ def show_crisis_resources(language='en'):
     st.warning(resources['message'])
 
 
+# Sidebar session list is loaded a page at a time, most recent first
+SESSION_LIST_PAGE_SIZE = 20
+# Chat history is loaded a page at a time, most recent first
+CHAT_HISTORY_PAGE_SIZE = 50
+# Upper bound on messages kept in session state for one conversation
+MAX_LOADED_MESSAGES = 500
+# Cursor id of a message the database has not given an id yet. It sorts before every
+# id, so paging from (timestamp, CURSOR_MIN_ID) returns only messages older than it
+CURSOR_MIN_ID = '00000000-0000-0000-0000-000000000000'
+
 class MentalHealthChatbot:
     def __init__(self):
-        # Initialize Groq client
-        self.client = Groq(api_key=groq_api_key)
-        
         # Initialize session state variables if they don't exist
         if "messages" not in st.session_state:
             st.session_state.messages = []
@@ -517,14 +1015,17 @@ class MentalHealthChatbot:
             
         if "current_session_id" not in st.session_state:
             st.session_state.current_session_id = None
+
+        if "messages_offset" not in st.session_state:
+            self.reset_history_window()
         
         # Initialize language preference
         if "language" not in st.session_state and "user" in st.session_state:
             try:
                 # Get user's preferred language from profile
-                response = supabase.table('profiles').select('preferred_language').eq('id', st.session_state.user.id).execute()
-                if response.data and len(response.data) > 0 and response.data[0]['preferred_language']:
-                    st.session_state.language = response.data[0]['preferred_language']
+                profile = get_profile(st.session_state.user.id)
+                if profile and profile.get('preferred_language'):
+                    st.session_state.language = profile['preferred_language']
                 else:
                     st.session_state.language = 'en'  # Default to English
             except:
@@ -535,71 +1036,211 @@ class MentalHealthChatbot:
         # Load sessions for logged-in user
         if "user" in st.session_state:
             self.load_chat_sessions()
+
+            # A search result asked for one of the user's conversations
+            session_id = st.session_state.pop("open_session_id", None)
+            if session_id is not None:
+                st.session_state.current_session_id = session_id
+                self.load_chat_history(session_id)
     
-    def load_chat_sessions(self):
-        """Load chat sessions metadata from Supabase"""
+    @property
+    def client(self):
+        """The Groq client, only created once a response or translation is needed"""
+        return get_groq_client()
+
+    def fetch_sessions_page(self, before=None):
+        """
+        Fetch one page of session metadata, newest first, using keyset pagination on (created_at, id).
+        Returns the page and whether older sessions exist.
+        """
+        if before is not None:
+            before = (('created_at', before[0]), ('id', before[1]))
+        rows = get_repository().select('chat_sessions', 'id, title, created_at, archived_at',
+                                       filters={'user_id': st.session_state.user.id},
+                                       order=[('created_at', True), ('id', True)],
+                                       limit=SESSION_LIST_PAGE_SIZE + 1, before=before)
+        page, has_more = rows[:SESSION_LIST_PAGE_SIZE], len(rows) > SESSION_LIST_PAGE_SIZE
+        if before is None:
+            # Sessions created while offline are the newest, list them until they are synced
+            stored = {row['id'] for row in page}
+            unsynced = [row for row in get_local_journal().pending_rows(st.session_state.user.id, 'chat_sessions')
+                        if row['id'] not in stored]
+            page = sorted(unsynced, key=lambda row: row['created_at'], reverse=True) + page
+        return page, has_more
+
+    def add_sessions_page(self, sessions, has_more):
+        """Append a page of sessions to the sidebar list and move the cursor past it"""
+        for session in sessions:
+            st.session_state.chat_sessions[session['id']] = {
+                'title': session['title'],
+                'created_at': session['created_at'],
+                'archived_at': session.get('archived_at')
+            }
+        if sessions:
+            st.session_state.chat_sessions_cursor = (sessions[-1]['created_at'], sessions[-1]['id'])
+        st.session_state.has_more_chat_sessions = has_more
+
+    def load_chat_sessions(self, force=False):
+        """Load the first page of chat session metadata from Supabase, once per login"""
+        user_id = st.session_state.user.id
+        if not force and st.session_state.get("chat_sessions_loaded_for") == user_id:
+            return
         try:
-            # First, load session metadata
-            response = supabase.table('chat_sessions').select('*').eq('user_id', st.session_state.user.id).order('created_at', desc=True).execute()
+            sessions, has_more = self.fetch_sessions_page()
             
             # Initialize chat sessions dictionary
             st.session_state.chat_sessions = {}
-            
-            if response and response.data:
-                for session in response.data:
-                    session_id = session['id']
-                    st.session_state.chat_sessions[session_id] = {
-                        'title': session['title'],
-                        'created_at': session['created_at']
-                    }
-                
-                # Set current session to the most recent one if not already set
-                if st.session_state.current_session_id is None and response.data:
-                    st.session_state.current_session_id = response.data[0]['id']
-                    self.load_chat_history(st.session_state.current_session_id)
+            st.session_state.chat_sessions_cursor = None
+            self.add_sessions_page(sessions, has_more)
+            st.session_state.chat_sessions_loaded_for = user_id
+            
+            # Set current session to the most recent one if not already set
+            if sessions and st.session_state.current_session_id is None:
+                st.session_state.current_session_id = sessions[0]['id']
+                self.load_chat_history(st.session_state.current_session_id)
         except Exception as e:
             st.warning(f"Could not load chat sessions: {str(e)}")
+
+    def load_more_chat_sessions(self):
+        """Append the next page of older sessions to the sidebar list"""
+        try:
+            sessions, has_more = self.fetch_sessions_page(before=st.session_state.get("chat_sessions_cursor"))
+            self.add_sessions_page(sessions, has_more)
+        except Exception as e:
+            st.warning(f"Could not load more chat sessions: {str(e)}")
     
+    def history_page_request(self, session_id, before=None):
+        """
+        Describe a read of one page of user/bot messages, newest first, using keyset pagination.
+        `before` is the (timestamp, id) of the oldest message already loaded.
+        """
+        repository = get_repository()
+        cursor = (('timestamp', before[0]), ('id', before[1])) if before is not None else None
+
+        def load():
+            # Fetch one extra row to learn whether there is an earlier page
+            return repository.select('chat_history', 'id, message, sender, timestamp, client_id',
+                                     filters={'session_id': session_id},
+                                     in_={'sender': ['user', 'bot']},
+                                     order=[('timestamp', True), ('id', True)],
+                                     limit=CHAT_HISTORY_PAGE_SIZE + 1, before=cursor)
+
+        return dict(table='chat_history', loader=load, columns='page',
+                    filters={'session_id': session_id},
+                    extra=(before, CHAT_HISTORY_PAGE_SIZE), ttl=cache_ttl('chat_history'))
+
+    def message_count_request(self, session_id):
+        """Describe a count of user/bot messages, used to map loaded messages to absolute indexes"""
+        repository = get_repository()
+
+        def load():
+            return repository.count('chat_history', filters={'session_id': session_id},
+                                    in_={'sender': ['user', 'bot']})
+
+        return dict(table='chat_history', loader=load, columns='count',
+                    filters={'session_id': session_id}, ttl=cache_ttl('chat_history'))
+
+    def split_history_page(self, rows):
+        """Return a fetched page in chronological order and whether older messages exist"""
+        has_more = len(rows) > CHAT_HISTORY_PAGE_SIZE
+        return list(reversed(rows[:CHAT_HISTORY_PAGE_SIZE])), has_more
+
+    def apply_history_page(self, session_id, page):
+        """Convert a page of rows to chat messages and restore their feedback state"""
+        # Messages still in the local journal have no id yet, their timestamp alone places them
+        messages = [
+            {"role": "user" if row['sender'] == 'user' else "assistant", "content": row['message'],
+             "cursor": (row['timestamp'], row.get('id') or CURSOR_MIN_ID)}
+            for row in page
+        ]
+        if messages:
+            st.session_state.history_cursor = messages[0]["cursor"]
+
+        # Only fetch feedback for messages at or after the loaded window
+        feedback_rows = cached_select('chat_history', filters={'session_id': session_id, 'sender': 'feedback'},
+                                      gte={'feedback_for_message_index': st.session_state.messages_offset})
+        for row in feedback_rows:
+            index = row.get('feedback_for_message_index')
+            if index is not None:
+                st.session_state[f"has_feedback_{session_id}_{index}"] = True
+                st.session_state[f"feedback_type_{session_id}_{index}"] = row['message']
+        return messages
+
+    def append_message(self, role, content, timestamp):
+        """
+        Add a new message to the loaded conversation, dropping the oldest past
+        MAX_LOADED_MESSAGES. `timestamp` is the one the message is saved with.
+        """
+        messages = st.session_state.messages
+        messages.append({"role": role, "content": content, "cursor": (timestamp, CURSOR_MIN_ID)})
+        if len(messages) > MAX_LOADED_MESSAGES:
+            # A page at a time, which leaves room to load the dropped page again
+            excess = len(messages) - MAX_LOADED_MESSAGES + CHAT_HISTORY_PAGE_SIZE
+            del messages[:excess]
+            st.session_state.messages_offset += excess
+            st.session_state.has_earlier_messages = True
+            # The dropped messages are now the earlier page
+            st.session_state.history_cursor = messages[0]["cursor"]
+
+    def reset_history_window(self):
+        """Forget pagination state for the loaded conversation"""
+        st.session_state.messages = []
+        st.session_state.messages_offset = 0
+        st.session_state.history_cursor = None
+        st.session_state.has_earlier_messages = False
+
     def load_chat_history(self, session_id=None):
-        """Load chat history for a specific session from Supabase"""
+        """Load the most recent page of chat history for a session from Supabase"""
         # Clear current messages
-        st.session_state.messages = []
+        self.reset_history_window()
         
         if session_id is None:
             return
             
         try:
-            # Get chat history for the session
-            response = supabase.table('chat_history').select('*').eq('session_id', session_id).order('timestamp', desc=False).execute()
-            
-            if response and response.data:
-                message_data = []
-                feedback_data = {}
-                
-                # First, separate messages from feedback
-                for msg in response.data:
-                    if msg['sender'] == 'user':
-                        message_data.append({"role": "user", "content": msg['message']})
-                    elif msg['sender'] == 'bot':
-                        message_data.append({"role": "assistant", "content": msg['message']})
-                    elif msg['sender'] == 'feedback':
-                        # Store feedback data with message index as key
-                        if 'feedback_for_message_index' in msg:
-                            index = msg['feedback_for_message_index']
-                            feedback_data[index] = msg['message']
-                
-                # Add messages to session state
-                st.session_state.messages = message_data
-                
-                # Process feedback and update session state
-                for index, feedback in feedback_data.items():
-                    if index < len(message_data):
-                        feedback_key = f"has_feedback_{session_id}_{index}"
-                        feedback_type_key = f"feedback_type_{session_id}_{index}"
-                        st.session_state[feedback_key] = True
-                        st.session_state[feedback_type_key] = feedback
+            # Sessions inactive for a long time live in cold storage until opened again. Checked on the
+            # session row, since a session opened from search may not be in the loaded list page
+            stored = get_repository().select('chat_sessions', 'archived_at', filters={'id': session_id})
+            if stored and stored[0].get('archived_at'):
+                hydrate_session(get_repository(), session_id)
+                invalidate_cache('chat_history', session_id=session_id)
+            if session_id in st.session_state.get("chat_sessions", {}):
+                st.session_state.chat_sessions[session_id]['archived_at'] = None
+
+            # The newest page and the message count are independent, fetch them together
+            rows, total = load_together(self.history_page_request(session_id),
+                                        self.message_count_request(session_id))
+            page, has_more = self.split_history_page(rows)
+
+            # Messages still in the local journal are newer than anything stored
+            synced_ids = {row.get('client_id') for row in page}
+            unsynced = [row for row in get_local_journal().pending_rows(st.session_state.user.id, 'chat_history',
+                                                                       session_id=session_id)
+                        if row['client_id'] not in synced_ids]
+            page = page + unsynced
+            total += len(unsynced)
+
+            # Absolute index of the first loaded message, feedback is stored against absolute indexes
+            st.session_state.messages_offset = max(total - len(page), 0)
+            st.session_state.has_earlier_messages = has_more
+            st.session_state.messages = self.apply_history_page(session_id, page)
         except Exception as e:
             st.warning(f"Could not load chat history: {str(e)}")
+
+    def load_earlier_messages(self):
+        """Prepend the previous page of messages to the loaded conversation"""
+        session_id = st.session_state.current_session_id
+        if session_id is None or not st.session_state.get("history_cursor"):
+            return
+        try:
+            rows = get_query_cache().get_or_load(
+                **self.history_page_request(session_id, before=st.session_state.history_cursor))
+            page, has_more = self.split_history_page(rows)
+            st.session_state.messages_offset = max(st.session_state.messages_offset - len(page), 0)
+            st.session_state.has_earlier_messages = has_more
+            st.session_state.messages = self.apply_history_page(session_id, page) + st.session_state.messages
+        except Exception as e:
+            st.warning(f"Could not load earlier messages: {str(e)}")
     
     def create_new_session(self):
         """Create a new chat session"""
@@ -608,25 +1249,27 @@ class MentalHealthChatbot:
             current_time = datetime.datetime.now().strftime("%b %d, %Y %I:%M %p")
             session_title = f"Chat {current_time}"
             
-            # Create session in database
-            response = supabase.table('chat_sessions').insert({
+            # Journaled with a client-side id, so a chat can start while the database is unreachable
+            new_session = journal_write('chat_sessions', {
+                'id': str(uuid.uuid4()),
                 'user_id': st.session_state.user.id,
                 'title': session_title,
                 'created_at': datetime.datetime.now().isoformat()
-            }).execute()
-            
-            # Get the new session ID
-            new_session_id = response.data[0]['id']
-            
-            # Update session state
-            st.session_state.chat_sessions[new_session_id] = {
-                'title': session_title,
-                'created_at': datetime.datetime.now().isoformat()
+            })
+            new_session_id = new_session['id']
+            
+            # Put the new session at the top of the list without reloading it
+            st.session_state.chat_sessions = {
+                new_session_id: {
+                    'title': new_session.get('title', session_title),
+                    'created_at': new_session.get('created_at', datetime.datetime.now().isoformat())
+                },
+                **st.session_state.chat_sessions
             }
             
             # Set as current session
             st.session_state.current_session_id = new_session_id
-            st.session_state.messages = []  # Clear messages for new session
+            self.reset_history_window()  # Clear messages for new session
             
             # Clear any feedback-related session state variables for previous sessions
             for key in list(st.session_state.keys()):
@@ -638,7 +1281,7 @@ class MentalHealthChatbot:
             st.warning(f"Could not create new session: {str(e)}")
             return None
                 
-    def save_message(self, role, content, message_index=None):
+    def save_message(self, role, content, message_index=None, timestamp=None):
         """Save a message to the database, including feedback"""
         if "user" in st.session_state:
             try:
@@ -654,7 +1297,7 @@ class MentalHealthChatbot:
                     'session_id': session_id,
                     'message': content,
                     'sender': 'user' if role == 'user' else 'bot',
-                    'timestamp': datetime.datetime.now().isoformat()  # Add timestamp
+                    'timestamp': timestamp or datetime.datetime.now().isoformat()
                 }
                 
                 if role == "feedback" and message_index is not None:
@@ -663,19 +1306,20 @@ class MentalHealthChatbot:
                     message_data['sender'] = 'feedback'  # overwrite the sender
                     
                     # Check if feedback already exists for this message to avoid duplicates
-                    existing = supabase.table('chat_history').select('id')\
-                        .eq('user_id', st.session_state.user.id)\
-                        .eq('session_id', session_id)\
-                        .eq('sender', 'feedback')\
-                        .eq('feedback_for_message_index', message_index)\
-                        .execute()
+                    existing = get_repository().select('chat_history', 'id', filters={
+                        'user_id': st.session_state.user.id,
+                        'session_id': session_id,
+                        'sender': 'feedback',
+                        'feedback_for_message_index': message_index
+                    })
                         
-                    if existing.data and len(existing.data) > 0:
+                    if existing:
                         # Update existing feedback instead of creating a new one
-                        supabase.table('chat_history').update({
+                        get_repository().update('chat_history', {
                             'message': content,
                             'timestamp': datetime.datetime.now().isoformat()
-                        }).eq('id', existing.data[0]['id']).execute()
+                        }, {'id': existing[0]['id']})
+                        invalidate_cache('chat_history', session_id=session_id)
                         
                         # Update the session state to reflect this change
                         feedback_key = f"has_feedback_{session_id}_{message_index}"
@@ -685,8 +1329,12 @@ class MentalHealthChatbot:
                         
                         return
                 
-                # Insert new message/feedback
-                result = supabase.table('chat_history').insert(message_data).execute()
+                if role == "feedback":
+                    get_repository().insert('chat_history', message_data)
+                    invalidate_cache('chat_history', session_id=session_id)
+                elif session_id is not None:
+                    # Messages are journaled so a slow or unreachable database never blocks the chat
+                    journal_write('chat_history', message_data)
                 
                 # If this is a feedback message, update the session state
                 if role == "feedback" and message_index is not None:
@@ -791,9 +1439,10 @@ class MentalHealthChatbot:
                 # If logged in, save preference
                 if "user" in st.session_state:
                     try:
-                        supabase.table('profiles').update({
+                        get_repository().update('profiles', {
                             'preferred_language': selected_lang
-                        }).eq('id', st.session_state.user.id).execute()
+                        }, {'id': st.session_state.user.id})
+                        invalidate_cache('profiles', id=st.session_state.user.id)
                     except:
                         pass
                 st.rerun()
@@ -821,7 +1470,13 @@ class MentalHealthChatbot:
                     st.session_state.current_session_id = session_id
                     self.load_chat_history(session_id)
                     st.rerun()
-        
+
+            # Older sessions are fetched only when asked for
+            if st.session_state.get("has_more_chat_sessions"):
+                if st.button("Show older chats", key="more_chat_sessions", use_container_width=True):
+                    self.load_more_chat_sessions()
+                    st.rerun()
+
         with col2:
             # Create chat interface inside a container for better control
             chat_interface = st.container()
@@ -860,11 +1515,19 @@ class MentalHealthChatbot:
                             # Use layout without nested columns
                             if st.button("Yes, delete it", key="confirm_delete_simple"):
                                 try:
-                                    # Delete all messages in this chat
-                                    supabase.table('chat_history').delete().eq('session_id', st.session_state.current_session_id).execute()
-                                    
-                                    # Delete the session itself
-                                    supabase.table('chat_sessions').delete().eq('id', st.session_state.current_session_id).execute()
+                                    # Delete the session and all of its messages in one server-side transaction
+                                    with get_sync_engine().paused(st.session_state.user.id):
+                                        get_local_journal().discard(st.session_state.user.id, 'chat_history',
+                                                                    session_id=st.session_state.current_session_id)
+                                        get_local_journal().discard(st.session_state.user.id, 'chat_sessions',
+                                                                    id=st.session_state.current_session_id)
+                                        get_repository().rpc('delete_chat_session', {
+                                            'p_session_id': st.session_state.current_session_id
+                                        })
+                                    publish_delete(st.session_state.user.id, 'chat_history',
+                                                   {'session_id': st.session_state.current_session_id})
+                                    publish_delete(st.session_state.user.id, 'chat_sessions',
+                                                   {'id': st.session_state.current_session_id})
                                     
                                     # Clear local state
                                     if st.session_state.current_session_id in st.session_state.chat_sessions:
@@ -872,7 +1535,7 @@ class MentalHealthChatbot:
                                     
                                     # Clear current session and messages
                                     st.session_state.current_session_id = None
-                                    st.session_state.messages = []
+                                    self.reset_history_window()
                                     
                                     # Clear the confirmation states
                                     del st.session_state.show_delete_confirm
@@ -912,8 +1575,18 @@ class MentalHealthChatbot:
                                     </div>
                                     """, unsafe_allow_html=True)
                     
+                    # Offer older pages of long conversations on demand
+                    if st.session_state.get("has_earlier_messages"):
+                        if len(st.session_state.messages) >= MAX_LOADED_MESSAGES:
+                            st.caption(f"Showing the most recent {len(st.session_state.messages)} messages.")
+                        elif st.button("⬆️ Load earlier messages", key="load_earlier_messages", use_container_width=True):
+                            self.load_earlier_messages()
+                            st.rerun()
+
                     # Display chat history                   
                     for i, message in enumerate(st.session_state.messages):
+                        # Feedback is stored against the message's index in the whole conversation
+                        message_index = st.session_state.messages_offset + i
                         with st.chat_message(message["role"]):
                             st.markdown(message["content"])
                             # For the latest assistant message only, show feedback UI
@@ -933,24 +1606,23 @@ class MentalHealthChatbot:
                                         try:
                                             # Message index in session is used as reference in database
                                             # Check if feedback exists for this message
-                                            response = supabase.table('chat_history').select('*')\
-                                                .eq('user_id', st.session_state.user.id)\
-                                                .eq('session_id', st.session_state.current_session_id)\
-                                                .eq('sender', 'feedback')\
-                                                .eq('feedback_for_message_index', i)\
-                                                .execute()
+                                            feedback_rows = cached_select('chat_history', filters={
+                                                'session_id': st.session_state.current_session_id,
+                                                'sender': 'feedback',
+                                                'feedback_for_message_index': message_index
+                                            })
                                                 
-                                            if response.data and len(response.data) > 0:
+                                            if feedback_rows:
                                                 has_feedback = True
-                                                feedback_type = response.data[0]['message']
+                                                feedback_type = feedback_rows[0]['message']
                                         except Exception as e:
-                                            print(f"Error checking feedback: {str(e)}")
+                                            logger.warning("Could not check feedback: %s", e)
 
                                     # Store has_feedback in session state to ensure consistency across reruns
-                                    feedback_key = f"has_feedback_{st.session_state.current_session_id}_{i}"
+                                    feedback_key = f"has_feedback_{st.session_state.current_session_id}_{message_index}"
                                     if feedback_key not in st.session_state:
                                         st.session_state[feedback_key] = has_feedback
-                                        st.session_state[f"feedback_type_{st.session_state.current_session_id}_{i}"] = feedback_type
+                                        st.session_state[f"feedback_type_{st.session_state.current_session_id}_{message_index}"] = feedback_type
                                     
                                     # Only show feedback options if feedback hasn't been given yet
                                     if not st.session_state[feedback_key]:
@@ -958,65 +1630,65 @@ class MentalHealthChatbot:
                                         fb_col1, fb_col2, fb_col3, fb_col4, fb_col5, fb_col6 = st.columns([1, 1, 1, 1, 1, 3])
                                         
                                         with fb_col1:
-                                            if st.button("😊", key=f"happy_{st.session_state.current_session_id}_{i}", help="Helpful response"):
-                                                self.save_message("feedback", "😊 Helpful", i)
+                                            if st.button("😊", key=f"happy_{st.session_state.current_session_id}_{message_index}", help="Helpful response"):
+                                                self.save_message("feedback", "😊 Helpful", message_index)
                                                 st.session_state[feedback_key] = True
-                                                st.session_state[f"feedback_type_{st.session_state.current_session_id}_{i}"] = "😊 Helpful"
+                                                st.session_state[f"feedback_type_{st.session_state.current_session_id}_{message_index}"] = "😊 Helpful"
                                                 st.success("Thank you for your feedback!")
                                                 time.sleep(0.5)
                                                 st.rerun()
                                                 
                                         with fb_col2:
-                                            if st.button("🤔", key=f"thinking_{st.session_state.current_session_id}_{i}", help="Made me think"):
-                                                self.save_message("feedback", "🤔 Thoughtful", i)
+                                            if st.button("🤔", key=f"thinking_{st.session_state.current_session_id}_{message_index}", help="Made me think"):
+                                                self.save_message("feedback", "🤔 Thoughtful", message_index)
                                                 st.session_state[feedback_key] = True
-                                                st.session_state[f"feedback_type_{st.session_state.current_session_id}_{i}"] = "🤔 Thoughtful"
+                                                st.session_state[f"feedback_type_{st.session_state.current_session_id}_{message_index}"] = "🤔 Thoughtful"
                                                 st.success("Thank you for your feedback!")
                                                 time.sleep(0.5)
                                                 st.rerun()
                                         
                                         with fb_col3:
-                                            if st.button("❤️", key=f"heart_{st.session_state.current_session_id}_{i}", help="Love this response"):
-                                                self.save_message("feedback", "❤️ Love it", i)
+                                            if st.button("❤️", key=f"heart_{st.session_state.current_session_id}_{message_index}", help="Love this response"):
+                                                self.save_message("feedback", "❤️ Love it", message_index)
                                                 st.session_state[feedback_key] = True
-                                                st.session_state[f"feedback_type_{st.session_state.current_session_id}_{i}"] = "❤️ Love it"
+                                                st.session_state[f"feedback_type_{st.session_state.current_session_id}_{message_index}"] = "❤️ Love it"
                                                 st.success("Thank you for your feedback!")
                                                 time.sleep(0.5)
                                                 st.rerun()
                                                 
                                         with fb_col4:
-                                            if st.button("👍", key=f"thumbs_up_{st.session_state.current_session_id}_{i}", help="Great response"):
-                                                self.save_message("feedback", "👍 Great", i)
+                                            if st.button("👍", key=f"thumbs_up_{st.session_state.current_session_id}_{message_index}", help="Great response"):
+                                                self.save_message("feedback", "👍 Great", message_index)
                                                 st.session_state[feedback_key] = True
-                                                st.session_state[f"feedback_type_{st.session_state.current_session_id}_{i}"] = "👍 Great"
+                                                st.session_state[f"feedback_type_{st.session_state.current_session_id}_{message_index}"] = "👍 Great"
                                                 st.success("Thank you for your feedback!")
                                                 time.sleep(0.5)
                                                 st.rerun()
                                                 
                                         with fb_col5:
-                                            if st.button("👎", key=f"thumbs_down_{st.session_state.current_session_id}_{i}", help="Not helpful"):
+                                            if st.button("👎", key=f"thumbs_down_{st.session_state.current_session_id}_{message_index}", help="Not helpful"):
                                                 # Show a small popup for more detailed feedback if negative
-                                                st.session_state[f"show_detailed_feedback_{st.session_state.current_session_id}_{i}"] = True
-                                                self.save_message("feedback", "👎 Not helpful", i)
+                                                st.session_state[f"show_detailed_feedback_{st.session_state.current_session_id}_{message_index}"] = True
+                                                self.save_message("feedback", "👎 Not helpful", message_index)
                                                 st.session_state[feedback_key] = True
-                                                st.session_state[f"feedback_type_{st.session_state.current_session_id}_{i}"] = "👎 Not helpful"
+                                                st.session_state[f"feedback_type_{st.session_state.current_session_id}_{message_index}"] = "👎 Not helpful"
                                                 st.warning("Sorry this wasn't helpful.")
                                                 time.sleep(0.5)
                                                 st.rerun()
                                         
                                         with fb_col6:
                                             # Only show the detailed feedback field if thumbs down was clicked
-                                            feedback_detail_key = f"show_detailed_feedback_{st.session_state.current_session_id}_{i}"
+                                            feedback_detail_key = f"show_detailed_feedback_{st.session_state.current_session_id}_{message_index}"
                                             if feedback_detail_key in st.session_state and st.session_state[feedback_detail_key]:
-                                                with st.form(key=f"detailed_feedback_form_{st.session_state.current_session_id}_{i}"):
+                                                with st.form(key=f"detailed_feedback_form_{st.session_state.current_session_id}_{message_index}"):
                                                     st.write("What could be improved?")
-                                                    detailed_feedback = st.text_area("", key=f"detailed_feedback_{st.session_state.current_session_id}_{i}", label_visibility="collapsed")
+                                                    detailed_feedback = st.text_area("", key=f"detailed_feedback_{st.session_state.current_session_id}_{message_index}", label_visibility="collapsed")
                                                     submit_btn = st.form_submit_button("Submit")
                                                     
                                                     if submit_btn and detailed_feedback:
-                                                        self.save_message("feedback", f"Comment: {detailed_feedback}", i)
+                                                        self.save_message("feedback", f"Comment: {detailed_feedback}", message_index)
                                                         # Keep the main feedback status but update the type to include the comment
-                                                        st.session_state[f"feedback_type_{st.session_state.current_session_id}_{i}"] += f" - {detailed_feedback}"
+                                                        st.session_state[f"feedback_type_{st.session_state.current_session_id}_{message_index}"] += f" - {detailed_feedback}"
                                                         # Remove detailed feedback form flag
                                                         del st.session_state[feedback_detail_key]
                                                         st.success("Thank you for your detailed feedback!")
@@ -1024,7 +1696,7 @@ class MentalHealthChatbot:
                                                         st.rerun()
                                     else:
                                         # If feedback was already given, just show what was selected with a small info message
-                                        feedback_type_key = f"feedback_type_{st.session_state.current_session_id}_{i}"
+                                        feedback_type_key = f"feedback_type_{st.session_state.current_session_id}_{message_index}"
                                         if feedback_type_key in st.session_state:
                                             displayed_feedback = st.session_state[feedback_type_key]
                                         else:
@@ -1041,8 +1713,9 @@ class MentalHealthChatbot:
                     show_crisis_resources(current_lang)
 
                 # Add user message to chat history
-                st.session_state.messages.append({"role": "user", "content": prompt})
-                self.save_message("user", prompt)
+                sent_at = datetime.datetime.now().isoformat()
+                self.append_message("user", prompt, sent_at)
+                self.save_message("user", prompt, timestamp=sent_at)
 
                 # Prepare conversation history
                 conversation_history = self.prepare_conversation_history()
@@ -1050,8 +1723,9 @@ class MentalHealthChatbot:
                 # Generate and display bot response
                 with st.spinner("Thinking..."):
                     response = self.generate_response(prompt, conversation_history)
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                    self.save_message("assistant", response)
+                    replied_at = datetime.datetime.now().isoformat()
+                    self.append_message("assistant", response, replied_at)
+                    self.save_message("assistant", response, timestamp=replied_at)
 
                 # Force a rerun to update the UI with new messages
                 st.rerun()
@@ -1092,7 +1766,7 @@ class MentalHealthChatbot:
                 
                 translated_content = completion.choices[0].message.content
                 translated_messages.append({
-                    "role": msg["role"],
+                    **msg,
                     "content": translated_content
                 })
                     
@@ -1101,195 +1775,55 @@ class MentalHealthChatbot:
             st.warning(f"Translation error: {str(e)}")
             return messages  # Return original messages if translation fails
     
-# Add this function before the mental_health_advisory() function to make the PDF creation reusable
-def create_wellness_pdf(responses, recommendations):
-    """Create a PDF for wellness insights"""
-    buffer = BytesIO()
-    # Use ReportLab for better PDF styling
-    from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
-    from reportlab.lib.pagesizes import letter
-    from reportlab.lib.units import inch
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT
-
-    # Create the PDF document
-    doc = SimpleDocTemplate(buffer, pagesize=letter, 
-                           rightMargin=72, leftMargin=72,
-                           topMargin=72, bottomMargin=72)
-
-    # Get and modify styles instead of adding new ones with the same names
-    styles = getSampleStyleSheet()
-    # Modify existing styles
-    styles['Title'].alignment = TA_CENTER
-    styles['Title'].fontSize = 18
-    styles['Title'].spaceAfter = 12
-
-    # Add custom styles with unique names - use standard font names
-    styles.add(ParagraphStyle(name='AnimoaSubtitle',
-                             fontName='Helvetica-Bold',
-                             fontSize=14,
-                             alignment=TA_CENTER,
-                             spaceAfter=12))
-    styles.add(ParagraphStyle(name='AnimoaSection',
-                             fontName='Helvetica-Bold',
-                             fontSize=12,
-                             spaceAfter=6))
-    styles.add(ParagraphStyle(name='AnimoaNormal',
-                             fontName='Helvetica',
-                             fontSize=10,
-                             spaceAfter=6))
-
-    # Add content to the PDF
-    content = []
-
-    # Try to add logo (if available)
-    try:
-        # Path to the logo - adjust path as needed
-        logo_path = "logo.png"  # Place your logo in the same directory as the script
-        img = Image(logo_path)
-        img.hAlign = 'CENTER'
-        content.append(img)
-        content.append(Spacer(1, 12))
-    except Exception as e:
-        # If logo not found, just add title with more space
-        print(f"Logo not found: {e}")
-        content.append(Spacer(1, 0.5*inch))
-
-    # Add title and current date
-    content.append(Paragraph("MENTAL WELLNESS INSIGHTS", styles['Title']))
-    current_date = datetime.datetime.now().strftime("%B %d, %Y")
-    content.append(Paragraph(f"Generated on {current_date}", styles['AnimoaSubtitle']))
-    content.append(Spacer(1, 0.25*inch))
-
-    # Add user's responses summary in a table
-    content.append(Paragraph("ASSESSMENT SUMMARY", styles['AnimoaSection']))
-
-    # Translate the responses to readable format
-    mood_map = {"Not at all": "None", "Several days": "Mild", "More than half the days": "Moderate", "Nearly every day": "Severe"}
-    sleep_map = {"Very poor": "Very Poor", "Poor": "Poor", "Fair": "Fair", "Good": "Good", "Very good": "Excellent"}
-    support_map = {"No support": "None", "Limited support": "Limited", "Moderate support": "Moderate", "Strong support": "Strong"}
-
-    # Create a neat table for the assessment summary
-    assessment_data = [
-        ["Assessment Area", "Response", "Severity/Quality"],
-        ["Feeling down or depressed", responses["mood"], mood_map.get(responses["mood"], "-")],
-        ["Little interest or pleasure", responses["interest"], mood_map.get(responses["interest"], "-")],
-        ["Feeling anxious", responses["anxiety"], mood_map.get(responses["anxiety"], "-")],
-        ["Uncontrollable worry", responses["worry"], mood_map.get(responses["worry"], "-")],
-        ["Sleep quality", responses["sleep"], sleep_map.get(responses["sleep"], "-")],
-        ["Social support", responses["support"], support_map.get(responses["support"], "-")]
-    ]
+@st.cache_resource
+def get_pdf_cache():
+    """Rendered wellness reports shared by all sessions, on disk too if ANIMOA_PDF_CACHE_DIR is set"""
+    return PdfCache(directory=os.getenv("ANIMOA_PDF_CACHE_DIR") or None)
 
-    # Create table and set style
-    assessment_table = Table(assessment_data, colWidths=[2.2*inch, 2.2*inch, 1.6*inch])
-    assessment_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (2, 0), colors.lightgrey),
-        ('TEXTCOLOR', (0, 0), (2, 0), colors.black),
-        ('ALIGN', (0, 0), (2, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (2, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (2, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (2, 0), 6),
-        ('BACKGROUND', (0, 1), (2, 6), colors.white),
-        ('GRID', (0, 0), (2, 6), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (2, -1), 'CENTER'),
-    ]))
-
-    content.append(assessment_table)
-    content.append(Spacer(1, 0.1*inch))
-
-    # Add coping strategies separately as they can be longer text
-    content.append(Paragraph("Current Coping Strategies:", styles['AnimoaSection']))
-    coping_text = responses["coping"] if responses["coping"] else "No coping strategies provided."
-    content.append(Paragraph(coping_text, styles['AnimoaNormal']))
-    content.append(Spacer(1, 0.2*inch))
-
-    # Add recommendations with proper formatting
-    content.append(Paragraph("PERSONALIZED RECOMMENDATIONS", styles['AnimoaSection']))
-    content.append(Spacer(1, 0.1*inch))
-
-    # Simple, efficient approach with fixed bold text handling
-    for line in recommendations.split('\n'):
-        line = line.strip()
-        if not line:
-            # Empty line - add space
-            content.append(Spacer(1, 6))
-        elif line.startswith('### '):
-            # Section header (H3)
-            content.append(Paragraph(line[4:], styles['AnimoaSection']))
-        elif line.startswith('## '):
-            # Section header (H2)
-            content.append(Paragraph(line[3:], styles['AnimoaSection']))
-        elif line.startswith('# '):
-            # Main header (H1)
-            content.append(Paragraph(line[2:], styles['AnimoaSubtitle']))
-        elif line.startswith('* ') or line.startswith('• '):
-            # Bullet point - convert to a proper bullet in the PDF
-            text = line[2:]  # Remove bullet marker
-            
-            # Fixed approach for bold text - explicitly handle pairs of **
-            text_with_tags = ""
-            i = 0
-            bold_open = False
-            
-            while i < len(text):
-                if text[i:i+2] == '**':
-                    if not bold_open:
-                        text_with_tags += '<b>'
-                        bold_open = True
-                    else:
-                        text_with_tags += '</b>'
-                        bold_open = False
-                    i += 2
-                else:
-                    text_with_tags += text[i]
-                    i += 1
-                    
-            # Ensure bold tags are closed
-            if bold_open:
-                text_with_tags += '</b>'
-                
-            content.append(Paragraph(f"• {text_with_tags}", styles['AnimoaNormal']))
-        else:
-            # Regular text with same bold handling
-            text_with_tags = ""
-            i = 0
-            bold_open = False
-            
-            while i < len(line):
-                if line[i:i+2] == '**':
-                    if not bold_open:
-                        text_with_tags += '<b>'
-                        bold_open = True
-                    else:
-                        text_with_tags += '</b>'
-                        bold_open = False
-                    i += 2
-                else:
-                    text_with_tags += line[i]
-                    i += 1
-                    
-            # Ensure bold tags are closed
-            if bold_open:
-                text_with_tags += '</b>'
-                
-            content.append(Paragraph(text_with_tags, styles['AnimoaNormal']))
+def wellness_report_download(responses, recommendations, label, file_name, key):
+    """
+    Download button for a wellness report PDF. Reports are cached by content,
+    so the PDF is rendered on the first request for it (a prepare button
+    until then) and repeat downloads and reruns reuse the same bytes.
+    """
+    cache = get_pdf_cache()
+    pdf_key = report_key(PDF_TEMPLATE_VERSION, responses, recommendations)
+    data = cache.get(pdf_key)
+    if data is None and st.button("📄 Prepare PDF", key=f"prepare_{key}"):
+        with st.spinner("Preparing your report..."):
+            data = cache.get_or_render(
+                pdf_key, lambda: create_wellness_pdf(responses, recommendations).getvalue())
+    if data is not None:
+        st.download_button(label=label, data=data, file_name=file_name, mime="application/pdf", key=key)
+
+# PHQ-2/GAD-2 answer options, in score order (0-3)
+RATING_OPTIONS = {
+    "en": ["Not at all", "Several days", "More than half the days", "Nearly every day"],
+    "es": ["En absoluto", "Varios días", "Más de la mitad de los días", "Casi todos los días"],
+    "zh": ["完全没有", "有几天", "一半以上的天数", "几乎每天"]
+}
 
-    # Add disclaimer at the bottom
-    content.append(Spacer(1, 0.3*inch))
-    disclaimer_text = ("Disclaimer: This assessment is generated based on your responses using evidence-based protocols. "
-                      "It is not a clinical diagnosis. Animoa AI creates these insights to support your mental wellness journey. "
-                      "Please consult with a mental health professional for clinical advice.")
-    content.append(Paragraph(disclaimer_text, styles['AnimoaNormal']))
+# Past assessments listed per page
+ASSESSMENT_PAGE_SIZE = 10
+
+def score_assessment(responses):
+    """Compute the summary columns stored alongside an assessment"""
+    def score(answer):
+        for options in RATING_OPTIONS.values():
+            if answer in options:
+                return options.index(answer)
+        return None
+
+    def total(*answers):
+        scores = [score(responses.get(answer)) for answer in answers]
+        return None if None in scores else sum(scores)
+
+    return {
+        'phq2_score': total('mood', 'interest'),
+        'gad2_score': total('anxiety', 'worry'),
+        'mood': responses.get('mood')
+    }
 
-    # Build the PDF
-    doc.build(content)
-    buffer.seek(0)
-    
-    return buffer
-    
 def mental_health_advisory():
     """Mental Health Advisory questionnaire and recommendations"""
     # Get current language and translations
@@ -1307,72 +1841,87 @@ def mental_health_advisory():
     if "user" in st.session_state:
         with st.expander("View Previous Assessments", expanded=False):
             try:
-                response = supabase.table('questionnaire_responses').select('id, created_at, responses, recommendations').eq('user_id', st.session_state.user.id).order('created_at', desc=True).execute()
+                # Only the compact summary columns, one page at a time
+                page = st.session_state.get("assessment_history_page", 0)
+                records = cached_select('questionnaire_responses', 'id, created_at, phq2_score, gad2_score, mood',
+                                        filters={'user_id': st.session_state.user.id},
+                                        order='created_at', desc=True,
+                                        limit=ASSESSMENT_PAGE_SIZE + 1, offset=page * ASSESSMENT_PAGE_SIZE)
+                has_next_page = len(records) > ASSESSMENT_PAGE_SIZE
+                records = records[:ASSESSMENT_PAGE_SIZE]
                 
-                if response.data and len(response.data) > 0:
+                if records or page > 0:
                     # Process and display assessments as before
-                    # Create a DataFrame for display
                     assessments = []
                     
-                    for record in response.data:                        
+                    for record in records:                        
                         created_date = "Unknown date"
-                        if 'created_at' in record:
-                            import pandas as pd
+                        if record.get('created_at'):
                             created_date = pd.to_datetime(record['created_at']).strftime('%b %d, %Y %I:%M %p')
                         
-                        # Extract mood info from responses
-                        mood = "N/A"
-                        if 'responses' in record and record['responses'] and 'mood' in record['responses']:
-                            mood = record['responses']['mood']
-                        
                         assessments.append({
                             'Date': created_date,
-                            'Mood': mood,
+                            'Mood': record.get('mood') or "N/A",
+                            'PHQ-2': record['phq2_score'] if record.get('phq2_score') is not None else "-",
+                            'GAD-2': record['gad2_score'] if record.get('gad2_score') is not None else "-",
                             'ID': record['id']
                         })
                     
                     if assessments:
-                        # Display as a table with view buttons
-                        df = pd.DataFrame(assessments)
-                        
                         # Use columns to create a table with buttons
-                        cols = st.columns([3, 2, 1, 1])
+                        cols = st.columns([3, 2, 1, 1, 1, 1])
                         cols[0].write("**Date**")
                         cols[1].write("**Mood**")
-                        cols[2].write("**View**")
-                        cols[3].write("**Delete**")
+                        cols[2].write("**PHQ-2**")
+                        cols[3].write("**GAD-2**")
+                        cols[4].write("**View**")
+                        cols[5].write("**Delete**")
                         
-                        for i, row in df.iterrows():
-                            cols = st.columns([3, 2, 1, 1])
+                        for row in assessments:
+                            cols = st.columns([3, 2, 1, 1, 1, 1])
                             cols[0].write(row['Date'])
                             cols[1].write(row['Mood'])
+                            cols[2].write(row['PHQ-2'])
+                            cols[3].write(row['GAD-2'])
                             
                             # View Button
-                            if cols[2].button("📄", key=f"view_{row['ID']}"):
+                            if cols[4].button("📄", key=f"view_{row['ID']}"):
                                 st.session_state.viewing_assessment_id = row['ID']
                                 st.rerun()
                             
                             # Delete Button
-                            if cols[3].button("🗑️", key=f"delete_{row['ID']}"):
+                            if cols[5].button("🗑️", key=f"delete_{row['ID']}"):
                                 st.session_state.delete_assessment_id = row['ID']
                                 st.rerun()
-                    else:
+
+                    # Page through older assessments
+                    prev_col, next_col = st.columns(2)
+                    with prev_col:
+                        if page > 0 and st.button("← Newer", key="assessments_newer"):
+                            st.session_state.assessment_history_page = page - 1
+                            st.rerun()
+                    with next_col:
+                        if has_next_page and st.button("Older →", key="assessments_older"):
+                            st.session_state.assessment_history_page = page + 1
+                            st.rerun()
+                    
+                    if not assessments:
                         st.info("No previous assessments found.")
                 else:
                     st.info("Assessment history will be available after your first assessment.")
                     
             except Exception as e:
                 st.info("Assessment history will be available after your first assessment.")
-                print(f"Error with previous assessments: {str(e)}")
+                logger.warning("Could not load previous assessments: %s", e)
     
     # Handle viewing a specific assessment
     if "viewing_assessment_id" in st.session_state:
         try:
             # Fetch the specific assessment with better error handling
-            response = supabase.table('questionnaire_responses').select('*').eq('id', st.session_state.viewing_assessment_id).execute()
+            records = cached_select('questionnaire_responses', filters={'id': st.session_state.viewing_assessment_id})
             
-            if response.data and len(response.data) > 0:
-                assessment = response.data[0]
+            if records:
+                assessment = records[0]
                 
                 with st.container():  # Change from expander to container
                 # Add a back button at the top for easier navigation
@@ -1382,7 +1931,6 @@ def mental_health_advisory():
                     # Format date - handle case where created_at might be missing
                     created_date = "Unknown date"
                     if 'created_at' in assessment and assessment['created_at']:
-                        import pandas as pd
                         created_date = pd.to_datetime(assessment['created_at']).strftime('%B %d, %Y %I:%M %p')
                     
                     st.subheader(f"Assessment from {created_date}")
@@ -1416,13 +1964,11 @@ def mental_health_advisory():
                         
                         # Create PDF with error handling
                         try:
-                            buffer = create_wellness_pdf(assessment['responses'], recommendations)
-                            
-                            st.download_button(
+                            wellness_report_download(
+                                assessment['responses'], recommendations,
                                 label="Download This Assessment",
-                                data=buffer,
                                 file_name=f"Wellness_Assessment_{created_date.replace(':', '-').replace(' ', '_')}.pdf",
-                                mime="application/pdf"
+                                key=f"assessment_pdf_{st.session_state.viewing_assessment_id}"
                             )
                         except Exception as pdf_error:
                             st.error(f"Could not generate PDF: {str(pdf_error)}")
@@ -1466,7 +2012,13 @@ def mental_health_advisory():
             with col1:
                 if st.button("Yes, Delete It", key="confirm_delete_assessment", type="primary"):
                     try:
-                        supabase.table('questionnaire_responses').delete().eq('id', st.session_state.delete_assessment_id).execute()
+                        get_repository().rpc('delete_assessment', {
+                            'p_assessment_id': st.session_state.delete_assessment_id
+                        })
+                        publish_delete(st.session_state.user.id, 'questionnaire_responses',
+                                       {'id': st.session_state.delete_assessment_id,
+                                        'user_id': st.session_state.user.id})
+                        st.session_state.assessment_history_page = 0
                         st.success("Assessment deleted successfully.")
                         
                         # Clear both viewing and delete states
@@ -1520,11 +2072,7 @@ def mental_health_advisory():
     current_questions = questions.get(current_lang, questions["en"])
     
     # Options for the rating questions - also translate these
-    rating_options = {
-        "en": ["Not at all", "Several days", "More than half the days", "Nearly every day"],
-        "es": ["En absoluto", "Varios días", "Más de la mitad de los días", "Casi todos los días"],
-        "zh": ["完全没有", "有几天", "一半以上的天数", "几乎每天"]
-    }
+    rating_options = RATING_OPTIONS
     
     sleep_options = {
         "en": ["Very poor", "Poor", "Fair", "Good", "Very good"],
@@ -1589,18 +2137,21 @@ def mental_health_advisory():
                                     'user_id': st.session_state.user.id,
                                     'responses': responses,
                                     'used_chat_history': include_chat_history,
+                                    **score_assessment(responses),
                                     'created_at': datetime.datetime.now().isoformat()  # Add timestamp
                                 }
                                 
                                 # Store in questionnaire_responses table
-                                result = supabase.table('questionnaire_responses').insert(response_data).execute()
+                                rows = get_repository().insert('questionnaire_responses', response_data)
+                                invalidate_cache('questionnaire_responses', user_id=st.session_state.user.id)
                                 
                                 # Check if insertion was successful
-                                if result and result.data:
+                                if rows:
                                     # Get the ID of the new entry to reference it later
-                                    st.session_state.latest_assessment_id = result.data[0]['id']
+                                    st.session_state.latest_assessment_id = rows[0]['id']
                                 
                                 st.session_state.questionnaire_submitted = True
+                                st.session_state.pop("assessment_recommendations", None)
                                 st.session_state.responses = responses
                                 st.session_state.include_chat_history = include_chat_history
                                 st.rerun()
@@ -1609,19 +2160,30 @@ def mental_health_advisory():
                                 
                         # If not logged in or error saving, still show recommendations
                         st.session_state.questionnaire_submitted = True
+                        st.session_state.pop("assessment_recommendations", None)
                         st.session_state.responses = responses
                         st.session_state.include_chat_history = include_chat_history
                         st.rerun()
     
     # Show recommendations if questionnaire is submitted
     if st.session_state.questionnaire_submitted:
-        # Generate personalized advice based on responses
-        with st.spinner(translations["analyzing_responses"]):
-            # Pass the chat history if requested
-            chat_history = None
-            if st.session_state.get("include_chat_history", False) and "messages" in st.session_state:
-                chat_history = st.session_state.messages    
-            recommendations = generate_recommendations(st.session_state.responses, chat_history)
+        # Generate personalized advice once per submission; the model samples, so a
+        # rerun would otherwise show (and render into the PDF) different advice
+        if "assessment_recommendations" not in st.session_state:
+            with st.spinner(translations["analyzing_responses"]):
+                # Pass the chat history if requested
+                chat_history = None
+                if st.session_state.get("include_chat_history", False) and "messages" in st.session_state:
+                    chat_history = st.session_state.messages
+                correlations = None
+                if "user" in st.session_state:
+                    try:
+                        correlations = mood_correlations(st.session_state.user.id)
+                    except Exception:
+                        pass  # Recommendations do not depend on them
+                st.session_state.assessment_recommendations = generate_recommendations(
+                    st.session_state.responses, chat_history, correlations)
+        recommendations = st.session_state.assessment_recommendations
             
         # Display recommendations
         st.success(translations["based_on_responses"])
@@ -1636,24 +2198,22 @@ def mental_health_advisory():
                     update_data = {
                         'recommendations': recommendations
                     }
-                    supabase.table('questionnaire_responses').update(update_data).eq('id', st.session_state.latest_assessment_id).execute()
+                    get_repository().update('questionnaire_responses', update_data, {'id': st.session_state.latest_assessment_id})
+                    invalidate_cache('questionnaire_responses', user_id=st.session_state.user.id)
                     st.session_state.recommendations_saved = True
             except Exception as e:
-                print(f"Could not save recommendations: {str(e)}")
+                logger.warning("Could not save recommendations: %s", e)
                 
-        # Create the PDF
-        buffer = create_wellness_pdf(st.session_state.responses, recommendations)
-        
         # Options for the user
         col1, col2 = st.columns(2)
         
         with col1:
-            # Download PDF button
-            st.download_button(
+            # Download PDF button, the PDF is only made when first asked for
+            wellness_report_download(
+                st.session_state.responses, recommendations,
                 label="Download Your Wellness Report",
-                data=buffer,
                 file_name="Animoa_Wellness_Report.pdf",
-                mime="application/pdf"
+                key="latest_assessment_pdf"
             )
         
         with col2:
@@ -1664,11 +2224,15 @@ def mental_health_advisory():
                     del st.session_state.latest_assessment_id
                 if "recommendations_saved" in st.session_state:
                     del st.session_state.recommendations_saved
+                st.session_state.pop("assessment_recommendations", None)
                 st.rerun()
         
                 
-def generate_recommendations(responses, chat_history=None):
-    """Generate personalized mental health recommendations with optional chat history"""
+def generate_recommendations(responses, chat_history=None, correlations=None):
+    """
+    Generate personalized mental health recommendations with optional chat history
+    and precomputed correlations from the user's mood, screening and chat data
+    """
     try:
         # Get the user's language preference
         user_language = responses.get('language', 'en')
@@ -1713,6 +2277,13 @@ def generate_recommendations(responses, chat_history=None):
                 role = "User" if msg["role"] == "user" else "You"
                 system_prompt += f"- {role}: {msg['content']}\n"
         
+        # Patterns found in the user's own tracking data
+        if correlations:
+            system_prompt += "\n\n## PATTERNS IN THEIR DATA\n"
+            system_prompt += "Correlations from their mood logs, screenings and chat activity (not proof of cause):\n\n"
+            for correlation in correlations[:3]:
+                system_prompt += f"- {describe(correlation)}\n"
+        
         system_prompt += f"""
         ## YOUR TASK
         Analyze these responses using clinical frameworks (like CBT principles, ACT, positive psychology) to provide personalized recommendations. Use a stepped-care approach where appropriate, focusing on self-help strategies while acknowledging when professional support may be beneficial.
@@ -1741,7 +2312,7 @@ def generate_recommendations(responses, chat_history=None):
         ]
         
         # Generate response using Groq
-        client = Groq(api_key=groq_api_key)
+        client = get_groq_client()
         completion = client.chat.completions.create(
             model="llama-3.3-70b-versatile",
             messages=messages,
@@ -1812,6 +2383,71 @@ def generate_recommendations(responses, chat_history=None):
         (We had a small technical issue: {str(e)})
         """
         
+@st.cache_resource
+def get_chart_cache():
+    """Built chart specs shared by all sessions in this process"""
+    return ResultCache()
+
+def mood_series_request(user_id):
+    """
+    Describe a read of the user's whole mood history as a MoodSeries. The daily
+    rollup rows hold just a date and a mood, so this stays small, and every time
+    range is sliced from the cached series without another fetch.
+    """
+    repository = get_repository()
+
+    def load():
+        return MoodSeries.from_rows(repository.select('mood_rollups', 'bucket, mood',
+                                                      filters={'user_id': user_id, 'grain': 'day'},
+                                                      order=[('bucket', False)]))
+
+    return dict(table='mood_rollups', loader=load, columns='series', filters={'user_id': user_id},
+                ttl=cache_ttl('mood_rollups'))
+
+@st.cache_resource
+def get_correlation_cache():
+    """Correlation results shared by all sessions, keyed by timeline version"""
+    return ResultCache(max_entries=1024)
+
+def mood_correlations(user_id, mood_series=None):
+    """
+    Notable correlations between the user's mood, screening scores and chat
+    activity over the last TIMELINE_DAYS days. The inputs are compact cached
+    reads; the correlations are computed once per timeline version.
+    """
+    from mood_correlations import TIMELINE_DAYS
+    start = (datetime.date.today() - datetime.timedelta(days=TIMELINE_DAYS)).isoformat()
+    requests = [
+        select_request('questionnaire_responses', 'created_at, phq2_score, gad2_score',
+                       filters={'user_id': user_id}, gte={'created_at': start}),
+        select_request('chat_history', 'timestamp', filters={'user_id': user_id, 'sender': 'user'},
+                       gte={'timestamp': start}),
+    ]
+    if mood_series is None:
+        requests.append(mood_series_request(user_id))
+    assessments, messages, *loaded = load_together(*requests)
+    timeline = DailyTimeline.build(mood_series if mood_series is not None else loaded[0], assessments,
+                                   [row['timestamp'] for row in messages])
+    return get_correlation_cache().get_or_build(
+        (user_id, timeline.version), lambda: notable_correlations(lagged_correlations(timeline)))
+
+def current_mood_signals(user_id, stored_rows, mood_series):
+    """
+    The user's running mood statistics. An unsynced update wins over the stored
+    row; a state that does not match the mood series (first use, logs from
+    another device, an edited past day) is rebuilt once and saved again.
+    """
+    pending = get_local_journal().pending_rows(user_id, 'mood_stats')
+    row = pending[-1] if pending else (stored_rows[0] if stored_rows else None)
+    signals, rebuilt = signals_for_series(mood_series, MoodSignals.from_row(row))
+    if rebuilt and (row is not None or len(mood_series)):
+        save_mood_signals(user_id, signals)
+    return signals
+
+def save_mood_signals(user_id, signals):
+    journal_write('mood_stats', dict(signals.to_row(user_id),
+                                     updated_at=datetime.datetime.now(datetime.timezone.utc).isoformat()))
+
 def mood_tracker():
     """Beautiful mood tracking functionality with improved UI and fixed issues"""
     # Get current language and translations
@@ -1946,21 +2582,90 @@ def mood_tracker():
     has_logged_today = False
     today_mood = None
     today_note = ""
-    today_entry_id = None
     
+    if "selected_time_range" not in st.session_state:
+        st.session_state.selected_time_range = "week"
+    if "selected_view" not in st.session_state:
+        st.session_state.selected_view = "calendar"
+    
+    # Convert range to days
+    days_lookup = {
+        "week": 7,
+        "month": 30,
+        "3months": 90,
+        "all": 9999  # Effectively all records
+    }
+    days_to_fetch = days_lookup[st.session_state.selected_time_range]
+    
+    # Trend, patterns and insights come from the user's mood series, fetched once and
+    # sliced per range. Raw logs are only read for the calendar, which shows each
+    # entry's note, and for all time only for the year it shows; other views read
+    # just today's entry.
+    mood_rows = []
+    mood_series = MoodSeries.from_rows([])
+    mood_summary = None
+    mood_signals = MoodSignals()
     if "user" in st.session_state:
+        user_id = st.session_state.user.id
         try:
-            # Check for today's mood entry
-            response = supabase.table('mood_logs').select('*').eq('user_id', st.session_state.user.id).eq('date', today).execute()
+            start_date = datetime.datetime.now() - datetime.timedelta(days=days_to_fetch)
+            start_day = start_date.strftime("%Y-%m-%d")
+            raw_start = start_day if st.session_state.selected_view == "calendar" else today
+            raw_end = None
+            if st.session_state.selected_view == "calendar" and days_to_fetch > 90:
+                # The year shown comes from the series, which is normally cached
+                mood_series, stats_rows = load_together(mood_series_request(user_id),
+                                                        select_request('mood_stats', filters={'user_id': user_id}))
+                years = series_years(mood_series) or [datetime.date.today().year]
+                year = st.session_state.get("heatmap_year")
+                year = year if year in years else years[0]
+                raw_start, raw_end = f"{year}-01-01", f"{year + 1}-01-01"
+                raw_requests = [select_request('mood_logs', filters={'user_id': user_id}, gte={'date': raw_start},
+                                               lt={'date': raw_end}, order='date')]
+                if today >= raw_end:
+                    raw_requests.append(select_request('mood_logs', filters={'user_id': user_id, 'date': today}))
+                mood_rows = [row for rows in load_together(*raw_requests) for row in rows]
+            else:
+                mood_rows, mood_series, stats_rows = load_together(
+                    select_request('mood_logs', filters={'user_id': user_id}, gte={'date': raw_start}, order='date'),
+                    mood_series_request(user_id),
+                    select_request('mood_stats', filters={'user_id': user_id}))
+
+            # Moods saved locally but not yet synced win over the stored entry for that day
+            pending_moods = {row['date']: row
+                             for row in get_local_journal().pending_rows(user_id, 'mood_logs')
+                             if row['date'] >= start_day}
+            if pending_moods:
+                mood_rows = sorted([row for row in mood_rows if row['date'] not in pending_moods]
+                                   + [row for row in pending_moods.values()
+                                      if raw_start <= row['date'] < (raw_end or '9999') or row['date'] == today],
+                                   key=lambda row: row['date'])
+                mood_series = mood_series.with_entries(list(pending_moods.values()))
+            # Daily points up to 3 months, weekly ones for all time
+            mood_summary = mood_series.since(start_day).stats(bucket_days=1 if days_to_fetch <= 90 else 7)
+            mood_signals = current_mood_signals(user_id, stats_rows, mood_series)
             
-            if response.data and len(response.data) > 0:
+            # Check for today's mood entry
+            today_rows = [row for row in mood_rows if row['date'] == today]
+            if today_rows:
                 has_logged_today = True
-                today_mood = response.data[0]['mood']
-                today_note = response.data[0].get('note', '')
-                today_entry_id = response.data[0]['id']
+                today_mood = today_rows[0]['mood']
+                today_note = today_rows[0].get('note', '')
         except Exception as e:
             st.warning(f"Could not check mood logs: {str(e)}")
     
+    # Moods have stayed below the user's usual level for a while: offer a check-in
+    if mood_signals.sustained_decline():
+        st.markdown(f"""
+        <div style="background-color: #4e79a720; padding: 15px; border-radius: 10px; margin-bottom: 20px; border-left: 5px solid #4e79a7;">
+            <p style="margin: 0;"><strong>Checking in 💙</strong> Your mood has been lower than usual for
+            {mood_signals.last_day - mood_signals.decline_since + 1} days. Talking it through might help.</p>
+        </div>
+        """, unsafe_allow_html=True)
+        if st.button("💬 Talk to Animoa", key="decline_check_in"):
+            st.session_state.menu = "Chat"
+            st.rerun()
+    
     # Display previous mood if logged today
     if has_logged_today and "edit_mood" not in st.session_state:
         mood_data = moods[today_mood]
@@ -2040,21 +2745,19 @@ def mood_tracker():
             with save_col2:
                 if st.button("Save", type="primary", use_container_width=True):
                     try:
-                        # Check if updating or creating
-                        if today_entry_id:
-                            # Update existing entry
-                            supabase.table('mood_logs').update({
-                                'mood': selected_mood,
-                                'note': mood_note
-                            }).eq('id', today_entry_id).execute()
-                        else:
-                            # Create new entry
-                            supabase.table('mood_logs').insert({
-                                'user_id': st.session_state.user.id,
-                                'date': today,
-                                'mood': selected_mood,
-                                'note': mood_note
-                            }).execute()
+                        # One mood per day: saving creates today's entry or replaces it when synced
+                        journal_write('mood_logs', {
+                            'user_id': st.session_state.user.id,
+                            'date': today,
+                            'mood': selected_mood,
+                            'note': mood_note
+                        })
+                        # Running statistics take the new log in O(1); a replaced earlier day needs a rebuild
+                        updated = mood_signals.record(day_number(today), mood_data['value'])
+                        if updated is None:
+                            updated = MoodSignals.rebuild(mood_series.with_entries(
+                                [{'date': today, 'mood': selected_mood}]))
+                        save_mood_signals(st.session_state.user.id, updated)
                         
                         # Reset selected mood and edit mode and show success
                         st.session_state.selected_mood = None
@@ -2076,13 +2779,6 @@ def mood_tracker():
     st.markdown("---")
     st.markdown("### Your Mood Journey")
     
-    # Initialize session state variables if they don't exist
-    if "selected_time_range" not in st.session_state:
-        st.session_state.selected_time_range = "week"
-        
-    if "selected_view" not in st.session_state:
-        st.session_state.selected_view = "calendar"
-    
     # Custom dropdowns for display options and time range
     col1, col2 = st.columns(2)
 
@@ -2127,177 +2823,85 @@ def mood_tracker():
             st.session_state.selected_time_range = selected_range
             st.rerun()
         
-    # Convert range to days
-    days_lookup = {
-        "week": 7,
-        "month": 30,
-        "3months": 90,
-        "all": 9999  # Effectively all records
-    }
-    days_to_fetch = days_lookup[st.session_state.selected_time_range]
-    
     try:
-        # Get date range
-        end_date = datetime.datetime.now()
-        start_date = end_date - datetime.timedelta(days=days_to_fetch)
-        
-        # Fetch mood history for selected range
-        response = supabase.table('mood_logs').select('*')\
-            .eq('user_id', st.session_state.user.id)\
-            .gte('date', start_date.strftime("%Y-%m-%d"))\
-            .order('date', desc=False).execute()
-        
-        if response.data and len(response.data) > 0:
-            # Import pandas for data manipulation
-            import pandas as pd
+        if mood_summary is not None and mood_summary.total_count:
             import altair as alt
             
-            # Prepare data for visualization
-            df = pd.DataFrame(response.data)
-            df['date'] = pd.to_datetime(df['date'])
-            df['mood_value'] = df['mood'].map(lambda x: moods[x]['value'])
-            df['mood_emoji'] = df['mood'].map(lambda x: moods[x]['emoji'])
-            df['mood_label'] = df['mood'].map(lambda x: moods[x]['label'])
-            df['mood_color'] = df['mood'].map(lambda x: moods[x]['color'])
-            df['day'] = df['date'].dt.strftime('%a, %b %d')
+            # Display fields per mood code, indexed with arrays of codes instead of per-row lookups
+            mood_emojis = mood_lookup(moods, 'emoji')
+            mood_labels = mood_lookup(moods, 'label')
+            mood_colors = mood_lookup(moods, 'color')
             
             # Draw appropriate visualization based on selected view
             if st.session_state.selected_view == "calendar":
                 st.markdown("<div style='height: 20px;'></div>", unsafe_allow_html=True)
                 
-                # Group by month if showing more than a week
-                if days_to_fetch > 7:
-                    df['month'] = df['date'].dt.strftime('%B %Y')
-                    months = df['month'].unique()
-                    
-                    for month in months:
-                        st.markdown(f"#### {month}")
-                        month_data = df[df['month'] == month]
-                        
-                        # Create weekly calendar rows
-                        for i in range(0, len(month_data), 7):
-                            week_data = month_data.iloc[i:min(i+7, len(month_data))]
-                            cols = st.columns(7)
-                            
-                            for j, (_, row) in enumerate(week_data.iterrows()):
-                                if j < len(cols):
-                                    with cols[j]:
-                                        day = row['date'].strftime('%d')
-                                        emoji = row['mood_emoji']
-                                        note = row.get('note', '')
-                                        note_preview = note[:20] + '...' if note and len(note) > 20 else note
-                                        
-                                        st.markdown(f"""
-                                        <div class="mood-calendar-day" style="background-color: {row['mood_color']};">
-                                            <div class="calendar-date">{day}</div>
-                                            <div class="calendar-emoji">{emoji}</div>
-                                            <div class="calendar-note">{note_preview}</div>
-                                        </div>
-                                        """, unsafe_allow_html=True)
-                                        
-                                        # Add popup to view full note if present
-                                        if note and st.button("View", key=f"view_note_{row['id']}"):
-                                            st.session_state.viewing_note = row['id']
-                                            st.session_state.note_content = note
-                                            st.session_state.note_date = row['date'].strftime('%A, %B %d')
-                                            st.session_state.note_mood = row['mood_label']
-                                            st.rerun()
+                # The calendar is one HTML payload whatever the range: day cells up to
+                # 3 months, a heatmap of one year at a time beyond that
+                end_date = datetime.date.today()
+                noted = [row for row in mood_rows if row.get('note')]
+                if days_to_fetch > 90:
+                    year = st.selectbox("Year:", options=series_years(mood_series), key="heatmap_year")
+                    st.markdown(year_heatmap_svg(mood_series, year, moods), unsafe_allow_html=True)
+                    noted = [row for row in noted if str(row['date']).startswith(str(year))]
                 else:
-                    # Just show the week view
-                    cols = st.columns(min(7, len(df)))
-                    
-                    for i, (_, row) in enumerate(df.iterrows()):
-                        if i < len(cols):
-                            with cols[i]:
-                                day = row['date'].strftime('%a\n%b %d')
-                                emoji = row['mood_emoji']
-                                note = row.get('note', '')
-                                note_preview = note[:20] + '...' if note and len(note) > 20 else note
-                                
-                                st.markdown(f"""
-                                <div class="mood-calendar-day" style="background-color: {row['mood_color']};">
-                                    <div class="calendar-date">{day}</div>
-                                    <div class="calendar-emoji">{emoji}</div>
-                                    <div class="calendar-note">{note_preview}</div>
-                                </div>
-                                """, unsafe_allow_html=True)
-                                
-                                # Add popup to view full note if present
-                                if note and st.button("View", key=f"view_note_{row['id']}"):
-                                    st.session_state.viewing_note = row['id']
-                                    st.session_state.note_content = note
-                                    st.session_state.note_date = row['date'].strftime('%A, %B %d')
-                                    st.session_state.note_mood = row['mood_label']
-                                    st.rerun()
+                    start = end_date - datetime.timedelta(days=days_to_fetch - 1)
+                    st.markdown(calendar_html(mood_rows, moods, start, end_date), unsafe_allow_html=True)
                 
-                # Note popup/modal
-                if "viewing_note" in st.session_state:
-                    with st.expander(f"Journal Entry: {st.session_state.note_date} - {st.session_state.note_mood}", expanded=True):
-                        st.markdown(f"**{st.session_state.note_date}**")
-                        st.write(st.session_state.note_content)
-                        if st.button("Close", key="close_note"):
-                            del st.session_state.viewing_note
-                            st.rerun()
+                # One selection widget opens any day's journal entry
+                if noted:
+                    notes_by_date = {str(row['date'])[:10]: row for row in reversed(noted)}
+                    selected_date = st.selectbox(
+                        "Journal entries:",
+                        options=[None] + list(notes_by_date),
+                        format_func=lambda d: "Select a day to read its note" if d is None else
+                            f"{moods[notes_by_date[d]['mood']]['emoji']} "
+                            f"{datetime.date.fromisoformat(d).strftime('%A, %B %d, %Y')}",
+                        key="note_selector"
+                    )
+                    if selected_date is not None:
+                        entry = notes_by_date[selected_date]
+                        entry_day = datetime.date.fromisoformat(selected_date).strftime('%A, %B %d')
+                        with st.expander(f"Journal Entry: {entry_day} - {moods[entry['mood']]['label']}", expanded=True):
+                            st.markdown(f"**{entry_day}**")
+                            st.write(entry['note'])
             
             elif st.session_state.selected_view == "trend":
-                # Create a more visually appealing line chart
-                df['day_num'] = range(len(df))
-                
-                # Basic chart with improved styling
-                line_chart = alt.Chart(df).mark_line(
-                    point=True,
-                    strokeWidth=3,
-                    interpolate='monotone'
-                ).encode(
-                    x=alt.X('date:T', title='Date'),
-                    y=alt.Y('mood_value:Q', 
-                            title='Mood',
-                            scale=alt.Scale(domain=[1, 5]),
-                            axis=alt.Axis(
-                                values=[1, 2, 3, 4, 5],
-                                labelExpr="datum.value == 1 ? 'Very Sad' : datum.value == 2 ? 'Sad' : datum.value == 3 ? 'Neutral' : datum.value == 4 ? 'Happy' : 'Very Happy'"
-                            )),
-                    color=alt.value('#4e79a7'),
-                    tooltip=['day:N', 'mood_label:N', 'note:N']
-                ).properties(
-                    width='container',
-                    height=350
-                ).interactive()
-                
-                # Add points with mood emoji
-                points = alt.Chart(df).mark_point(
-                    size=100,
-                    filled=True
-                ).encode(
-                    x='date:T',
-                    y='mood_value:Q',
-                    color=alt.Color('mood_color:N', scale=None),
-                    tooltip=['day:N', 'mood_label:N']
-                )
-                
-                # Combine and display
-                st.altair_chart(line_chart + points, use_container_width=True)
+                # One point per day, or per week for all time, downsampled to a fixed point
+                # budget. Specs are cached by data version, so unchanged data is never rebuilt.
+                # The range start moves each day even when the data has not changed
+                chart_key = (user_id, st.session_state.selected_time_range, start_day, mood_series.version)
+                spec = get_chart_cache().get_or_build(chart_key, lambda: trend_spec(mood_summary, moods))
+                st.vega_lite_chart(spec, use_container_width=True)
                 
                 # Add trend analysis in a card - now with adaptive colors
-                if len(df) > 1:
-                    recent_avg = df['mood_value'].tail(min(3, len(df))).mean()
-                    overall_avg = df['mood_value'].mean()
+                if mood_summary.total_count > 1:
+                    recent_avg = mood_summary.recent_average()
+                    overall_avg = mood_summary.average
                     
                     trend = "improving" if recent_avg > overall_avg + 0.3 else \
                             "declining" if recent_avg < overall_avg - 0.3 else "stable"
                     
                     # Calculate most frequent mood in selected period
-                    freq_mood = df['mood_label'].value_counts().index[0]
-                    freq_emoji = df.loc[df['mood_label'] == freq_mood, 'mood_emoji'].iloc[0]
+                    freq_key = mood_summary.most_common_mood()
+                    freq_mood = moods[freq_key]['label']
+                    freq_emoji = moods[freq_key]['emoji']
                     
                     trend_color = '#28a745' if trend == 'improving' else '#dc3545' if trend == 'declining' else '#ffc107'
                     
+                    # Current figures from the running statistics, whatever the selected period
+                    streak = mood_signals.streak_on(datetime.date.today())
+                    swings = "steady" if mood_signals.volatility < 0.6 else \
+                             "some ups and downs" if mood_signals.volatility < 1.2 else "large swings"
+                    
                     insight_text = f"""
                     <div class="insights-card">
                         <h4 style="color: #31505E;">Mood Insights</h4>
                         <p style="color: #31505E;"><strong>Trend:</strong> Your mood has been <span style="color: {trend_color};">{trend}</span> during this period.</p>
                         <p style="color: #31505E;"><strong>Most common mood:</strong> {freq_emoji} {freq_mood}</p>
                         <p style="color: #31505E;"><strong>Average mood:</strong> {overall_avg:.1f}/5</p>
+                        <p style="color: #31505E;"><strong>Logging streak:</strong> {streak} day{'' if streak == 1 else 's'} (best: {mood_signals.longest_streak or 0})</p>
+                        <p style="color: #31505E;"><strong>Lately:</strong> your mood has been {swings}.</p>
                     </div>
                     """
                     st.markdown(insight_text, unsafe_allow_html=True)
@@ -2307,16 +2911,14 @@ def mood_tracker():
                 st.markdown("#### Your Mood Distribution")
                 
                 # Count moods and create dataframe for visualization
-                mood_counts = df['mood'].value_counts().reset_index()
-                mood_counts.columns = ['mood', 'count']
-                mood_counts['emoji'] = mood_counts['mood'].map(lambda x: moods[x]['emoji'])
-                mood_counts['label'] = mood_counts['mood'].map(lambda x: moods[x]['label'])
-                mood_counts['color'] = mood_counts['mood'].map(lambda x: moods[x]['color'])
-                
-                # Sort by mood value for consistent order
-                mood_value_map = {k: v['value'] for k, v in moods.items()}
-                mood_counts['value'] = mood_counts['mood'].map(mood_value_map)
-                mood_counts = mood_counts.sort_values('value', ascending=False)
+                # Moods that occurred, happiest first for a consistent order
+                codes = np.flatnonzero(mood_summary.counts_by_code)[::-1]
+                mood_counts = pd.DataFrame({
+                    'count': mood_summary.counts_by_code[codes],
+                    'emoji': mood_emojis[codes],
+                    'label': mood_labels[codes],
+                    'color': mood_colors[codes],
+                })
                 
                 # Create bar chart with emoji labels and HORIZONTAL text orientation
                 bars = alt.Chart(mood_counts).mark_bar().encode(
@@ -2343,18 +2945,15 @@ def mood_tracker():
                 st.altair_chart(bars + text, use_container_width=True)
                 
                 # Weekly patterns section
-                if len(df) >= 7:
+                if mood_summary.total_count >= 7:
                     st.markdown("#### Weekly Patterns")
                     
-                    # Add day of week and create aggregation
-                    df['day_of_week'] = df['date'].dt.dayofweek
-                    df['day_name'] = df['date'].dt.day_name()
-                    
-                    # Get average mood by day of week
-                    day_avg = df.groupby(['day_of_week', 'day_name'])['mood_value'].mean().reset_index()
-                    
-                    # Sort by day of week
-                    day_avg = day_avg.sort_values('day_of_week')
+                    # Average mood by day of week, already aggregated in the rollups
+                    day_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+                    day_avg = pd.DataFrame([
+                        {'day_of_week': weekday, 'day_name': day_names[weekday], 'mood_value': average}
+                        for weekday, average in mood_summary.weekday_averages.items()
+                    ])
                     
                     # Create day of week visualization with HORIZONTAL labels
                     day_chart = alt.Chart(day_avg).mark_bar().encode(
@@ -2394,6 +2993,14 @@ def mood_tracker():
                             <p style="color: rgba(255, 255, 255, 0.9);">Average mood: {worst_day['mood_value']:.1f}/5</p>
                         </div>
                         """, unsafe_allow_html=True)
+                
+                # How mood moves with screenings and chat activity, from cached correlations
+                correlations = mood_correlations(user_id, mood_series)
+                if correlations:
+                    st.markdown("#### What Goes With Your Mood")
+                    for correlation in correlations:
+                        st.markdown(f"- {describe(correlation)}")
+                    st.caption("Patterns in your own data over the last 6 months, not causes.")
         else:
             # No data available
             st.info("Start tracking your mood to see patterns and insights here.")
@@ -2481,7 +3088,7 @@ def show_logout_feedback_form():
                                 'session_type': 'logout',
                                 'user_id': st.session_state.user.id if "user" in st.session_state else None
                             }
-                            supabase.table('user_feedback').insert(feedback_data).execute()
+                            get_repository().insert('user_feedback', feedback_data)
                         except:
                             pass
                     
@@ -2531,8 +3138,8 @@ def about_section():
     # Data privacy 
     st.info("""
     **Data Privacy**: Your privacy matters to us. Animoa stores your conversations securely to provide personalized 
-    support, but never shares your personal information with third parties. You can delete your data at any time 
-    from your profile settings.
+    support, but never shares your personal information with third parties. You can download or delete your data 
+    at any time from your profile settings.
     """)
     
     # Features section
@@ -2610,33 +3217,54 @@ def about_section():
                         feedback_data['user_id'] = st.session_state.user.id
                     
                     # Save to database
-                    supabase.table('user_feedback').insert(feedback_data).execute()
+                    get_repository().insert('user_feedback', feedback_data)
                     
                     st.success(translations.get("feedback_received", "Thank you for your feedback!"))
                 except Exception as e:
                     st.error(f"Error saving feedback: {str(e)}")
 
+def log_rerun():
+    """Log how many requests this rerun sent to the database, at debug level"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    auth_summary = st.session_state.auth_session.summary() if "auth_session" in st.session_state else "auth_ms=-"
+    logger.debug("[db] rerun round_trips=%d %s cache: %s", get_round_trip_counter().count, auth_summary,
+                 get_query_cache().summary())
+
 def main():
-    # Restore Supabase session with retry logic , if tokens exist
+    try:
+        render()
+    finally:
+        # st.rerun() and st.stop() end a rerun by raising, those reruns are logged too
+        log_rerun()
+
+def render():
+    # Count database round-trips made by this rerun
+    st.session_state.round_trips = RoundTripCounter()
+
+    # Keep the Supabase session valid. While the token is still valid this is local;
+    # it refreshes in the background near expiry and only blocks once it has expired.
     if "access_token" in st.session_state and "refresh_token" in st.session_state:
-        max_retries = 3
-        retry_delay = 1  # seconds
-        for attempt in range(max_retries):
-            try:
-                supabase.auth.set_session(
-                    st.session_state.access_token, st.session_state.refresh_token
-                )
-                break  # If successful, exit the loop
-            except AuthRetryableError as e:
-                st.warning(
-                    f"Connection to authentication service failed (attempt {attempt + 1}/{max_retries}). Retrying..."
-                )
-                time.sleep(retry_delay)
-        else:  # If the loop completes without breaking (all retries failed)
+        if "auth_session" not in st.session_state:
+            st.session_state.auth_session = SessionManager(st.session_state.access_token,
+                                                           st.session_state.refresh_token)
+        auth_session = st.session_state.auth_session
+        try:
+            auth_session.ensure(get_supabase())
+        except AuthRetryableError:
             st.error(
                 "Failed to connect to authentication service. Please check your internet connection and try again."
             )
             st.stop()  # Stop further execution (optional, might want to redirect to login)
+        # Tokens may have been refreshed
+        st.session_state.access_token = auth_session.access_token
+        st.session_state.refresh_token = auth_session.refresh_token
+
+    # Retry writes left in the local journal and pick up syncs that finished
+    if "user" in st.session_state:
+        refresh_after_sync()
+        sync_journal()
+        watch_changes()
 
     # Set default language if not set
     if "language" not in st.session_state:
@@ -2657,9 +3285,11 @@ def main():
         if should_logout:
             # Clear the session in Supabase
             try:
-                supabase.auth.sign_out()
+                get_supabase().auth.sign_out()
             except:
                 pass
+            unwatch_changes()
+            release_supabase()
             # Clear session state
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
@@ -2669,11 +3299,13 @@ def main():
         st.stop()
     
     # Check if user is logged in
-    is_logged_in = auth_ui(supabase)
+    is_logged_in = auth_ui(get_supabase())
     
     if not is_logged_in:
         # Show info for non-logged in users
         st.stop()
+
+    show_rejected_writes()
     
     # If menu not in session state, default to Chat
     if "menu" not in st.session_state:
@@ -2717,7 +3349,7 @@ def main():
         
     # Display the selected page
     if st.session_state.menu == "Profile":
-        profile_manager(supabase)
+        profile_manager(get_supabase())
     elif st.session_state.menu == "Chat":
         chatbot = MentalHealthChatbot()
         chatbot.run()
@@ -2728,6 +3360,9 @@ def main():
     elif st.session_state.menu == "Mood":
         mood_tracker()
     
+    search_section()
+    export_section()
+    
     # Add the logout button to sidebar with the new feedback form
     # Add this at the end of the main function
     with st.sidebar:
@@ -2741,6 +3376,6 @@ def main():
         if st.button("👋 " + translations["logout"], key="sidebar_logout_main", use_container_width=True):
             st.session_state.show_logout_feedback = True
             st.rerun()
-            
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
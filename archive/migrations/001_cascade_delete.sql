@@ -0,0 +1,117 @@
+-- Server-side cascade deletes for Animoa user data.
+--
+-- Each function runs as one statement from the client (supabase.rpc), so the
+-- whole delete is a single round-trip and a single transaction: either every
+-- row goes or none does. Rows are always scoped to auth.uid(), so a user can
+-- only ever delete their own data.
+--
+-- For a local Postgres stand-in without Supabase auth, create the shim below
+-- and set the caller with: SET animoa.user_id = '<uuid>';
+--
+--   CREATE SCHEMA IF NOT EXISTS auth;
+--   CREATE OR REPLACE FUNCTION auth.uid() RETURNS uuid
+--     LANGUAGE sql STABLE AS $$ SELECT current_setting('animoa.user_id')::uuid $$;
+
+-- Messages belong to their session: deleting a session removes its messages
+ALTER TABLE chat_history DROP CONSTRAINT IF EXISTS chat_history_session_id_fkey;
+ALTER TABLE chat_history
+    ADD CONSTRAINT chat_history_session_id_fkey
+    FOREIGN KEY (session_id) REFERENCES chat_sessions(id) ON DELETE CASCADE;
+
+-- Indexes used by the per-user deletes below
+CREATE INDEX IF NOT EXISTS chat_history_session_id_idx ON chat_history (session_id);
+CREATE INDEX IF NOT EXISTS chat_history_user_id_idx ON chat_history (user_id);
+CREATE INDEX IF NOT EXISTS chat_sessions_user_id_idx ON chat_sessions (user_id);
+CREATE INDEX IF NOT EXISTS mood_logs_user_id_idx ON mood_logs (user_id);
+CREATE INDEX IF NOT EXISTS questionnaire_responses_user_id_idx ON questionnaire_responses (user_id);
+CREATE INDEX IF NOT EXISTS user_feedback_user_id_idx ON user_feedback (user_id);
+
+
+-- Delete one chat session and all of its messages
+CREATE OR REPLACE FUNCTION delete_chat_session(p_session_id uuid)
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    deleted integer;
+BEGIN
+    DELETE FROM chat_sessions
+    WHERE id = p_session_id AND user_id = auth.uid();
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    RETURN deleted;
+END;
+$$;
+
+
+-- Delete one assessment
+CREATE OR REPLACE FUNCTION delete_assessment(p_assessment_id uuid)
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    deleted integer;
+BEGIN
+    DELETE FROM questionnaire_responses
+    WHERE id = p_assessment_id AND user_id = auth.uid();
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    RETURN deleted;
+END;
+$$;
+
+
+-- Delete everything stored for the calling user, keeping the auth account.
+-- Returns the number of rows removed from each table.
+CREATE OR REPLACE FUNCTION delete_all_user_data()
+RETURNS jsonb
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    uid uuid := auth.uid();
+    counts jsonb := '{}'::jsonb;
+    deleted integer;
+BEGIN
+    IF uid IS NULL THEN
+        RAISE EXCEPTION 'Not authenticated';
+    END IF;
+
+    -- Messages without a session would be missed by the cascade, delete by owner
+    DELETE FROM chat_history WHERE user_id = uid;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    counts := counts || jsonb_build_object('chat_history', deleted);
+
+    DELETE FROM chat_sessions WHERE user_id = uid;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    counts := counts || jsonb_build_object('chat_sessions', deleted);
+
+    DELETE FROM mood_logs WHERE user_id = uid;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    counts := counts || jsonb_build_object('mood_logs', deleted);
+
+    DELETE FROM questionnaire_responses WHERE user_id = uid;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    counts := counts || jsonb_build_object('questionnaire_responses', deleted);
+
+    DELETE FROM user_feedback WHERE user_id = uid;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    counts := counts || jsonb_build_object('user_feedback', deleted);
+
+    DELETE FROM profiles WHERE id = uid;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    counts := counts || jsonb_build_object('profiles', deleted);
+
+    RETURN counts;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION delete_chat_session(uuid) FROM PUBLIC;
+REVOKE ALL ON FUNCTION delete_assessment(uuid) FROM PUBLIC;
+REVOKE ALL ON FUNCTION delete_all_user_data() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION delete_chat_session(uuid) TO authenticated;
+GRANT EXECUTE ON FUNCTION delete_assessment(uuid) TO authenticated;
+GRANT EXECUTE ON FUNCTION delete_all_user_data() TO authenticated;
@@ -0,0 +1,31 @@
+-- Compact summary columns for listing past assessments.
+--
+-- The history list only needs a date, the PHQ-2/GAD-2 scores and the mood
+-- answer, so it reads these small fixed-size columns instead of the full
+-- responses JSON and recommendations text. The app fills them on insert;
+-- this migration backfills existing rows.
+
+ALTER TABLE questionnaire_responses ADD COLUMN IF NOT EXISTS phq2_score smallint;
+ALTER TABLE questionnaire_responses ADD COLUMN IF NOT EXISTS gad2_score smallint;
+ALTER TABLE questionnaire_responses ADD COLUMN IF NOT EXISTS mood text;
+
+CREATE INDEX IF NOT EXISTS questionnaire_responses_user_created_idx
+    ON questionnaire_responses (user_id, created_at DESC);
+
+-- Score one PHQ/GAD answer (0-3) in any supported language
+CREATE OR REPLACE FUNCTION animoa_rating_score(answer text)
+RETURNS smallint
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE answer
+        WHEN 'Not at all' THEN 0 WHEN 'En absoluto' THEN 0 WHEN '完全没有' THEN 0
+        WHEN 'Several days' THEN 1 WHEN 'Varios días' THEN 1 WHEN '有几天' THEN 1
+        WHEN 'More than half the days' THEN 2 WHEN 'Más de la mitad de los días' THEN 2 WHEN '一半以上的天数' THEN 2
+        WHEN 'Nearly every day' THEN 3 WHEN 'Casi todos los días' THEN 3 WHEN '几乎每天' THEN 3
+    END::smallint
+$$;
+
+UPDATE questionnaire_responses SET
+    phq2_score = animoa_rating_score(responses->>'mood') + animoa_rating_score(responses->>'interest'),
+    gad2_score = animoa_rating_score(responses->>'anxiety') + animoa_rating_score(responses->>'worry'),
+    mood = responses->>'mood'
+WHERE phq2_score IS NULL AND responses IS NOT NULL;
@@ -0,0 +1,28 @@
+-- Idempotency keys for writes synced from the local journal.
+--
+-- Mood logs and chat messages are first written to a journal on the app
+-- server and uploaded later, possibly more than once after a timeout or a
+-- restart. Each write carries a client-generated UUID so uploads are upserts:
+-- chat messages conflict on client_id, mood logs on the existing
+-- (user_id, date) rule of one mood per day.
+
+ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS client_id uuid;
+ALTER TABLE mood_logs ADD COLUMN IF NOT EXISTS client_id uuid;
+
+-- A full unique index (not a partial one) so PostgREST upserts can target it
+CREATE UNIQUE INDEX IF NOT EXISTS chat_history_client_id_key ON chat_history (client_id);
+
+-- Required for on_conflict=user_id,date; skip if the constraint already exists
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'mood_logs'::regclass AND contype = 'u'
+          AND conkey = ARRAY[
+              (SELECT attnum FROM pg_attribute WHERE attrelid = 'mood_logs'::regclass AND attname = 'user_id'),
+              (SELECT attnum FROM pg_attribute WHERE attrelid = 'mood_logs'::regclass AND attname = 'date')
+          ]::smallint[]
+    ) THEN
+        ALTER TABLE mood_logs ADD CONSTRAINT mood_logs_user_id_date_key UNIQUE (user_id, date);
+    END IF;
+END $$;
@@ -0,0 +1,151 @@
+-- Cold storage for inactive chat sessions.
+--
+-- The archival job (python chat_archive.py) moves the messages of sessions
+-- with no activity for N days out of chat_history into one gzip-compressed
+-- JSONL blob per session, so the hot table and its indexes only hold recent
+-- conversations. The app restores a session into chat_history the first time
+-- it is opened again.
+
+-- Last activity per session, kept up to date by a trigger so the job can
+-- find inactive sessions without scanning chat_history
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS last_message_at timestamptz;
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS archived_at timestamptz;
+
+UPDATE chat_sessions s
+SET last_message_at = m.last_message_at
+FROM (SELECT session_id, max(timestamp) AS last_message_at FROM chat_history GROUP BY session_id) m
+WHERE m.session_id = s.id AND s.last_message_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS chat_sessions_inactive_idx
+    ON chat_sessions (last_message_at) WHERE archived_at IS NULL;
+
+CREATE OR REPLACE FUNCTION chat_sessions_touch()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE chat_sessions
+    SET last_message_at = NEW.timestamp
+    WHERE id = NEW.session_id
+      AND (last_message_at IS NULL OR last_message_at < NEW.timestamp);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS chat_history_touch_session ON chat_history;
+CREATE TRIGGER chat_history_touch_session
+    AFTER INSERT ON chat_history
+    FOR EACH ROW WHEN (NEW.session_id IS NOT NULL)
+    EXECUTE FUNCTION chat_sessions_touch();
+
+-- One compressed blob per archived session (base64 text of gzip JSONL)
+CREATE TABLE IF NOT EXISTS chat_archives (
+    session_id uuid PRIMARY KEY REFERENCES chat_sessions(id) ON DELETE CASCADE,
+    user_id uuid NOT NULL,
+    payload text NOT NULL,
+    message_count integer NOT NULL,
+    last_message_at timestamptz,
+    archived_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS chat_archives_user_id_idx ON chat_archives (user_id);
+
+ALTER TABLE chat_archives ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS chat_archives_owner_select ON chat_archives;
+CREATE POLICY chat_archives_owner_select ON chat_archives
+    FOR SELECT USING (user_id = auth.uid());
+
+
+-- Move one session's messages into its archive blob in a single transaction.
+-- Does nothing (returns 0) if the session changed after the job read it: a
+-- message newer than p_last_message_at, or a different number of messages,
+-- e.g. one synced late from a journal with an older timestamp. Callable by
+-- the owner or the service role.
+CREATE OR REPLACE FUNCTION archive_chat_session(p_session_id uuid, p_payload text,
+                                                p_message_count integer, p_last_message_at timestamptz)
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    owner uuid;
+    stored_count integer;
+    deleted integer;
+BEGIN
+    SELECT user_id INTO owner FROM chat_sessions WHERE id = p_session_id FOR UPDATE;
+    IF owner IS NULL OR (owner IS DISTINCT FROM auth.uid() AND auth.role() <> 'service_role') THEN
+        RETURN 0;
+    END IF;
+    IF EXISTS (SELECT 1 FROM chat_history
+               WHERE session_id = p_session_id AND timestamp > p_last_message_at) THEN
+        RETURN 0;
+    END IF;
+    -- The session row is locked, so no message can be added until the delete
+    SELECT count(*) INTO stored_count FROM chat_history WHERE session_id = p_session_id;
+    IF stored_count <> p_message_count THEN
+        RETURN 0;
+    END IF;
+
+    DELETE FROM chat_history WHERE session_id = p_session_id;
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+
+    INSERT INTO chat_archives (session_id, user_id, payload, message_count, last_message_at)
+    VALUES (p_session_id, owner, p_payload, p_message_count, p_last_message_at)
+    ON CONFLICT (session_id) DO UPDATE
+        SET payload = EXCLUDED.payload, message_count = EXCLUDED.message_count,
+            last_message_at = EXCLUDED.last_message_at, archived_at = now();
+    UPDATE chat_sessions SET archived_at = now() WHERE id = p_session_id;
+    RETURN deleted;
+END;
+$$;
+
+
+-- Put an archived session's messages back into chat_history and drop the blob.
+-- p_rows is the decompressed list of chat_history rows. Postgres cannot read
+-- the gzip payload, so the rows are checked against the archive's stored
+-- message count, and the blob is only dropped once all of them are back; an
+-- empty or truncated p_rows raises and leaves the archive as it was.
+CREATE OR REPLACE FUNCTION restore_chat_session(p_session_id uuid, p_rows jsonb)
+RETURNS integer
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    expected integer;
+    supplied integer;
+    restored integer;
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM chat_sessions WHERE id = p_session_id AND user_id = auth.uid()) THEN
+        RETURN 0;
+    END IF;
+
+    SELECT message_count INTO expected FROM chat_archives WHERE session_id = p_session_id FOR UPDATE;
+    IF NOT FOUND THEN
+        -- Restored already
+        UPDATE chat_sessions SET archived_at = NULL WHERE id = p_session_id;
+        RETURN 0;
+    END IF;
+    SELECT count(DISTINCT r.id) INTO supplied
+    FROM jsonb_populate_recordset(NULL::chat_history, p_rows) r
+    WHERE r.session_id = p_session_id AND r.user_id = auth.uid();
+    IF supplied <> expected THEN
+        RAISE EXCEPTION 'Restore of session % got % of its % archived messages', p_session_id, supplied, expected;
+    END IF;
+
+    INSERT INTO chat_history
+    SELECT * FROM jsonb_populate_recordset(NULL::chat_history, p_rows) r
+    WHERE r.session_id = p_session_id AND r.user_id = auth.uid()
+    ON CONFLICT (id) DO NOTHING;
+    GET DIAGNOSTICS restored = ROW_COUNT;
+
+    DELETE FROM chat_archives WHERE session_id = p_session_id;
+    UPDATE chat_sessions SET archived_at = NULL WHERE id = p_session_id;
+    RETURN restored;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION archive_chat_session(uuid, text, integer, timestamptz) FROM PUBLIC;
+REVOKE ALL ON FUNCTION restore_chat_session(uuid, jsonb) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION archive_chat_session(uuid, text, integer, timestamptz) TO authenticated, service_role;
+GRANT EXECUTE ON FUNCTION restore_chat_session(uuid, jsonb) TO authenticated;
@@ -0,0 +1,111 @@
+-- Per-user mood aggregates, maintained incrementally from mood_logs.
+--
+-- The mood page reads the daily rows (a date and a mood each) instead of raw
+-- logs with their notes; weekly and monthly rows answer long-range questions
+-- in O(periods) rows. A trigger applies each insert, edit and delete of a mood
+-- log as +1/-1 deltas.
+--
+-- grain          bucket        weekday  mood
+-- day            the date      0-6      the mood
+-- week           Monday        -1       the mood
+-- month          1st of month  -1       the mood
+-- month_weekday  1st of month  0-6      ''  (all moods)
+--
+-- Weekdays run Monday=0 ... Sunday=6. value_sum adds mood values 1-5.
+
+CREATE TABLE IF NOT EXISTS mood_rollups (
+    user_id uuid NOT NULL,
+    grain text NOT NULL,
+    bucket date NOT NULL,
+    weekday smallint NOT NULL,
+    mood text NOT NULL,
+    count integer NOT NULL,
+    value_sum integer NOT NULL,
+    PRIMARY KEY (user_id, grain, bucket, weekday, mood)
+);
+
+ALTER TABLE mood_rollups ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS mood_rollups_owner_select ON mood_rollups;
+CREATE POLICY mood_rollups_owner_select ON mood_rollups
+    FOR SELECT USING (user_id = auth.uid());
+
+CREATE OR REPLACE FUNCTION animoa_mood_value(mood text)
+RETURNS integer
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE mood
+        WHEN 'very_happy' THEN 5 WHEN 'happy' THEN 4 WHEN 'neutral' THEN 3
+        WHEN 'sad' THEN 2 WHEN 'very_sad' THEN 1 ELSE 0
+    END
+$$;
+
+-- Add (p_sign = 1) or remove (p_sign = -1) one mood log from the rollups
+CREATE OR REPLACE FUNCTION mood_rollups_apply(p_user_id uuid, p_date date, p_mood text, p_sign integer)
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v integer := p_sign * animoa_mood_value(p_mood);
+    wd smallint := extract(isodow FROM p_date)::smallint - 1;
+    week_start date := date_trunc('week', p_date)::date;
+    month_start date := date_trunc('month', p_date)::date;
+BEGIN
+    INSERT INTO mood_rollups AS r (user_id, grain, bucket, weekday, mood, count, value_sum)
+    VALUES (p_user_id, 'day', p_date, wd, p_mood, p_sign, v),
+           (p_user_id, 'week', week_start, -1, p_mood, p_sign, v),
+           (p_user_id, 'month', month_start, -1, p_mood, p_sign, v),
+           (p_user_id, 'month_weekday', month_start, wd, '', p_sign, v)
+    ON CONFLICT (user_id, grain, bucket, weekday, mood) DO UPDATE
+        SET count = r.count + EXCLUDED.count, value_sum = r.value_sum + EXCLUDED.value_sum;
+
+    IF p_sign < 0 THEN
+        DELETE FROM mood_rollups
+        WHERE user_id = p_user_id AND bucket IN (p_date, week_start, month_start) AND count <= 0;
+    END IF;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION mood_logs_rollup()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM mood_rollups_apply(OLD.user_id, OLD.date::date, OLD.mood, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM mood_rollups_apply(NEW.user_id, NEW.date::date, NEW.mood, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS mood_logs_rollup ON mood_logs;
+CREATE TRIGGER mood_logs_rollup
+    AFTER INSERT OR DELETE OR UPDATE OF user_id, date, mood ON mood_logs
+    FOR EACH ROW EXECUTE FUNCTION mood_logs_rollup();
+
+REVOKE ALL ON FUNCTION mood_rollups_apply(uuid, date, text, integer) FROM PUBLIC;
+
+-- Build the rollups for existing logs
+TRUNCATE mood_rollups;
+INSERT INTO mood_rollups (user_id, grain, bucket, weekday, mood, count, value_sum)
+SELECT user_id, 'day', date::date, extract(isodow FROM date::date)::smallint - 1, mood,
+       count(*), sum(animoa_mood_value(mood))
+FROM mood_logs GROUP BY 1, 3, 4, 5
+UNION ALL
+SELECT user_id, 'week', date_trunc('week', date::date)::date, -1, mood,
+       count(*), sum(animoa_mood_value(mood))
+FROM mood_logs GROUP BY 1, 3, 4, 5
+UNION ALL
+SELECT user_id, 'month', date_trunc('month', date::date)::date, -1, mood,
+       count(*), sum(animoa_mood_value(mood))
+FROM mood_logs GROUP BY 1, 3, 4, 5
+UNION ALL
+SELECT user_id, 'month_weekday', date_trunc('month', date::date)::date,
+       extract(isodow FROM date::date)::smallint - 1, '',
+       count(*), sum(animoa_mood_value(mood))
+FROM mood_logs GROUP BY 1, 3, 4;
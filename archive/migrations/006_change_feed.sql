@@ -0,0 +1,50 @@
+-- Row-change notifications used to invalidate the app's read caches.
+--
+-- On Supabase the app subscribes to Realtime postgres_changes for the signed-in
+-- user, which needs the tables in the supabase_realtime publication. Against a
+-- plain local Postgres the app can instead LISTEN on animoa_changes, which the
+-- trigger below feeds (set ANIMOA_CHANGE_FEED=postgres and ANIMOA_DATABASE_URL).
+
+DO $$
+DECLARE
+    t text;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_publication WHERE pubname = 'supabase_realtime') THEN
+        FOREACH t IN ARRAY ARRAY['profiles', 'chat_sessions', 'chat_history', 'mood_logs',
+                                 'questionnaire_responses'] LOOP
+            IF NOT EXISTS (SELECT 1 FROM pg_publication_tables
+                           WHERE pubname = 'supabase_realtime' AND tablename = t) THEN
+                EXECUTE format('ALTER PUBLICATION supabase_realtime ADD TABLE %I', t);
+            END IF;
+        END LOOP;
+    END IF;
+END $$;
+
+-- Only the keys the app needs to find stale cache entries; NOTIFY payloads are
+-- limited to 8000 bytes, so message text is never included
+CREATE OR REPLACE FUNCTION animoa_notify_change()
+RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    r jsonb := to_jsonb(COALESCE(NEW, OLD));
+BEGIN
+    PERFORM pg_notify('animoa_changes', jsonb_build_object(
+        'table', TG_TABLE_NAME,
+        'type', TG_OP,
+        'record', jsonb_build_object('id', r->'id', 'user_id', r->'user_id', 'session_id', r->'session_id')
+    )::text);
+    RETURN NULL;
+END;
+$$;
+
+DO $$
+DECLARE
+    t text;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['profiles', 'chat_sessions', 'chat_history', 'mood_logs',
+                             'questionnaire_responses'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', t || '_notify_change', t);
+        EXECUTE format('CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE ON %I '
+                       'FOR EACH ROW EXECUTE FUNCTION animoa_notify_change()', t || '_notify_change', t);
+    END LOOP;
+END $$;
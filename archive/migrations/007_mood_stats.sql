@@ -0,0 +1,50 @@
+-- Running mood statistics, one row per user.
+--
+-- The app updates the row in O(1) for each mood it saves (see mood_signals.py):
+-- logging streaks, fast and slow exponentially weighted mood averages, an
+-- exponentially weighted variance and a CUSUM statistic that flags a sustained
+-- decline below the user's usual mood. `previous` holds the state before the
+-- latest log, so editing today's mood is O(1) too. Days are numbered from
+-- 1970-01-01. A row that no longer matches the user's mood logs is rebuilt by
+-- the app from the daily rollups.
+
+CREATE TABLE IF NOT EXISTS mood_stats (
+    user_id uuid PRIMARY KEY,
+    count integer NOT NULL DEFAULT 0,
+    last_day integer,
+    last_value smallint,
+    current_streak integer,
+    longest_streak integer,
+    low_streak integer,
+    ewma_fast double precision,
+    ewma_slow double precision,
+    ewm_var double precision,
+    cusum double precision,
+    decline_since integer,
+    previous jsonb,
+    client_id text,
+    updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+ALTER TABLE mood_stats ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS mood_stats_owner_all ON mood_stats;
+CREATE POLICY mood_stats_owner_all ON mood_stats
+    FOR ALL USING (user_id = auth.uid()) WITH CHECK (user_id = auth.uid());
+
+-- delete_all_user_data() removes the profile; the statistics go with it
+CREATE OR REPLACE FUNCTION mood_stats_delete_for_profile()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    DELETE FROM mood_stats WHERE user_id = OLD.id;
+    RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS profiles_delete_mood_stats ON profiles;
+CREATE TRIGGER profiles_delete_mood_stats
+    AFTER DELETE ON profiles
+    FOR EACH ROW EXECUTE FUNCTION mood_stats_delete_for_profile();
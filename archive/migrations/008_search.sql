@@ -0,0 +1,130 @@
+-- Full-text search over the user's mood notes and chat messages.
+--
+-- Each row keeps a tsvector built with the text search configuration of its
+-- author's preferred language (english, spanish, or simple for Chinese and
+-- anything else), indexed with GIN. Postgres has no Chinese parser, so a
+-- pg_trgm index answers queries containing CJK characters by substring match.
+-- search_user_content() returns one page of matches, newest first; the app
+-- builds the highlighted snippets (search_index.snippet) so they are escaped
+-- the same way on both backends.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE OR REPLACE FUNCTION animoa_search_config(p_language text)
+RETURNS regconfig
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT CASE p_language WHEN 'en' THEN 'english' WHEN 'es' THEN 'spanish' ELSE 'simple' END::regconfig
+$$;
+
+ALTER TABLE mood_logs ADD COLUMN IF NOT EXISTS search_vector tsvector;
+ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION animoa_search_vector_update()
+RETURNS trigger
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    body text := CASE TG_TABLE_NAME WHEN 'mood_logs' THEN NEW.note ELSE NEW.message END;
+    lang text;
+BEGIN
+    SELECT preferred_language INTO lang FROM profiles WHERE id = NEW.user_id;
+    NEW.search_vector := to_tsvector(animoa_search_config(coalesce(lang, 'en')), coalesce(body, ''));
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS mood_logs_search_vector ON mood_logs;
+CREATE TRIGGER mood_logs_search_vector
+    BEFORE INSERT OR UPDATE OF note, user_id ON mood_logs
+    FOR EACH ROW EXECUTE FUNCTION animoa_search_vector_update();
+
+DROP TRIGGER IF EXISTS chat_history_search_vector ON chat_history;
+CREATE TRIGGER chat_history_search_vector
+    BEFORE INSERT OR UPDATE OF message, user_id ON chat_history
+    FOR EACH ROW EXECUTE FUNCTION animoa_search_vector_update();
+
+-- Existing rows: the triggers fill the vectors
+UPDATE mood_logs SET note = note WHERE search_vector IS NULL AND note IS NOT NULL AND note <> '';
+UPDATE chat_history SET message = message WHERE search_vector IS NULL;
+
+CREATE INDEX IF NOT EXISTS mood_logs_search_idx ON mood_logs USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS chat_history_search_idx ON chat_history USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS mood_logs_note_trgm_idx ON mood_logs USING gin (note gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS chat_history_message_trgm_idx ON chat_history USING gin (message gin_trgm_ops);
+
+
+-- One page of the calling user's notes and messages matching p_query, newest
+-- first. p_kinds limits the search to 'mood' and/or 'chat'; chat matches are
+-- the user's and the bot's messages, not feedback rows. Messages of archived
+-- sessions are only gzip blobs (004_chat_archives.sql) and are not searched
+-- until the session is reopened; archived_sessions counts them so the app can
+-- say so. Returns {"total": n, "results": [{kind, id, session_id, date,
+-- content}], "archived_sessions": n}.
+CREATE OR REPLACE FUNCTION search_user_content(
+    p_query text,
+    p_language text DEFAULT 'en',
+    p_kinds text[] DEFAULT NULL,
+    p_limit integer DEFAULT 20,
+    p_offset integer DEFAULT 0
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    uid uuid := auth.uid();
+    cjk boolean := p_query ~ '[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]';
+    -- Rows keep the configuration of the language they were written in, so match all of them
+    q tsquery := websearch_to_tsquery(animoa_search_config(p_language), p_query)
+                 || websearch_to_tsquery('english', p_query)
+                 || websearch_to_tsquery('spanish', p_query)
+                 || websearch_to_tsquery('simple', p_query);
+    pattern text := '%' || replace(replace(replace(trim(p_query), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+    -- Index-friendly condition for each table, chosen once per query
+    mood_match text := CASE WHEN cjk THEN 'm.note ILIKE $3' ELSE 'm.search_vector @@ $2' END;
+    chat_match text := CASE WHEN cjk THEN 'c.message ILIKE $3' ELSE 'c.search_vector @@ $2' END;
+    result jsonb;
+BEGIN
+    IF uid IS NULL THEN
+        RAISE EXCEPTION 'Not authenticated';
+    END IF;
+
+    EXECUTE format($q$
+        WITH matches AS (
+            SELECT 'mood' AS kind, m.id, NULL::uuid AS session_id, m.date::text AS date, m.note AS content
+            FROM mood_logs m
+            WHERE m.user_id = $1 AND ($4 IS NULL OR 'mood' = ANY ($4)) AND %s
+            UNION ALL
+            SELECT 'chat', c.id, c.session_id, c.timestamp::text, c.message
+            FROM chat_history c
+            WHERE c.user_id = $1 AND ($4 IS NULL OR 'chat' = ANY ($4)) AND c.sender IN ('user', 'bot') AND %s
+        ),
+        page AS (
+            -- The window count runs before LIMIT, so it is the total over all pages
+            SELECT *, count(*) OVER () AS total
+            FROM matches
+            ORDER BY date DESC, id DESC
+            LIMIT $5 OFFSET $6
+        )
+        SELECT jsonb_build_object(
+            'total', coalesce(max(total), 0),
+            'results', coalesce(jsonb_agg(jsonb_build_object(
+                'kind', kind, 'id', id, 'session_id', session_id, 'date', date, 'content', content)
+                ORDER BY date DESC, id DESC), '[]'::jsonb),
+            'archived_sessions', CASE WHEN $4 IS NULL OR 'chat' = ANY ($4)
+                                      THEN (SELECT count(*) FROM chat_archives a WHERE a.user_id = $1)
+                                      ELSE 0 END)
+        FROM page
+    $q$, mood_match, chat_match)
+    INTO result
+    USING uid, q, pattern, p_kinds, p_limit, p_offset;
+    RETURN result;
+END;
+$$;
+
+REVOKE ALL ON FUNCTION search_user_content(text, text, text[], integer, integer) FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION search_user_content(text, text, text[], integer, integer) TO authenticated;
@@ -0,0 +1,10 @@
+-- When each mood log was last edited, for syncing edits made offline.
+--
+-- The local journal (local_journal.SyncEngine) sends a pending mood log with
+-- the time the user made the edit. Before replacing a day's log it compares
+-- that with the stored updated_at, so an offline edit uploaded late does not
+-- overwrite a newer edit made on another device. Existing rows were last
+-- edited no later than they were created.
+
+ALTER TABLE mood_logs ADD COLUMN IF NOT EXISTS updated_at timestamptz;
+UPDATE mood_logs SET updated_at = created_at WHERE updated_at IS NULL;
@@ -0,0 +1,172 @@
+import datetime
+import hashlib
+
+import numpy as np
+
+# Mood codes are positions in this tuple, so a code's mood value is code + 1.
+# Values must match the CASE expressions in repositories.py and migrations/005_mood_rollups.sql
+MOOD_KEYS = ('very_sad', 'sad', 'neutral', 'happy', 'very_happy')
+MOOD_CODES = {key: code for code, key in enumerate(MOOD_KEYS)}
+MOOD_VALUES = np.arange(1, len(MOOD_KEYS) + 1, dtype=np.int64)
+N_MOODS = len(MOOD_KEYS)
+
+# 1970-01-01, day 0, was a Thursday; weekdays run Monday=0 ... Sunday=6
+EPOCH = datetime.date(1970, 1, 1)
+EPOCH_WEEKDAY = 3
+
+
+def day_number(value):
+    """Days since 1970-01-01 for a date, datetime or ISO string"""
+    if isinstance(value, str):
+        value = datetime.date.fromisoformat(value[:10])
+    elif isinstance(value, datetime.datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+def day_string(number):
+    return (EPOCH + datetime.timedelta(days=int(number))).isoformat()
+
+
+def weekdays(days):
+    return (days + EPOCH_WEEKDAY) % 7
+
+
+def mood_lookup(moods, field):
+    """Lookup table of one display field per mood code, e.g. mood_lookup(moods, 'emoji')[codes]"""
+    return np.array([moods[key][field] for key in MOOD_KEYS], dtype=object)
+
+
+def encode_moods(values):
+    """Mood keys to int8 codes, -1 for unknown moods"""
+    return np.fromiter((MOOD_CODES.get(value, -1) for value in values), dtype=np.int8, count=len(values))
+
+
+class MoodSeries:
+    """
+    One user's daily moods as two sorted arrays: day numbers and mood codes.
+
+    Built once from the compact daily rollup rows; any date range is a slice
+    found by binary search, so switching ranges on the mood page needs no fetch.
+    """
+
+    def __init__(self, days, codes):
+        self.days = days
+        self.codes = codes
+
+    @classmethod
+    def from_rows(cls, rows, date_key='bucket', mood_key='mood'):
+        days = np.fromiter((day_number(row[date_key]) for row in rows), dtype=np.int32, count=len(rows))
+        codes = encode_moods([row[mood_key] for row in rows])
+        known = codes >= 0
+        order = np.argsort(days[known], kind='stable')
+        return cls(days[known][order], codes[known][order])
+
+    def __len__(self):
+        return len(self.days)
+
+    @property
+    def version(self):
+        """Fingerprint of the series content, for keying anything derived from it"""
+        if not hasattr(self, '_version'):
+            digest = hashlib.blake2b(self.days.tobytes() + self.codes.tobytes(), digest_size=8)
+            self._version = digest.hexdigest()
+        return self._version
+
+    def with_entries(self, rows):
+        """Series with these mood logs replacing the stored mood of their days (e.g. unsynced saves)"""
+        if not rows:
+            return self
+        extra = MoodSeries.from_rows(rows, date_key='date')
+        keep = ~np.isin(self.days, extra.days)
+        days = np.concatenate([self.days[keep], extra.days])
+        codes = np.concatenate([self.codes[keep], extra.codes])
+        order = np.argsort(days, kind='stable')
+        return MoodSeries(days[order], codes[order])
+
+    def since(self, start):
+        """The part of the series from a start date on"""
+        i = np.searchsorted(self.days, day_number(start), side='left')
+        return MoodSeries(self.days[i:], self.codes[i:])
+
+    def stats(self, bucket_days=1):
+        return MoodStats.compute(self.days, self.codes, bucket_days)
+
+
+class MoodStats:
+    """
+    Trend, distribution and weekday figures for one user and range.
+
+    Distribution and weekday figures come from a single bincount over
+    weekday * N_MOODS + code, a 7 x N_MOODS grid of counts; the trend is
+    bucketed with one reduceat over the sorted days.
+    """
+
+    def __init__(self, grid, bucket_starts, bucket_counts, bucket_sums):
+        self.grid = grid
+        self.counts_by_code = grid.sum(axis=0)
+        self.total_count = int(self.counts_by_code.sum())
+        self.value_sum = int(self.counts_by_code @ MOOD_VALUES)
+        self.bucket_starts = bucket_starts
+        self.bucket_counts = bucket_counts
+        self.bucket_sums = bucket_sums
+
+    @classmethod
+    def compute(cls, days, codes, bucket_days=1):
+        grid = np.bincount(weekdays(days).astype(np.int64) * N_MOODS + codes,
+                           minlength=7 * N_MOODS).reshape(7, N_MOODS)
+        if len(days) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return cls(grid, empty, empty, empty)
+        # Weekly buckets start on Mondays
+        offset = EPOCH_WEEKDAY if bucket_days == 7 else 0
+        buckets = (days.astype(np.int64) + offset) // bucket_days
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        values = MOOD_VALUES[codes]
+        return cls(grid, buckets[starts] * bucket_days - offset,
+                   np.diff(np.r_[starts, len(days)]), np.add.reduceat(values, starts))
+
+    @property
+    def average(self):
+        return self.value_sum / self.total_count if self.total_count else 0.0
+
+    @property
+    def counts_by_mood(self):
+        return {MOOD_KEYS[code]: int(count) for code, count in enumerate(self.counts_by_code) if count}
+
+    @property
+    def series(self):
+        """(bucket start, average mood, number of logs), oldest first"""
+        averages = self.bucket_sums / np.maximum(self.bucket_counts, 1)
+        return [(day_string(start), float(avg), int(count))
+                for start, avg, count in zip(self.bucket_starts, averages, self.bucket_counts)]
+
+    @property
+    def weekday_averages(self):
+        """Monday=0 ... Sunday=6 -> average mood, for weekdays with logs"""
+        counts = self.grid.sum(axis=1)
+        sums = self.grid @ MOOD_VALUES
+        return {int(weekday): float(sums[weekday] / counts[weekday]) for weekday in np.flatnonzero(counts)}
+
+    def recent_average(self, periods=3):
+        """Average over the last few days (or weeks for weekly buckets)"""
+        count = self.bucket_counts[-periods:].sum()
+        return float(self.bucket_sums[-periods:].sum() / count) if count else 0.0
+
+    def most_common_mood(self):
+        if not self.total_count:
+            return None
+        # Ties go to the happier mood
+        return MOOD_KEYS[N_MOODS - 1 - int(np.argmax(self.counts_by_code[::-1]))]
+
+
+def batch_grids(user_index, days, codes, n_users):
+    """
+    Weekday x mood count grids for many users in one bincount, e.g. for reports.
+
+    `user_index` numbers each log's user 0..n_users-1. Returns an array of shape
+    (n_users, 7, N_MOODS); MoodStats(grid, ...) or plain array maths turn it into
+    per-user distributions, averages and weekday patterns.
+    """
+    keys = (user_index.astype(np.int64) * 7 + weekdays(days)) * N_MOODS + codes
+    return np.bincount(keys, minlength=n_users * 7 * N_MOODS).reshape(n_users, 7, N_MOODS)
@@ -0,0 +1,122 @@
+import datetime
+import html
+
+import numpy as np
+
+from mood_analytics import EPOCH, MOOD_KEYS, day_number
+
+WEEKDAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+# Heatmap geometry in pixels
+CELL = 11
+GAP = 2
+LEFT = 28
+TOP = 16
+EMPTY_COLOR = 'rgba(128, 128, 128, 0.15)'
+
+
+def note_preview(note, length=20):
+    if not note:
+        return ''
+    return note[:length] + '...' if len(note) > length else note
+
+
+def _day_cell(day, label, row, moods):
+    """One calendar day as HTML; row is the mood log for that day or None"""
+    if row is None:
+        return (f'<div class="mood-calendar-day" style="background-color: {EMPTY_COLOR};">'
+                f'<div class="calendar-date">{label}</div></div>')
+    mood = moods[row['mood']]
+    note = html.escape(note_preview(row.get('note')))
+    title = html.escape(f"{day.strftime('%A, %B %d')}: {mood['label']}")
+    return (f'<div class="mood-calendar-day" style="background-color: {mood["color"]};" title="{title}">'
+            f'<div class="calendar-date">{label}</div>'
+            f'<div class="calendar-emoji">{mood["emoji"]}</div>'
+            f'<div class="calendar-note">{note}</div></div>')
+
+
+def calendar_html(rows, moods, start, end):
+    """
+    The calendar for a date range as one HTML block, instead of a widget per day.
+
+    Ranges of a week show one row of days; longer ones show month grids starting
+    on Monday. Notes are escaped, since the block is rendered as raw HTML.
+    """
+    by_date = {str(row['date'])[:10]: row for row in rows}
+    grid = 'display: grid; grid-template-columns: repeat(7, 1fr); gap: 6px; margin-bottom: 16px;'
+
+    if (end - start).days < 7:
+        cells = []
+        day = start
+        while day <= end:
+            cells.append(_day_cell(day, day.strftime('%a<br>%b %d'), by_date.get(day.isoformat()), moods))
+            day += datetime.timedelta(days=1)
+        return f'<div style="{grid}">{"".join(cells)}</div>'
+
+    parts = []
+    month = start.replace(day=1)
+    while month <= end:
+        next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+        cells = [f'<div style="text-align: center; opacity: 0.7;">{name}</div>' for name in WEEKDAY_NAMES]
+        cells += ['<div></div>'] * month.weekday()
+        day = month
+        while day < next_month:
+            if start <= day <= end:
+                cells.append(_day_cell(day, day.strftime('%d'), by_date.get(day.isoformat()), moods))
+            else:
+                cells.append('<div></div>')
+            day += datetime.timedelta(days=1)
+        parts.append(f'<h4>{month.strftime("%B %Y")}</h4><div style="{grid}">{"".join(cells)}</div>')
+        month = next_month
+    return "".join(parts)
+
+
+def year_heatmap_svg(series, year, moods):
+    """
+    A GitHub-style heatmap of one year of a MoodSeries as a single SVG:
+    one column per week, one row per weekday, coloured by mood.
+    """
+    first = datetime.date(year, 1, 1)
+    last = datetime.date(year, 12, 31)
+    first_number = day_number(first)
+    # Columns start on the Monday on or before January 1st
+    grid_start = first_number - first.weekday()
+
+    days = series.days
+    lo, hi = np.searchsorted(days, [first_number, day_number(last) + 1])
+    logged = dict(zip(days[lo:hi].tolist(), series.codes[lo:hi].tolist()))
+
+    colors = [moods[key]['color'] for key in MOOD_KEYS]
+    labels = [moods[key]['label'] for key in MOOD_KEYS]
+    weeks = (day_number(last) - grid_start) // 7 + 1
+    width = LEFT + weeks * (CELL + GAP)
+    height = TOP + 7 * (CELL + GAP)
+
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             f'viewBox="0 0 {width} {height}" style="font: 9px sans-serif; fill: currentColor;">']
+    for row, name in ((0, 'Mon'), (2, 'Wed'), (4, 'Fri')):
+        parts.append(f'<text x="0" y="{TOP + row * (CELL + GAP) + CELL - 2}">{name}</text>')
+    for month in range(1, 13):
+        column = (day_number(datetime.date(year, month, 1)) - grid_start) // 7
+        parts.append(f'<text x="{LEFT + column * (CELL + GAP)}" y="{TOP - 5}">'
+                     f'{datetime.date(year, month, 1).strftime("%b")}</text>')
+
+    for number in range(first_number, day_number(last) + 1):
+        column, row = divmod(number - grid_start, 7)
+        code = logged.get(number)
+        color = EMPTY_COLOR if code is None else colors[code]
+        day = EPOCH + datetime.timedelta(days=number)
+        title = day.strftime('%a, %b %d') + ('' if code is None else f': {labels[code]}')
+        parts.append(f'<rect x="{LEFT + column * (CELL + GAP)}" y="{TOP + row * (CELL + GAP)}" '
+                     f'width="{CELL}" height="{CELL}" rx="2" fill="{color}"><title>{title}</title></rect>')
+    parts.append('</svg>')
+    return "".join(parts)
+
+
+def series_years(series):
+    """Years with at least one log, newest first"""
+    if not len(series):
+        return []
+    first = (EPOCH + datetime.timedelta(days=int(series.days[0]))).year
+    last = (EPOCH + datetime.timedelta(days=int(series.days[-1]))).year
+    return list(range(last, first - 1, -1))
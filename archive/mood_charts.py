@@ -0,0 +1,108 @@
+import threading
+
+import altair as alt
+import numpy as np
+
+from mood_analytics import MOOD_KEYS
+
+# Most points a trend chart sends to the browser, whatever the history length
+TREND_POINT_BUDGET = 365
+
+# Name of the dataset the cached chart skeleton reads from
+TREND_DATASET = 'mood_trend'
+
+
+def lttb(x, y, threshold):
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last point and, from each bucket in between, the point
+    forming the largest triangle with the previously kept point and the next
+    bucket's mean, which preserves peaks and dips better than plain averaging.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    kept = np.empty(threshold, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        mean_x = x[next_start:next_end].mean()
+        mean_y = y[next_start:next_end].mean()
+        area = np.abs((x[previous] - mean_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (mean_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        kept[i + 1] = previous
+    return kept
+
+
+_skeleton = None
+_skeleton_lock = threading.Lock()
+
+
+def trend_skeleton():
+    """The trend chart's Vega-Lite spec without data, built once per process"""
+    global _skeleton
+    with _skeleton_lock:
+        if _skeleton is None:
+            line = alt.Chart().mark_line(
+                point=True,
+                strokeWidth=3,
+                interpolate='monotone'
+            ).encode(
+                x=alt.X('date:T', title='Date'),
+                y=alt.Y('mood_value:Q',
+                        title='Mood',
+                        scale=alt.Scale(domain=[1, 5]),
+                        axis=alt.Axis(
+                            values=[1, 2, 3, 4, 5],
+                            labelExpr="datum.value == 1 ? 'Very Sad' : datum.value == 2 ? 'Sad' : datum.value == 3 ? 'Neutral' : datum.value == 4 ? 'Happy' : 'Very Happy'"
+                        )),
+                color=alt.value('#4e79a7'),
+                tooltip=['day:N', 'mood_label:N', 'entries:Q']
+            ).interactive(bind_y=False)
+            points = alt.Chart().mark_point(
+                size=100,
+                filled=True
+            ).encode(
+                x='date:T',
+                y='mood_value:Q',
+                color=alt.Color('mood_color:N', scale=None),
+                tooltip=['day:N', 'mood_label:N']
+            )
+            _skeleton = alt.layer(line, points, data=alt.NamedData(name=TREND_DATASET)).properties(
+                width='container',
+                height=350
+            ).to_dict()
+        return _skeleton
+
+
+def trend_spec(stats, moods, budget=TREND_POINT_BUDGET):
+    """Vega-Lite spec of a mood trend from MoodStats, downsampled to at most `budget` points"""
+    series = stats.series
+    averages = np.array([avg for _, avg, _ in series])
+    keep = lttb(np.arange(len(series)), averages, budget)
+
+    labels = [moods[key]['label'] for key in MOOD_KEYS]
+    colors = [moods[key]['color'] for key in MOOD_KEYS]
+    codes = np.clip(np.rint(averages[keep]).astype(int) - 1, 0, len(MOOD_KEYS) - 1) if len(keep) else []
+    values = []
+    for index, code in zip(keep.tolist(), list(codes)):
+        start, avg, count = series[index]
+        values.append({
+            'date': start,
+            'day': f"{np.datetime64(start, 'D').item():%a, %b %d %Y}",
+            'mood_value': round(avg, 2),
+            'mood_label': labels[code],
+            'mood_color': colors[code],
+            'entries': count,
+        })
+    spec = dict(trend_skeleton())
+    spec['datasets'] = {TREND_DATASET: values}
+    return spec
+
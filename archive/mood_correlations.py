@@ -0,0 +1,148 @@
+import datetime
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+
+from mood_analytics import MOOD_VALUES, day_number
+
+# Days of history the timeline covers
+TIMELINE_DAYS = 180
+
+# PHQ-2 and GAD-2 ask about the last two weeks, so a score stands for the days up to it
+SCREENING_WINDOW_DAYS = 14
+
+MAX_LAG_DAYS = 3
+
+# Fewest days with both signals for a correlation to be reported, and the |r| worth mentioning
+MIN_PAIRS = 10
+NOTABLE_R = 0.3
+
+# (driver, target) signal pairs: does the driver on one day go with the target `lag` days later?
+CORRELATION_PAIRS = (
+    ('messages', 'mood'),
+    ('mood', 'messages'),
+    ('phq2', 'mood'),
+    ('gad2', 'mood'),
+)
+
+SIGNAL_NAMES = {
+    'mood': 'your mood',
+    'messages': 'how much you chat with Animoa',
+    'phq2': 'your PHQ-2 (low mood) score',
+    'gad2': 'your GAD-2 (anxiety) score',
+}
+
+Correlation = namedtuple('Correlation', 'driver target lag r n')
+
+
+class DailyTimeline:
+    """
+    One user's signals on a shared daily axis, as float arrays with NaN for days
+    without a value: mood (1-5), PHQ-2 and GAD-2 scores, and messages sent.
+
+    Every signal is placed with array indexing (searchsorted, bincount) rather
+    than per-day lookups, so building a timeline costs a few array passes.
+    """
+
+    def __init__(self, start, signals):
+        self.start = start
+        self.signals = signals
+
+    @classmethod
+    def build(cls, mood_series, assessments, message_times, today=None, days=TIMELINE_DAYS):
+        """
+        From a MoodSeries, questionnaire rows (created_at, phq2_score, gad2_score)
+        and the timestamps of the user's chat messages.
+        """
+        end = day_number(today or datetime.date.today())
+        start = end - days + 1
+        grid = np.arange(start, end + 1)
+        signals = {}
+
+        mood = np.full(days, np.nan)
+        lo, hi = np.searchsorted(mood_series.days, [start, end + 1])
+        mood[mood_series.days[lo:hi] - start] = MOOD_VALUES[mood_series.codes[lo:hi]]
+        signals['mood'] = mood
+
+        # Each day takes the first screening taken on it or within the window after it
+        assessments = sorted(assessments, key=lambda row: str(row['created_at']))
+        taken = np.array([day_number(row['created_at']) for row in assessments], dtype=np.int64)
+        following = np.searchsorted(taken, grid, side='left')
+        covered = following < len(taken)
+        covered[covered] &= taken[following[covered]] - grid[covered] < SCREENING_WINDOW_DAYS
+        for signal, column in (('phq2', 'phq2_score'), ('gad2', 'gad2_score')):
+            scores = np.array([np.nan if row.get(column) is None else row[column] for row in assessments],
+                              dtype=float)
+            values = np.full(days, np.nan)
+            values[covered] = scores[following[covered]]
+            signals[signal] = values
+
+        # No messages on a day is a real zero, but only once the user has any data at all
+        message_days = np.array([day_number(value) for value in message_times], dtype=np.int64)
+        message_days = message_days[(message_days >= start) & (message_days <= end)]
+        messages = np.bincount(message_days - start, minlength=days).astype(float)
+        known = ~np.isnan(mood) | (messages > 0)
+        first = int(np.argmax(known)) if known.any() else days
+        messages[:first] = np.nan
+        signals['messages'] = messages
+
+        return cls(start, signals)
+
+    @property
+    def version(self):
+        """Fingerprint of the timeline content, for keying results derived from it"""
+        if not hasattr(self, '_version'):
+            digest = hashlib.blake2b(self.start.to_bytes(8, 'little', signed=True), digest_size=8)
+            for name in sorted(self.signals):
+                digest.update(self.signals[name].tobytes())
+            self._version = digest.hexdigest()
+        return self._version
+
+
+def lagged_correlations(timeline, pairs=CORRELATION_PAIRS, max_lag=MAX_LAG_DAYS, min_pairs=MIN_PAIRS):
+    """
+    Pearson correlation of each (driver, target) pair for lags 0..max_lag days,
+    over the days where both have a value. Pairs with too few days or a signal
+    that never changes are left out.
+    """
+    results = []
+    for driver, target in pairs:
+        x_all, y_all = timeline.signals[driver], timeline.signals[target]
+        for lag in range(max_lag + 1):
+            x = x_all[:len(x_all) - lag]
+            y = y_all[lag:]
+            both = ~(np.isnan(x) | np.isnan(y))
+            n = int(both.sum())
+            if n < min_pairs:
+                continue
+            x, y = x[both], y[both]
+            x = x - x.mean()
+            y = y - y.mean()
+            spread = np.sqrt((x @ x) * (y @ y))
+            if spread == 0:
+                continue
+            results.append(Correlation(driver, target, lag, float((x @ y) / spread), n))
+    return results
+
+
+def notable_correlations(correlations, threshold=NOTABLE_R):
+    """The strongest lag of each pair, where |r| reaches the threshold, strongest first"""
+    best = {}
+    for correlation in correlations:
+        key = (correlation.driver, correlation.target)
+        if correlation.lag == 0 and (correlation.target, correlation.driver) in best \
+                and best[(correlation.target, correlation.driver)].lag == 0:
+            continue  # Same-day correlation is symmetric, the reversed pair already has it
+        if key not in best or abs(correlation.r) > abs(best[key].r):
+            best[key] = correlation
+    return sorted((c for c in best.values() if abs(c.r) >= threshold), key=lambda c: -abs(c.r))
+
+
+def describe(correlation):
+    """A plain-language sentence about one correlation"""
+    direction = "higher" if correlation.r > 0 else "lower"
+    strength = "strongly" if abs(correlation.r) >= 0.5 else "somewhat"
+    when = {0: "on the same day", 1: "the next day"}.get(correlation.lag, f"{correlation.lag} days later")
+    return (f"When {SIGNAL_NAMES[correlation.driver]} is higher, {SIGNAL_NAMES[correlation.target]} "
+            f"tends to be {strength} {direction} {when} (r = {correlation.r:+.2f} over {correlation.n} days).")
@@ -0,0 +1,139 @@
+import math
+
+from mood_analytics import MOOD_VALUES, day_number
+
+# Smoothing per log: the fast average follows about the last week, the slow one the last month
+FAST_ALPHA = 0.3
+SLOW_ALPHA = 0.07
+
+# Sustained-decline detector (one-sided CUSUM against the slow average, in mood points)
+CUSUM_SLACK = 0.5
+CUSUM_THRESHOLD = 3.0
+
+# Moods at or below this value count towards a low-mood streak
+LOW_MOOD_VALUE = 2
+
+STATE_FIELDS = ('count', 'last_day', 'last_value', 'current_streak', 'longest_streak', 'low_streak',
+                'ewma_fast', 'ewma_slow', 'ewm_var', 'cusum', 'decline_since')
+
+
+class MoodSignals:
+    """
+    Running mood statistics for one user, updated in O(1) per mood log.
+
+    Keeps the logging streak, fast and slow exponentially weighted averages,
+    an exponentially weighted variance (volatility) and a CUSUM statistic that
+    grows while moods stay below the user's own baseline. The state before the
+    latest log is kept as well, so editing today's mood is also O(1); a log for
+    an earlier day needs rebuild().
+    """
+
+    def __init__(self, previous=None, **state):
+        for field in STATE_FIELDS:
+            setattr(self, field, state.get(field))
+        if self.count is None:
+            self.count = 0
+        self.previous = previous
+
+    @classmethod
+    def from_row(cls, row):
+        if not row:
+            return cls()
+        previous = row.get('previous')
+        return cls(previous=cls.from_row(previous) if previous else None,
+                   **{field: row.get(field) for field in STATE_FIELDS})
+
+    def state(self):
+        return {field: getattr(self, field) for field in STATE_FIELDS}
+
+    def to_row(self, user_id):
+        return dict(self.state(), user_id=user_id,
+                    previous=self.previous.state() if self.previous is not None else None)
+
+    def _advance(self, day, value):
+        """State after appending a log for a day later than last_day"""
+        if self.count == 0:
+            return MoodSignals(count=1, last_day=day, last_value=value, current_streak=1, longest_streak=1,
+                               low_streak=1 if value <= LOW_MOOD_VALUE else 0,
+                               ewma_fast=float(value), ewma_slow=float(value), ewm_var=0.0, cusum=0.0,
+                               decline_since=None)
+        streak = self.current_streak + 1 if day - self.last_day == 1 else 1
+        delta = value - self.ewma_slow
+        cusum = max(0.0, self.cusum + (self.ewma_slow - value) - CUSUM_SLACK)
+        return MoodSignals(
+            count=self.count + 1,
+            last_day=day,
+            last_value=value,
+            current_streak=streak,
+            longest_streak=max(self.longest_streak, streak),
+            low_streak=self.low_streak + 1 if value <= LOW_MOOD_VALUE else 0,
+            ewma_fast=self.ewma_fast + FAST_ALPHA * (value - self.ewma_fast),
+            ewma_slow=self.ewma_slow + SLOW_ALPHA * delta,
+            ewm_var=(1 - SLOW_ALPHA) * (self.ewm_var + SLOW_ALPHA * delta * delta),
+            cusum=cusum,
+            decline_since=(self.decline_since or day) if cusum > 0 else None,
+        )
+
+    def record(self, day, value):
+        """
+        State after logging `value` for `day` (a day number), or None if the day
+        is before the latest log and the state must be rebuilt from the history.
+        """
+        if self.count and day < self.last_day:
+            return None
+        if self.count and day == self.last_day:
+            # Replacing the latest log: reapply it to the state before it
+            base = self.previous or MoodSignals()
+        else:
+            base = self
+        updated = base._advance(day, value)
+        updated.previous = MoodSignals(**base.state())
+        return updated
+
+    @classmethod
+    def rebuild(cls, series):
+        """State for a whole MoodSeries, replaying every log"""
+        signals = cls()
+        values = MOOD_VALUES[series.codes]
+        for day, value in zip(series.days.tolist(), values.tolist()):
+            signals = signals.record(day, value)
+        return signals
+
+    def matches(self, series):
+        """Whether this state was built from exactly the logs the series ends with"""
+        if len(series) == 0:
+            return self.count == 0
+        return (self.count == len(series) and self.last_day == int(series.days[-1])
+                and self.last_value == int(MOOD_VALUES[series.codes[-1]]))
+
+    # Read-time insights, all O(1)
+
+    @property
+    def volatility(self):
+        return math.sqrt(self.ewm_var) if self.ewm_var else 0.0
+
+    def trend(self, margin=0.3):
+        if self.count < 3:
+            return "stable"
+        if self.ewma_fast > self.ewma_slow + margin:
+            return "improving"
+        if self.ewma_fast < self.ewma_slow - margin:
+            return "declining"
+        return "stable"
+
+    def sustained_decline(self):
+        """True once moods have stayed below the usual level long enough to suggest a check-in"""
+        return self.count >= 5 and self.cusum >= CUSUM_THRESHOLD
+
+    def streak_on(self, today):
+        """Current logging streak as seen on `today`; it is broken once a day is missed"""
+        if not self.count or day_number(today) - self.last_day > 1:
+            return 0
+        return self.current_streak
+
+
+def signals_for_series(series, stored):
+    """The stored state if it matches the series, else one rebuilt from it (and whether it was rebuilt)"""
+    if stored.matches(series):
+        return stored, False
+    return MoodSignals.rebuild(series), True
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Bump when the wellness_pdf report layout changes, so cached reports are rendered again.
+# Kept here, not in wellness_pdf, so keying a report does not load reportlab.
+PDF_TEMPLATE_VERSION = 2
+
+
+def report_key(template_version, *content):
+    """
+    Content address of a rendered report: a hash of the template version and
+    everything rendered into it (JSON-serialisable values, e.g. the responses
+    dict and the recommendations text). Equal content gives equal keys across
+    sessions and processes, so nothing needs invalidating; changed content or
+    a new template version simply gives a new key.
+    """
+    payload = json.dumps([template_version, *content], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PdfCache:
+    """
+    Rendered PDFs by report_key, shared by all sessions in this process.
+
+    The memory tier is an LRU bounded by entries and total bytes. The optional
+    disk tier (a directory, e.g. ANIMOA_PDF_CACHE_DIR) keeps reports across
+    restarts and is pruned oldest-first past max_disk_bytes; reports hold
+    health information, so files are written owner-only and the tier is off
+    unless a directory is given.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=32 * 1024 * 1024, directory=None,
+                 max_disk_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._pdfs = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # One lock per key being rendered, so concurrent requests render it once
+        self._rendering = {}
+        self.stats = {"hits": 0, "disk_hits": 0, "renders": 0}
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def get(self, key):
+        """The cached PDF bytes, or None if the report has not been rendered yet"""
+        with self._lock:
+            if key in self._pdfs:
+                self._pdfs.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._pdfs[key]
+        data = self._read_disk(key)
+        if data is not None:
+            with self._lock:
+                self.stats["disk_hits"] += 1
+            self._remember(key, data)
+        return data
+
+    def get_or_render(self, key, render):
+        """The cached PDF, or render() it (returning bytes) once and cache it"""
+        data = self.get(key)
+        if data is not None:
+            return data
+        with self._lock:
+            key_lock = self._rendering.setdefault(key, threading.Lock())
+        try:
+            with key_lock:
+                data = self.get(key)
+                if data is None:
+                    data = render()
+                    with self._lock:
+                        self.stats["renders"] += 1
+                    self._remember(key, data)
+                    self._write_disk(key, data)
+        finally:
+            # Even when render() raises, so a failed render leaves no entry behind
+            with self._lock:
+                self._rendering.pop(key, None)
+        return data
+
+    def _remember(self, key, data):
+        with self._lock:
+            if key in self._pdfs:
+                return
+            self._pdfs[key] = data
+            self._size += len(data)
+            while self._pdfs and (len(self._pdfs) > self.max_entries or self._size > self.max_bytes):
+                _, evicted = self._pdfs.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+            os.utime(self._path(key))  # Pruning goes by last use
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, key, data):
+        if not self.directory:
+            return
+        try:
+            # Written whole then renamed, so a reader never sees half a file
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+            self._prune_disk()
+        except OSError as e:
+            print(f"Could not cache PDF on disk: {e}")
+
+    def _prune_disk(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pdf'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
@@ -0,0 +1,122 @@
+import re
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus import Paragraph, Spacer
+from reportlab.platypus.flowables import HRFlowable
+
+# Deepest list nesting given its own indent; deeper items share the last level
+MAX_LIST_DEPTH = 3
+
+# Spaces of indentation per list level (a tab counts as one level)
+LIST_INDENT = 2
+
+_HEADING = re.compile(r'(#{1,6})\s+(.*?)\s*#*$')
+_BULLET = re.compile(r'([-*+•])\s+(.*)')
+_NUMBERED = re.compile(r'(\d{1,3})[.)]\s+(.*)')
+_RULE = re.compile(r'(?:-\s*){3,}|(?:\*\s*){3,}|(?:_\s*){3,}')
+
+# One inline token per match: a code span, a link, a backslash escape or an emphasis run
+_INLINE = re.compile(r'`([^`\n]+)`|\[([^\]\n]+)\]\(((?:https?://|mailto:)[^)\s]+)\)|\\([\\`*_\[\]#])|(\*{1,3}|_{1,3})')
+
+_TAGS = {1: ('<i>', '</i>'), 2: ('<b>', '</b>'), 3: ('<b><i>', '</i></b>')}
+
+
+def inline_markup(text):
+    """
+    Reportlab paragraph markup for one line of markdown: **bold**, *italic*,
+    ***both***, `code` and [links](https://...), with everything else escaped
+    so stray <, > and & cannot break the paragraph parser.
+
+    One left-to-right pass over the tokens. Open emphasis runs sit on a stack;
+    a closing run matching one further down closes it and leaves the runs above
+    it as literal text, as are runs still open at the end, so the tags are
+    always balanced.
+    """
+    parts = []
+    stack = []  # (marker, index in parts)
+    opened = {}  # marker -> its positions in stack, so closing one is not a search
+    position = 0
+    for match in _INLINE.finditer(text):
+        start, end = match.span()
+        if start > position:
+            parts.append(escape(text[position:start]))
+        position = end
+        code, label, href, escaped, run = match.groups()
+        if code is not None:
+            parts.append(f'<font face="Courier">{escape(code)}</font>')
+        elif label is not None:
+            href = escape(href, {'"': '&quot;'})
+            parts.append(f'<link href="{href}" color="blue">{escape(label)}</link>')
+        elif escaped is not None:
+            parts.append(escape(escaped))
+        else:
+            before = text[start - 1] if start else ' '
+            after = text[end] if end < len(text) else ' '
+            # Underscores inside words (snake_case, file_names) are not emphasis
+            word_bound = run[0] != '_'
+            can_open = not after.isspace() and (word_bound or not before.isalnum())
+            can_close = not before.isspace() and (word_bound or not after.isalnum())
+            if can_close and opened.get(run):
+                # Runs opened after this one were never closed and stay as they are, literal text
+                depth = opened[run][-1]
+                for marker, _ in stack[depth:]:
+                    opened[marker].pop()
+                opening, closing = _TAGS[len(run)]
+                parts[stack[depth][1]] = opening
+                parts.append(closing)
+                del stack[depth:]
+            elif can_open:
+                opened.setdefault(run, []).append(len(stack))
+                stack.append((run, len(parts)))
+                parts.append(run)
+            else:
+                parts.append(run)
+    if position < len(text):
+        parts.append(escape(text[position:]))
+    return ''.join(parts)
+
+
+def list_styles(base, depth=MAX_LIST_DEPTH):
+    """Paragraph styles for list items at each nesting level, derived from the body style"""
+    return [ParagraphStyle(name=f'{base.name}List{level}', parent=base,
+                           leftIndent=14 + 14 * level, bulletIndent=14 * level)
+            for level in range(depth)]
+
+
+def markdown_flowables(text, styles):
+    """
+    Flowables for the markdown subset the recommendations use: headings,
+    paragraphs, nested bullet and numbered lists, horizontal rules and blank
+    lines, with inline_markup inside each. `styles` maps 'title', 'heading',
+    'body' and 'list' (one style per nesting level) to paragraph styles.
+    A single pass over the lines; each line becomes at most one flowable.
+    """
+    content = []
+    list_levels = styles['list']
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            content.append(Spacer(1, 6))
+            continue
+        if _RULE.fullmatch(line):
+            content.append(HRFlowable(width='100%', thickness=0.5, color=colors.grey, spaceBefore=4, spaceAfter=4))
+            continue
+        heading = _HEADING.match(line)
+        if heading:
+            style = styles['title'] if len(heading.group(1)) == 1 else styles['heading']
+            content.append(Paragraph(inline_markup(heading.group(2)), style))
+            continue
+        item = _BULLET.match(line)
+        bullet = '•'
+        if not item:
+            item = _NUMBERED.match(line)
+            bullet = f'{item.group(1)}.' if item else None
+        if item:
+            indent = raw[:len(raw) - len(raw.lstrip())].replace('\t', ' ' * LIST_INDENT)
+            level = min(len(indent) // LIST_INDENT, len(list_levels) - 1)
+            content.append(Paragraph(inline_markup(item.group(2)), list_levels[level], bulletText=bullet))
+            continue
+        content.append(Paragraph(inline_markup(line), styles['body']))
+    return content
@@ -0,0 +1,666 @@
+import copy
+import datetime
+import json
+import sqlite3
+import threading
+import uuid
+
+from search_index import SEARCH_PAGE_SIZE, SEARCH_SOURCES, SEARCHED_SENDERS, SearchIndex
+
+# Columns of every table the app stores data in
+TABLE_COLUMNS = {
+    'profiles': ('id', 'email', 'full_name', 'age', 'dob', 'stress_level', 'goals', 'interests',
+                 'preferred_language', 'created_at'),
+    'chat_sessions': ('id', 'user_id', 'title', 'created_at', 'last_message_at', 'archived_at'),
+    'chat_history': ('id', 'user_id', 'session_id', 'message', 'sender', 'timestamp',
+                     'feedback_for_message_index', 'client_id'),
+    'mood_logs': ('id', 'user_id', 'date', 'mood', 'note', 'created_at', 'client_id', 'updated_at'),
+    'questionnaire_responses': ('id', 'user_id', 'responses', 'recommendations', 'used_chat_history',
+                                'created_at', 'phq2_score', 'gad2_score', 'mood'),
+    'user_feedback': ('id', 'user_id', 'rating', 'feedback_text', 'session_type', 'features_used',
+                      'anonymous', 'created_at'),
+    'chat_archives': ('session_id', 'user_id', 'payload', 'message_count', 'last_message_at', 'archived_at'),
+    'mood_rollups': ('user_id', 'grain', 'bucket', 'weekday', 'mood', 'count', 'value_sum'),
+    'mood_stats': ('user_id', 'count', 'last_day', 'last_value', 'current_streak', 'longest_streak',
+                   'low_streak', 'ewma_fast', 'ewma_slow', 'ewm_var', 'cusum', 'decline_since',
+                   'previous', 'client_id', 'updated_at'),
+}
+
+# Columns holding JSON documents or booleans, which SQLite stores as text and integers
+JSON_COLUMNS = {'responses', 'features_used', 'previous'}
+BOOLEAN_COLUMNS = {'used_chat_history', 'anonymous'}
+
+
+class Repository:
+    """
+    Storage interface used by the app for all table reads and writes.
+
+    Reads take equality `filters`, lower bounds `gte`, upper bounds `lt`, membership `in_`,
+    `order` as a list of (column, descending) pairs, and an optional keyset cursor `before`:
+    a pair of (column, value) tuples selecting rows that sort after the cursor in `order`.
+    """
+
+    def select(self, table, columns='*', filters=None, gte=None, lt=None, in_=None,
+               order=None, limit=None, offset=0, before=None):
+        raise NotImplementedError
+
+    def count(self, table, filters=None, in_=None):
+        raise NotImplementedError
+
+    def insert(self, table, row):
+        raise NotImplementedError
+
+    def update(self, table, values, filters):
+        raise NotImplementedError
+
+    def upsert(self, table, rows, on_conflict):
+        """Insert a row or a list of rows, updating those that collide on `on_conflict`"""
+        raise NotImplementedError
+
+    def delete(self, table, filters):
+        raise NotImplementedError
+
+    def rpc(self, name, params=None):
+        raise NotImplementedError
+
+    def for_user(self, user_id):
+        """Repository whose server-side functions act for this user (auth.uid() on Supabase)"""
+        return self
+
+
+def check_table(table):
+    if table not in TABLE_COLUMNS:
+        raise ValueError(f"Unknown table: {table}")
+
+
+def iter_keyset(repository, table, columns='*', filters=None, in_=None, key=('created_at', 'id'), page_size=500):
+    """
+    Every matching row in ascending `key` order, read one keyset page at a time
+    so memory stays at one page however large the table. `key` is a pair of
+    columns, the second unique (e.g. created_at, id), and must be selected.
+    """
+    order = [(key[0], False), (key[1], False)]
+    cursor = None
+    while True:
+        rows = repository.select(table, columns, filters=filters, in_=in_, order=order,
+                                 limit=page_size, before=cursor)
+        yield from rows
+        if len(rows) < page_size:
+            return
+        cursor = ((key[0], rows[-1][key[0]]), (key[1], rows[-1][key[1]]))
+
+
+class SupabaseRepository(Repository):
+    """Repository backed by a Supabase client and its PostgREST API"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def _filtered(self, query, filters=None, gte=None, lt=None, in_=None):
+        for name, value in (filters or {}).items():
+            query = query.is_(name, 'null') if value is None else query.eq(name, value)
+        for name, value in (gte or {}).items():
+            query = query.gte(name, value)
+        for name, value in (lt or {}).items():
+            query = query.lt(name, value)
+        for name, values in (in_ or {}).items():
+            query = query.in_(name, list(values))
+        return query
+
+    def select(self, table, columns='*', filters=None, gte=None, lt=None, in_=None,
+               order=None, limit=None, offset=0, before=None):
+        check_table(table)
+        query = self._filtered(self.client.table(table).select(columns), filters, gte, lt, in_)
+        if before is not None:
+            query = query.or_(self._keyset_filter(before, order))
+        for column, descending in order or []:
+            query = query.order(column, desc=descending)
+        if limit is not None:
+            query = query.range(offset, offset + limit - 1)
+        return query.execute().data or []
+
+    @staticmethod
+    def _keyset_filter(before, order):
+        """PostgREST filter for rows after a two-column cursor, e.g. (timestamp, id)"""
+        (first, first_value), (second, second_value) = before
+        descending = dict(order or []).get(first, False)
+        op = 'lt' if descending else 'gt'
+        return (f'{first}.{op}."{first_value}",'
+                f'and({first}.eq."{first_value}",{second}.{op}."{second_value}")')
+
+    def count(self, table, filters=None, in_=None):
+        check_table(table)
+        query = self._filtered(self.client.table(table).select('id', count='exact'), filters, in_=in_)
+        return query.limit(1).execute().count or 0
+
+    def insert(self, table, row):
+        check_table(table)
+        return self.client.table(table).insert(row).execute().data or []
+
+    def update(self, table, values, filters):
+        check_table(table)
+        return self._filtered(self.client.table(table).update(values), filters).execute().data or []
+
+    def upsert(self, table, rows, on_conflict):
+        check_table(table)
+        return self.client.table(table).upsert(rows, on_conflict=on_conflict).execute().data or []
+
+    def delete(self, table, filters):
+        check_table(table)
+        return len(self._filtered(self.client.table(table).delete(), filters).execute().data or [])
+
+    def rpc(self, name, params=None):
+        return self.client.rpc(name, params or {}).execute().data
+
+
+class CountingRepository(Repository):
+    """Wraps a repository and records every call as one database round-trip"""
+
+    def __init__(self, inner, counter):
+        self.inner = inner
+        self.counter = counter
+
+    def select(self, table, columns='*', filters=None, gte=None, lt=None, in_=None,
+               order=None, limit=None, offset=0, before=None):
+        self.counter.record()
+        return self.inner.select(table, columns, filters=filters, gte=gte, lt=lt, in_=in_,
+                                 order=order, limit=limit, offset=offset, before=before)
+
+    def count(self, table, filters=None, in_=None):
+        self.counter.record()
+        return self.inner.count(table, filters=filters, in_=in_)
+
+    def insert(self, table, row):
+        self.counter.record()
+        return self.inner.insert(table, row)
+
+    def update(self, table, values, filters):
+        self.counter.record()
+        return self.inner.update(table, values, filters)
+
+    def upsert(self, table, rows, on_conflict):
+        self.counter.record()
+        return self.inner.upsert(table, rows, on_conflict)
+
+    def delete(self, table, filters):
+        self.counter.record()
+        return self.inner.delete(table, filters)
+
+    def rpc(self, name, params=None):
+        self.counter.record()
+        return self.inner.rpc(name, params)
+
+    def for_user(self, user_id):
+        return CountingRepository(self.inner.for_user(user_id), self.counter)
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id TEXT PRIMARY KEY, email TEXT, full_name TEXT, age INTEGER, dob TEXT, stress_level TEXT,
+    goals TEXT, interests TEXT, preferred_language TEXT DEFAULT 'en', created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS chat_sessions (
+    id TEXT PRIMARY KEY, user_id TEXT, title TEXT, created_at TEXT, last_message_at TEXT, archived_at TEXT
+);
+CREATE TABLE IF NOT EXISTS chat_history (
+    id TEXT PRIMARY KEY, user_id TEXT,
+    session_id TEXT REFERENCES chat_sessions(id) ON DELETE CASCADE,
+    message TEXT, sender TEXT, timestamp TEXT, feedback_for_message_index INTEGER, client_id TEXT
+);
+CREATE TABLE IF NOT EXISTS mood_logs (
+    id TEXT PRIMARY KEY, user_id TEXT, date TEXT, mood TEXT, note TEXT, created_at TEXT, client_id TEXT,
+    updated_at TEXT, UNIQUE (user_id, date)
+);
+CREATE TABLE IF NOT EXISTS questionnaire_responses (
+    id TEXT PRIMARY KEY, user_id TEXT, responses TEXT, recommendations TEXT,
+    used_chat_history INTEGER, created_at TEXT, phq2_score INTEGER, gad2_score INTEGER, mood TEXT
+);
+CREATE TABLE IF NOT EXISTS user_feedback (
+    id TEXT PRIMARY KEY, user_id TEXT, rating INTEGER, feedback_text TEXT, session_type TEXT,
+    features_used TEXT, anonymous INTEGER, created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS chat_archives (
+    session_id TEXT PRIMARY KEY REFERENCES chat_sessions(id) ON DELETE CASCADE, user_id TEXT,
+    payload TEXT, message_count INTEGER, last_message_at TEXT, archived_at TEXT
+);
+CREATE TABLE IF NOT EXISTS mood_rollups (
+    user_id TEXT, grain TEXT, bucket TEXT, weekday INTEGER, mood TEXT, count INTEGER, value_sum INTEGER,
+    PRIMARY KEY (user_id, grain, bucket, weekday, mood)
+);
+CREATE TABLE IF NOT EXISTS mood_stats (
+    user_id TEXT PRIMARY KEY, count INTEGER, last_day INTEGER, last_value INTEGER, current_streak INTEGER,
+    longest_streak INTEGER, low_streak INTEGER, ewma_fast REAL, ewma_slow REAL, ewm_var REAL, cusum REAL,
+    decline_since INTEGER, previous TEXT, client_id TEXT, updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS chat_sessions_user_created_idx ON chat_sessions (user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS chat_history_session_timestamp_idx ON chat_history (session_id, timestamp, id);
+CREATE INDEX IF NOT EXISTS chat_history_user_id_idx ON chat_history (user_id);
+CREATE INDEX IF NOT EXISTS mood_logs_user_date_idx ON mood_logs (user_id, date);
+CREATE INDEX IF NOT EXISTS questionnaire_responses_user_created_idx ON questionnaire_responses (user_id, created_at);
+CREATE INDEX IF NOT EXISTS user_feedback_user_id_idx ON user_feedback (user_id);
+"""
+
+# Columns added after a table was first created, applied to existing databases on open,
+# with an optional statement filling them for existing rows
+SQLITE_ADDED_COLUMNS = [
+    ('chat_history', 'client_id TEXT', None),
+    ('mood_logs', 'client_id TEXT', None),
+    ('chat_sessions', 'last_message_at TEXT',
+     "UPDATE chat_sessions SET last_message_at = "
+     "(SELECT MAX(timestamp) FROM chat_history WHERE session_id = chat_sessions.id)"),
+    ('chat_sessions', 'archived_at TEXT', None),
+    ('mood_logs', 'updated_at TEXT', "UPDATE mood_logs SET updated_at = created_at"),
+]
+
+
+def _mood_rollup_parts(ref):
+    """SQLite expressions for the rollup rows of a mood_logs row (see migrations/005_mood_rollups.sql)"""
+    value = (f"CASE {ref}.mood WHEN 'very_happy' THEN 5 WHEN 'happy' THEN 4 WHEN 'neutral' THEN 3 "
+             f"WHEN 'sad' THEN 2 WHEN 'very_sad' THEN 1 ELSE 0 END")
+    weekday = f"((CAST(strftime('%w', {ref}.date) AS INTEGER) + 6) % 7)"
+    week = f"date({ref}.date, '-' || {weekday} || ' days')"
+    month = f"strftime('%Y-%m-01', {ref}.date)"
+    return value, [('day', f"date({ref}.date)", weekday, f"{ref}.mood"),
+                   ('week', week, '-1', f"{ref}.mood"),
+                   ('month', month, '-1', f"{ref}.mood"),
+                   ('month_weekday', month, weekday, "''")]
+
+
+def _mood_rollup_delta(ref, sign):
+    value, parts = _mood_rollup_parts(ref)
+    rows = ",\n    ".join(f"({ref}.user_id, '{grain}', {bucket}, {weekday}, {mood}, {sign}, {sign} * ({value}))"
+                          for grain, bucket, weekday, mood in parts)
+    sql = (f"INSERT INTO mood_rollups (user_id, grain, bucket, weekday, mood, count, value_sum) VALUES\n    {rows}\n"
+           f"ON CONFLICT (user_id, grain, bucket, weekday, mood) DO UPDATE SET "
+           f"count = count + excluded.count, value_sum = value_sum + excluded.value_sum;\n")
+    if sign < 0:
+        sql += f"DELETE FROM mood_rollups WHERE user_id = {ref}.user_id AND count <= 0;\n"
+    return sql
+
+
+MOOD_ROLLUP_BACKFILL = "\nUNION ALL\n".join(
+    f"SELECT m.user_id, '{grain}', {bucket}, {weekday}, {mood}, COUNT(*), SUM({_mood_rollup_parts('m')[0]}) "
+    f"FROM mood_logs m GROUP BY "
+    # Constant columns are left out: SQLite reads an integer in GROUP BY as a column position
+    + ", ".join(expr for expr in ('m.user_id', bucket, weekday, mood) if expr not in ('-1', "''"))
+    for grain, bucket, weekday, mood in _mood_rollup_parts('m')[1])
+
+# Tables filled from existing data when they are first created
+SQLITE_ADDED_TABLES = {
+    'mood_rollups': ("INSERT INTO mood_rollups (user_id, grain, bucket, weekday, mood, count, value_sum) "
+                     + MOOD_ROLLUP_BACKFILL),
+}
+
+SQLITE_POST_MIGRATION = """
+CREATE UNIQUE INDEX IF NOT EXISTS chat_history_client_id_key ON chat_history (client_id);
+CREATE INDEX IF NOT EXISTS chat_sessions_inactive_idx ON chat_sessions (last_message_at) WHERE archived_at IS NULL;
+CREATE TRIGGER IF NOT EXISTS chat_history_touch_session AFTER INSERT ON chat_history
+WHEN NEW.session_id IS NOT NULL
+BEGIN
+    UPDATE chat_sessions SET last_message_at = NEW.timestamp
+    WHERE id = NEW.session_id AND (last_message_at IS NULL OR last_message_at < NEW.timestamp);
+END;
+CREATE TRIGGER IF NOT EXISTS profiles_delete_mood_stats AFTER DELETE ON profiles
+BEGIN
+    DELETE FROM mood_stats WHERE user_id = OLD.id;
+END;
+CREATE TRIGGER IF NOT EXISTS mood_logs_rollup_insert AFTER INSERT ON mood_logs
+BEGIN
+""" + _mood_rollup_delta('NEW', 1) + """END;
+CREATE TRIGGER IF NOT EXISTS mood_logs_rollup_delete AFTER DELETE ON mood_logs
+BEGIN
+""" + _mood_rollup_delta('OLD', -1) + """END;
+CREATE TRIGGER IF NOT EXISTS mood_logs_rollup_update AFTER UPDATE OF user_id, date, mood ON mood_logs
+BEGIN
+""" + _mood_rollup_delta('OLD', -1) + _mood_rollup_delta('NEW', 1) + """END;
+"""
+
+# Column that gets the current time when a row is inserted without it
+TIMESTAMP_DEFAULTS = {
+    'profiles': 'created_at',
+    'chat_sessions': 'created_at',
+    'chat_history': 'timestamp',
+    'mood_logs': 'created_at',
+    'questionnaire_responses': 'created_at',
+    'user_feedback': 'created_at',
+    'chat_archives': 'archived_at',
+    'mood_stats': 'updated_at',
+}
+
+
+class SQLiteRepository(Repository):
+    """
+    Embedded repository on a local SQLite database in WAL mode.
+
+    Mirrors the Supabase schema and the server-side functions in migrations/,
+    so the app can run offline and be benchmarked without a network.
+    """
+
+    def __init__(self, path='animoa.db'):
+        self.path = path
+        self.user_id = None
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        if path != ':memory:':
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        existing = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.conn.executescript(SQLITE_SCHEMA)
+        for table, column, backfill in SQLITE_ADDED_COLUMNS:
+            try:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+            except sqlite3.OperationalError:
+                continue  # Already there
+            if backfill:
+                self.conn.execute(backfill)
+        for table, backfill in SQLITE_ADDED_TABLES.items():
+            if existing and table not in existing:
+                self.conn.execute(backfill)
+        self.conn.executescript(SQLITE_POST_MIGRATION)
+        # Shared by every for_user() copy, like the connection
+        self.search_index = SearchIndex()
+
+    def for_user(self, user_id):
+        """Shallow copy sharing this connection, with rpc() acting for the given user"""
+        scoped = copy.copy(self)
+        scoped.user_id = user_id
+        return scoped
+
+    @staticmethod
+    def _columns(table, names):
+        """Validate column names, since they are interpolated into SQL"""
+        for name in names:
+            if name not in TABLE_COLUMNS[table]:
+                raise ValueError(f"Unknown column {name} for table {table}")
+        return list(names)
+
+    @staticmethod
+    def _encode(values):
+        encoded = {}
+        for name, value in values.items():
+            if name in JSON_COLUMNS and value is not None:
+                value = json.dumps(value)
+            elif name in BOOLEAN_COLUMNS and value is not None:
+                value = int(bool(value))
+            encoded[name] = value
+        return encoded
+
+    @staticmethod
+    def _decode(row):
+        decoded = dict(row)
+        for name, value in decoded.items():
+            if name in JSON_COLUMNS and value is not None:
+                decoded[name] = json.loads(value)
+            elif name in BOOLEAN_COLUMNS and value is not None:
+                decoded[name] = bool(value)
+        return decoded
+
+    def _where(self, table, filters=None, gte=None, lt=None, in_=None):
+        clauses, params = [], []
+        for name, value in (filters or {}).items():
+            self._columns(table, [name])
+            if value is None:
+                clauses.append(f"{name} IS NULL")
+            else:
+                clauses.append(f"{name} = ?")
+                params.append(value)
+        for name, value in (gte or {}).items():
+            self._columns(table, [name])
+            clauses.append(f"{name} >= ?")
+            params.append(value)
+        for name, value in (lt or {}).items():
+            self._columns(table, [name])
+            clauses.append(f"{name} < ?")
+            params.append(value)
+        for name, values in (in_ or {}).items():
+            self._columns(table, [name])
+            values = list(values)
+            if not values:
+                clauses.append("0")
+                continue
+            clauses.append(f"{name} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+        return clauses, params
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def select(self, table, columns='*', filters=None, gte=None, lt=None, in_=None,
+               order=None, limit=None, offset=0, before=None):
+        check_table(table)
+        if columns.strip() == '*':
+            column_sql = '*'
+        else:
+            column_sql = ', '.join(self._columns(table, [c.strip() for c in columns.split(',')]))
+        clauses, params = self._where(table, filters, gte, lt, in_)
+        if before is not None:
+            (first, first_value), (second, second_value) = before
+            self._columns(table, [first, second])
+            op = '<' if dict(order or []).get(first, False) else '>'
+            clauses.append(f"({first} {op} ? OR ({first} = ? AND {second} {op} ?))")
+            params.extend([first_value, first_value, second_value])
+        sql = f"SELECT {column_sql} FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if order:
+            self._columns(table, [column for column, _ in order])
+            sql += " ORDER BY " + ", ".join(f"{column} {'DESC' if desc else 'ASC'}" for column, desc in order)
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+        return [self._decode(row) for row in self._execute(sql, params)]
+
+    def count(self, table, filters=None, in_=None):
+        check_table(table)
+        clauses, params = self._where(table, filters, in_=in_)
+        sql = f"SELECT COUNT(*) FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return self._execute(sql, params)[0][0]
+
+    def _with_defaults(self, table, row):
+        row = dict(row)
+        if table != 'profiles' and 'id' in TABLE_COLUMNS[table]:
+            row.setdefault('id', str(uuid.uuid4()))
+        row.setdefault(TIMESTAMP_DEFAULTS[table], datetime.datetime.now().isoformat())
+        if table == 'profiles':
+            row.setdefault('preferred_language', 'en')
+        return self._encode(row)
+
+    def insert(self, table, row):
+        check_table(table)
+        row = self._with_defaults(table, row)
+        names = self._columns(table, row.keys())
+        sql = (f"INSERT INTO {table} ({', '.join(names)}) "
+               f"VALUES ({', '.join('?' for _ in names)}) RETURNING *")
+        return self._index([self._decode(r) for r in self._execute(sql, [row[n] for n in names])], table)
+
+    def update(self, table, values, filters):
+        check_table(table)
+        values = self._encode(values)
+        names = self._columns(table, values.keys())
+        clauses, params = self._where(table, filters)
+        sql = f"UPDATE {table} SET {', '.join(f'{n} = ?' for n in names)}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " RETURNING *"
+        return self._index([self._decode(r) for r in self._execute(sql, [values[n] for n in names] + params)], table)
+
+    def upsert(self, table, rows, on_conflict):
+        check_table(table)
+        conflict = self._columns(table, [c.strip() for c in on_conflict.split(',')])
+        results = []
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for row in ([rows] if isinstance(rows, dict) else rows):
+                    row = self._with_defaults(table, row)
+                    names = self._columns(table, row.keys())
+                    updates = [n for n in names if n not in conflict and n != 'id']
+                    sql = (f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)}) "
+                           f"ON CONFLICT ({', '.join(conflict)}) DO ")
+                    sql += ("UPDATE SET " + ", ".join(f"{n} = excluded.{n}" for n in updates)) if updates else "NOTHING"
+                    sql += " RETURNING *"
+                    results.extend(self._decode(r) for r in self.conn.execute(sql, [row[n] for n in names]))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return self._index(results, table)
+
+    def delete(self, table, filters):
+        check_table(table)
+        clauses, params = self._where(table, filters)
+        sql = f"DELETE FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if table not in ('chat_sessions', 'chat_history', 'mood_logs'):
+            with self._lock:
+                return self.conn.execute(sql, params).rowcount
+        # Deleted rows are dropped from the search index whatever the filters were
+        with self._lock:
+            deleted = [dict(row) for row in self.conn.execute(sql + " RETURNING id, user_id", params)]
+        if table == 'chat_sessions':
+            # Their messages went with them
+            for user_id in {row['user_id'] for row in deleted}:
+                self.search_index.forget(user_id)
+        for kind, (source, _, _) in SEARCH_SOURCES.items():
+            if source == table:
+                for row in deleted:
+                    self.search_index.remove(kind, row)
+        return len(deleted)
+
+    def _index(self, rows, table):
+        """Apply written rows to the loaded search indexes, returning the rows"""
+        for kind, (source, _, _) in SEARCH_SOURCES.items():
+            if source == table:
+                for row in rows:
+                    self.search_index.add(kind, row)
+        return rows
+
+    def _search(self, params):
+        """Search the user's notes and messages, building their index on first use"""
+        while not self.search_index.is_loaded(self.user_id):
+            with self._lock:
+                pending = self.search_index.start_load(self.user_id)
+                rows_by_kind = {}
+                for kind, (table, text_column, date_column) in SEARCH_SOURCES.items():
+                    extra, senders, args = '', '', [self.user_id]
+                    if table == 'chat_history':
+                        extra = ', session_id, sender'
+                        senders = f" AND sender IN ({', '.join('?' for _ in SEARCHED_SENDERS)})"
+                        args.extend(SEARCHED_SENDERS)
+                    rows_by_kind[kind] = [dict(row) for row in self.conn.execute(
+                        f"SELECT id, user_id, {text_column}, {date_column}{extra} FROM {table} "
+                        f"WHERE user_id = ? AND {text_column} IS NOT NULL AND {text_column} != ''{senders}",
+                        args)]
+            # Tokenizing is the slow part, other sessions keep using the connection meanwhile
+            self.search_index.load(self.user_id, rows_by_kind, pending)
+        kinds = params.get('p_kinds')
+        found = self.search_index.search(self.user_id, params['p_query'], params.get('p_language') or 'en',
+                                         kinds=kinds, limit=params.get('p_limit') or SEARCH_PAGE_SIZE,
+                                         offset=params.get('p_offset') or 0)
+        found['archived_sessions'] = 0
+        if kinds is None or 'chat' in kinds:
+            with self._lock:
+                found['archived_sessions'] = self.conn.execute(
+                    "SELECT COUNT(*) FROM chat_archives WHERE user_id = ?", (self.user_id,)).fetchone()[0]
+        return found
+
+    def rpc(self, name, params=None):
+        """Local equivalents of the server-side functions in migrations/"""
+        params = params or {}
+        if self.user_id is None:
+            raise PermissionError("Not authenticated")
+        if name == 'search_user_content':
+            return self._search(params)
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if name == 'delete_chat_session':
+                    result = self.conn.execute(
+                        "DELETE FROM chat_sessions WHERE id = ? AND user_id = ?",
+                        (params['p_session_id'], self.user_id)).rowcount
+                elif name == 'delete_assessment':
+                    result = self.conn.execute(
+                        "DELETE FROM questionnaire_responses WHERE id = ? AND user_id = ?",
+                        (params['p_assessment_id'], self.user_id)).rowcount
+                elif name == 'archive_chat_session':
+                    result = self._archive_chat_session(params)
+                elif name == 'restore_chat_session':
+                    result = self._restore_chat_session(params)
+                elif name == 'delete_all_user_data':
+                    result = {}
+                    for table in ('chat_history', 'chat_sessions', 'mood_logs',
+                                  'questionnaire_responses', 'user_feedback'):
+                        result[table] = self.conn.execute(
+                            f"DELETE FROM {table} WHERE user_id = ?", (self.user_id,)).rowcount
+                    result['profiles'] = self.conn.execute(
+                        "DELETE FROM profiles WHERE id = ?", (self.user_id,)).rowcount
+                else:
+                    raise ValueError(f"Unknown function: {name}")
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        if name != 'delete_assessment':
+            # Deleted, archived or restored messages: rebuild the search index on next use
+            self.search_index.forget(self.user_id)
+        return result
+
+    def _archive_chat_session(self, params):
+        session_id = params['p_session_id']
+        owner = self.conn.execute("SELECT user_id FROM chat_sessions WHERE id = ?", (session_id,)).fetchone()
+        if owner is None or owner[0] != self.user_id:
+            return 0
+        newer = self.conn.execute(
+            "SELECT 1 FROM chat_history WHERE session_id = ? AND timestamp > ? LIMIT 1",
+            (session_id, params['p_last_message_at'])).fetchone()
+        current = self.conn.execute("SELECT COUNT(*) FROM chat_history WHERE session_id = ?",
+                                    (session_id,)).fetchone()[0]
+        if newer or current != params['p_message_count']:
+            return 0
+        deleted = self.conn.execute("DELETE FROM chat_history WHERE session_id = ?", (session_id,)).rowcount
+        now = datetime.datetime.now().isoformat()
+        self.conn.execute(
+            "INSERT INTO chat_archives (session_id, user_id, payload, message_count, last_message_at, archived_at) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (session_id) DO UPDATE SET payload = excluded.payload, "
+            "message_count = excluded.message_count, last_message_at = excluded.last_message_at, "
+            "archived_at = excluded.archived_at",
+            (session_id, self.user_id, params['p_payload'], params['p_message_count'],
+             params['p_last_message_at'], now))
+        self.conn.execute("UPDATE chat_sessions SET archived_at = ? WHERE id = ?", (now, session_id))
+        return deleted
+
+    def _restore_chat_session(self, params):
+        session_id = params['p_session_id']
+        owned = self.conn.execute("SELECT 1 FROM chat_sessions WHERE id = ? AND user_id = ?",
+                                  (session_id, self.user_id)).fetchone()
+        if not owned:
+            return 0
+        archived = self.conn.execute("SELECT message_count FROM chat_archives WHERE session_id = ?",
+                                     (session_id,)).fetchone()
+        if archived is None:
+            self.conn.execute("UPDATE chat_sessions SET archived_at = NULL WHERE id = ?", (session_id,))
+            return 0
+        rows = [row for row in params['p_rows']
+                if row.get('session_id') == session_id and row.get('user_id') == self.user_id]
+        supplied = len({row.get('id') for row in rows})
+        if supplied != archived[0]:
+            raise ValueError(f"Restore of session {session_id} got {supplied} of its {archived[0]} archived messages")
+        restored = 0
+        for row in rows:
+            row = self._encode(row)
+            names = self._columns('chat_history', row.keys())
+            restored += self.conn.execute(
+                f"INSERT INTO chat_history ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)}) "
+                f"ON CONFLICT (id) DO NOTHING", [row[n] for n in names]).rowcount
+        self.conn.execute("DELETE FROM chat_archives WHERE session_id = ?", (session_id,))
+        self.conn.execute("UPDATE chat_sessions SET archived_at = NULL WHERE id = ?", (session_id,))
+        return restored
+
+    def close(self):
+        self.conn.close()
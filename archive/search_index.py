@@ -0,0 +1,281 @@
+import bisect
+import functools
+import heapq
+import html
+import re
+import threading
+import unicodedata
+
+# Kinds of searchable content and where their text lives
+SEARCH_SOURCES = {
+    'mood': ('mood_logs', 'note', 'date'),
+    'chat': ('chat_history', 'message', 'timestamp'),
+}
+
+# Chat senders whose messages are searched; feedback rows live in chat_history too
+SEARCHED_SENDERS = ('user', 'bot')
+
+SEARCH_PAGE_SIZE = 20
+
+# Shortest query term matched as a word prefix
+PREFIX_MIN_LENGTH = 3
+
+# Words left out of queries (documents keep them, so a query of only stopwords still works)
+STOPWORDS = {
+    'en': frozenset('a an and are as at be but by for from had has have i in is it its me my of on or so '
+                    'that the this to was were with you'.split()),
+    'es': frozenset('a al con de del el en es la las lo los me mi no o para pero por que se su un una y'.split()),
+    'zh': frozenset('的 了 是 我 你 在 和 也 就 都'.split()),
+}
+
+# Han, kana and hangul runs are split into overlapping bigrams, the usual
+# dictionary-free way to index languages written without spaces
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+_TOKEN = re.compile(rf'[{_CJK}]+|[^\W_]+')
+_CJK_RUN = re.compile(rf'[{_CJK}]')
+
+
+# Plural and verb endings stripped from longer words in English and Spanish, so
+# 'sleeping' finds 'sleep' and 'exámenes' finds 'examen'; longest first
+_SUFFIXES = ('ing', 'ed', 'es', 's')
+
+
+def fold(text):
+    """Lowercase and strip accents, so 'Ansiedad' matches 'ansiedad' and 'día' matches 'dia'"""
+    text = text.lower()
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize('NFKD', text)
+    return unicodedata.normalize('NFKC', ''.join(c for c in decomposed if not unicodedata.combining(c)))
+
+
+@functools.lru_cache(maxsize=65536)
+def stem(word):
+    if len(word) > 4:
+        for suffix in _SUFFIXES:
+            if word.endswith(suffix):
+                return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    """Index terms of a text: stemmed folded words, and bigrams (or single characters) of CJK runs"""
+    text = fold(text or '')
+    if text.isascii():
+        return [stem(token) for token in _TOKEN.findall(text)]
+    terms = []
+    for token in _TOKEN.findall(text):
+        if token.isascii() or not _CJK_RUN.match(token):
+            terms.append(stem(token))
+        elif len(token) == 1:
+            terms.append(token)
+        else:
+            terms.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return terms
+
+
+def query_terms(query, language='en'):
+    """Terms a query must all match, without the language's stopwords unless nothing else is left"""
+    terms = list(dict.fromkeys(tokenize(query)))
+    stopwords = STOPWORDS.get(language, STOPWORDS['en'])
+    return [term for term in terms if term not in stopwords] or terms
+
+
+def snippet(text, query, width=160):
+    """
+    An HTML-escaped excerpt of `text` around the first match of the query,
+    with matched words wrapped in <mark>. Words match by prefix, like searches.
+    """
+    text = text or ''
+    terms = sorted(query_terms(query), key=len, reverse=True)
+    if not terms:
+        return html.escape(text[:width])
+    folded = fold(text)
+    # Folding drops combining marks, so match on the folded text only when lengths agree
+    haystack = folded if len(folded) == len(text) else text.lower()
+    # Marks cover whole words, not just the matched stem or prefix
+    pattern = re.compile('|'.join(re.escape(term) if _CJK_RUN.match(term) else rf'\b{re.escape(term)}\w*'
+                                  for term in terms))
+    first = pattern.search(haystack)
+    start = max(0, (first.start() if first else 0) - width // 3)
+    end = min(len(text), start + width)
+    parts = ['…' if start else '']
+    position = start
+    for match in pattern.finditer(haystack, start, end):
+        parts.append(html.escape(text[position:match.start()]))
+        parts.append(f'<mark>{html.escape(text[match.start():match.end()])}</mark>')
+        position = match.end()
+    parts.append(html.escape(text[position:end]))
+    parts.append('…' if end < len(text) else '')
+    return ''.join(parts)
+
+
+class _UserIndex:
+    """
+    Postings of one user's documents: term -> list of document numbers.
+
+    Documents are numbered in the order they are added. Re-indexing or removing
+    a document only clears its slot in `docs`; postings keep the stale number and
+    searches skip it, so writes never rewrite postings lists.
+    """
+
+    # Positions in a document tuple
+    KIND, ID, SESSION_ID, DATE, CONTENT = range(5)
+
+    def __init__(self):
+        self.docs = []
+        self.numbers = {}
+        self.postings = {}
+        self._vocabulary = None
+
+    def add(self, doc):
+        self.remove((doc[self.KIND], doc[self.ID]))
+        terms = set(tokenize(doc[self.CONTENT]))
+        if not terms:
+            return
+        number = len(self.docs)
+        self.docs.append(doc)
+        self.numbers[(doc[self.KIND], doc[self.ID])] = number
+        postings = self.postings
+        for term in terms:
+            numbers = postings.get(term)
+            if numbers is None:
+                postings[term] = [number]
+                self._vocabulary = None
+            else:
+                numbers.append(number)
+
+    def remove(self, key):
+        number = self.numbers.pop(key, None)
+        if number is not None:
+            self.docs[number] = None
+
+    def matching(self, term):
+        """
+        Numbers of documents with a word starting with `term`. CJK bigrams and
+        terms shorter than PREFIX_MIN_LENGTH match exactly, since a one- or
+        two-letter prefix would expand to much of the vocabulary.
+        """
+        if len(term) < PREFIX_MIN_LENGTH or _CJK_RUN.match(term):
+            return set(self.postings.get(term, ()))
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        i = bisect.bisect_left(vocabulary, term)
+        numbers = set()
+        while i < len(vocabulary) and vocabulary[i].startswith(term):
+            numbers.update(self.postings[vocabulary[i]])
+            i += 1
+        return numbers
+
+
+class SearchIndex:
+    """
+    In-process inverted index over mood notes and chat messages, per user.
+
+    Stands in for the Postgres full-text indexes (migrations/008_search.sql) on
+    the SQLite backend. A user's index is built from the database on their first
+    search and then kept current by the repository's writes; anything it cannot
+    apply precisely just drops the user's index, to be rebuilt on the next search.
+
+    Building happens outside the repository's lock: start_load() is called while
+    the rows are read, and rows written between then and load() are kept and
+    applied to the new index, so none are missed.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def is_loaded(self, user_id):
+        return user_id in self._users
+
+    def start_load(self, user_id):
+        """Begin rebuilding a user's index; returns the token to pass to load()"""
+        with self._lock:
+            return self._loading.setdefault(user_id, [])
+
+    def load(self, user_id, rows_by_kind, pending=None):
+        """
+        Build a user's index from {kind: rows} with the columns named in
+        SEARCH_SOURCES (and chat senders). With a start_load() token, returns
+        False without installing the index if the user's index was dropped or
+        built by another thread meanwhile.
+        """
+        index = _UserIndex()
+        for kind, rows in rows_by_kind.items():
+            for row in rows:
+                self._add_row(index, kind, row)
+        with self._lock:
+            if pending is not None:
+                if self._loading.get(user_id) is not pending:
+                    return False
+                del self._loading[user_id]
+                for kind, row, deleted in pending:
+                    if deleted:
+                        index.remove((kind, row['id']))
+                    else:
+                        self._add_row(index, kind, row)
+            self._users[user_id] = index
+        return True
+
+    @staticmethod
+    def _add_row(index, kind, row):
+        _, text_column, date_column = SEARCH_SOURCES[kind]
+        if kind == 'chat' and row.get('sender') not in SEARCHED_SENDERS:
+            index.remove((kind, row['id']))
+            return
+        index.add((kind, row['id'], row.get('session_id'), str(row.get(date_column) or ''),
+                   row.get(text_column) or ''))
+
+    def add(self, kind, row):
+        """Index (or re-index) one row for a user whose index is loaded"""
+        with self._lock:
+            index = self._users.get(row.get('user_id'))
+            if index is not None:
+                self._add_row(index, kind, row)
+            elif row.get('user_id') in self._loading:
+                self._loading[row['user_id']].append((kind, row, False))
+
+    def remove(self, kind, row):
+        """Drop one deleted row (with id and user_id) from its user's index"""
+        with self._lock:
+            index = self._users.get(row.get('user_id'))
+            if index is not None:
+                index.remove((kind, row['id']))
+            elif row.get('user_id') in self._loading:
+                self._loading[row['user_id']].append((kind, row, True))
+
+    def forget(self, user_id=None):
+        """Drop one user's index, or every index when the affected users are unknown"""
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+                self._loading.clear()
+            else:
+                self._users.pop(user_id, None)
+                self._loading.pop(user_id, None)
+
+    def search(self, user_id, query, language='en', kinds=None, limit=SEARCH_PAGE_SIZE, offset=0):
+        """
+        One page of the user's documents matching every query term, newest first.
+        Returns {'total': matches, 'results': [{kind, id, session_id, date, content}]}.
+        """
+        terms = query_terms(query, language)
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is None or not terms:
+                return {'total': 0, 'results': []}
+            # Rarest term first keeps the running intersection small
+            candidates = sorted((index.matching(term) for term in terms), key=len)
+            numbers = candidates[0]
+            for other in candidates[1:]:
+                numbers &= other
+            docs = [doc for doc in map(index.docs.__getitem__, numbers)
+                    if doc is not None and (kinds is None or doc[_UserIndex.KIND] in kinds)]
+        # Only the pages up to this one need ordering
+        newest = heapq.nlargest(offset + limit, docs,
+                                key=lambda doc: (doc[_UserIndex.DATE], str(doc[_UserIndex.ID])))
+        fields = ('kind', 'id', 'session_id', 'date', 'content')
+        return {'total': len(docs), 'results': [dict(zip(fields, doc)) for doc in newest[offset:]]}
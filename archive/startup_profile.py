@@ -0,0 +1,112 @@
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main_app_v7.py')
+
+# Modules the first render should not import; they load with the pages that use them
+DEFERRED_MODULES = ('numpy', 'pandas', 'altair', 'groq', 'reportlab')
+
+# Written to stderr between Streamlit's own imports and the app's
+RUN_MARKER = '--- animoa first render ---'
+
+_IMPORT_LINE = re.compile(r'^import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)')
+
+
+def parse_importtime(output):
+    """
+    Cumulative import seconds per top-level package from `python -X importtime`
+    output, counting only imports made after RUN_MARKER (by the app itself).
+    """
+    totals = {}
+    lines = output.splitlines()
+    if RUN_MARKER in lines:
+        lines = lines[lines.index(RUN_MARKER) + 1:]
+    for line in lines:
+        match = _IMPORT_LINE.match(line)
+        # Nested imports are already part of their parent's cumulative time
+        if not match or len(match.group(2)) > 1:
+            continue
+        package = match.group(3).split('.')[0]
+        totals[package] = totals.get(package, 0.0) + int(match.group(1)) / 1e6
+    return totals
+
+
+def render_once(timeout):
+    """Run the app's first render in this process and print its measurements as JSON"""
+    from streamlit.testing.v1 import AppTest
+    import lazy_imports
+
+    already_loaded = {name for name in DEFERRED_MODULES if name in sys.modules}
+    sys.stderr.write(RUN_MARKER + '\n')
+    sys.stderr.flush()
+    started = time.perf_counter()
+    app = AppTest.from_file(APP, default_timeout=timeout)
+    app.run()
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'first_render': elapsed,
+        'deferred_loaded': [name for name in DEFERRED_MODULES
+                            if name in sys.modules and name not in already_loaded],
+        'loaded_by_streamlit': sorted(already_loaded),
+        'lazy_imports': lazy_imports.IMPORT_TIMES,
+        'exceptions': [str(exception.value) for exception in app.exception],
+    }))
+
+
+def profile(timeout):
+    """One cold start in a fresh interpreter: (measurements, import seconds per package)"""
+    child = subprocess.run([sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--child',
+                            '--timeout', str(timeout)],
+                           capture_output=True, text=True, cwd=os.path.dirname(APP))
+    if child.returncode != 0:
+        raise RuntimeError(f"First render failed:\n{child.stderr[-2000:]}")
+    return json.loads(child.stdout.strip().splitlines()[-1]), parse_importtime(child.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold start of main_app_v7: import time per "
+                                                 "package and time to first render")
+    parser.add_argument('--runs', type=int, default=3, help="cold starts to measure, each in a new process")
+    parser.add_argument('--top', type=int, default=15, help="packages to list, slowest first")
+    parser.add_argument('--budget', type=float,
+                        help="fail if the median time to first render exceeds this many seconds")
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        render_once(args.timeout)
+        return
+
+    runs = [profile(args.timeout) for _ in range(args.runs)]
+    renders = [measurements['first_render'] for measurements, _ in runs]
+    measurements, imports = runs[-1]
+    print(f"[startup] first_render median={statistics.median(renders):.3f}s "
+          f"min={min(renders):.3f}s max={max(renders):.3f}s runs={len(renders)}")
+    for package, seconds in sorted(imports.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"[startup] import {package:<24} {seconds * 1000:8.1f} ms")
+    for name, seconds in measurements['lazy_imports'].items():
+        print(f"[startup] lazy   {name:<24} {seconds * 1000:8.1f} ms")
+    if measurements['loaded_by_streamlit']:
+        print(f"[startup] already imported by streamlit: {', '.join(measurements['loaded_by_streamlit'])}")
+    for exception in measurements['exceptions']:
+        print(f"[startup] app raised: {exception}")
+
+    failures = []
+    if measurements['deferred_loaded']:
+        failures.append(f"first render imported {', '.join(measurements['deferred_loaded'])}")
+    if args.budget is not None and statistics.median(renders) > args.budget:
+        failures.append(f"median first render {statistics.median(renders):.3f}s is over {args.budget:.3f}s")
+    for failure in failures:
+        print(f"[startup] FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
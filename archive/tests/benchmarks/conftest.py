@@ -0,0 +1,57 @@
+import statistics
+import time
+
+import pytest
+
+
+def measure(name, run, repeat=20):
+    """Call run() `repeat` times and print and return its latency in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    result = {'p50': statistics.median(times), 'p95': times[max(0, round(len(times) * 0.95) - 1)],
+              'max': times[-1]}
+    print(f"\n{name}: p50={result['p50']:.2f}ms p95={result['p95']:.2f}ms max={result['max']:.2f}ms "
+          f"(n={repeat})")
+    return result
+
+
+@pytest.fixture
+def latency():
+    return measure
+
+
+RESPONSES = {"mood": "Several days", "interest": "More than half the days", "anxiety": "Nearly every day",
+             "worry": "Several days", "sleep": "Poor", "support": "Moderate",
+             "coping": "Walks in the evening, music, calling my sister"}
+
+# Shaped like generate_recommendations output: headings, nested lists, inline markup
+RECOMMENDATIONS = """# Your Wellness Plan
+
+## Sleep
+You mentioned **poor sleep** on *most* nights. Small changes add up:
+
+1. Keep a regular bedtime, even at weekends
+2. Avoid screens for an hour before bed
+   - Try reading or `box breathing` instead
+   - Dim the lights after 9pm
+3. Limit caffeine after noon
+
+## Anxiety & worry
+- Write worries down at a set time each day (the "worry window")
+- Practise grounding: name 5 things you see, 4 you hear, 3 you can touch
+- See [NHS guidance](https://www.nhs.uk/mental-health/conditions/anxiety/) for more
+
+---
+
+Remember that small steps matter! Try just one of these today and see how it feels.
+"""
+
+
+@pytest.fixture
+def report():
+    """(responses, recommendations) of a typical wellness report"""
+    return RESPONSES, RECOMMENDATIONS
@@ -0,0 +1,36 @@
+"""
+Bulk export throughput: the same set of wellness reports written to a ZIP in
+this process and across the worker pool, to show how rendering scales with cores.
+"""
+import io
+import os
+import time
+
+import pytest
+
+from bulk_export import ExportJob, export_pool, write_zip
+from wellness_pdf import create_wellness_pdf
+
+pytestmark = pytest.mark.benchmark
+
+REPORTS = 200
+
+
+def test_export_scales_with_cores(report, stop_export_pool):
+    jobs = [ExportJob(f"assessments/report_{i}.pdf", create_wellness_pdf, report) for i in range(REPORTS)]
+    cores = os.cpu_count() or 1
+    timings = {}
+    for workers in sorted({1, 2, cores}):
+        if workers > 1:
+            # Start the pool and warm each worker before timing
+            pool, _ = export_pool(workers)
+            list(pool.map(abs, range(workers)))
+        out = io.BytesIO()
+        start = time.perf_counter()
+        assert write_zip(jobs, out, total=REPORTS, workers=workers) == REPORTS
+        timings[workers] = time.perf_counter() - start
+        print(f"\n{REPORTS} reports with {workers} worker(s): {timings[workers]:.2f}s "
+              f"({REPORTS / timings[workers]:.0f}/s, {timings[1] / timings[workers]:.1f}x)")
+    if cores >= 2:
+        # Spawned workers do the rendering; two should beat one by a clear margin
+        assert timings[2] < timings[1] * 0.8
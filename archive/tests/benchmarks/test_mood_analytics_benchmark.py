@@ -0,0 +1,46 @@
+"""
+Mood analytics at scale: weekday x mood grids for 10k users with ten years of
+daily logs in one batch, and one user's figures for each mood page range.
+"""
+import time
+
+import numpy as np
+import pytest
+
+from mood_analytics import N_MOODS, MoodSeries, batch_grids, day_number, weekdays
+
+pytestmark = pytest.mark.benchmark
+
+USERS = 10_000
+DAYS = 3650
+FIRST_DAY = day_number('2015-01-01')
+
+
+def test_ten_years_for_ten_thousand_users():
+    rng = np.random.default_rng(0)
+    days = np.tile(np.arange(FIRST_DAY, FIRST_DAY + DAYS, dtype=np.int32), USERS)
+    user_index = np.repeat(np.arange(USERS, dtype=np.int32), DAYS)
+    codes = rng.integers(0, N_MOODS, size=USERS * DAYS, dtype=np.int8)
+
+    start = time.perf_counter()
+    grids = batch_grids(user_index, days, codes, USERS)
+    print(f"\nbatch_grids over {USERS * DAYS:,} logs: {time.perf_counter() - start:.2f}s")
+
+    assert grids.shape == (USERS, 7, N_MOODS)
+    assert grids.sum() == USERS * DAYS
+    # Spot-check one user against a direct count
+    mine = slice(42 * DAYS, 43 * DAYS)
+    expected = np.zeros((7, N_MOODS), dtype=np.int64)
+    np.add.at(expected, (weekdays(days[mine]), codes[mine]), 1)
+    assert (grids[42] == expected).all()
+
+
+def test_one_users_ranges(latency):
+    rng = np.random.default_rng(1)
+    series = MoodSeries(np.arange(FIRST_DAY, FIRST_DAY + DAYS, dtype=np.int32),
+                        rng.integers(0, N_MOODS, size=DAYS, dtype=np.int8))
+    for name, start, bucket_days in (('week', '2024-12-25', 1), ('month', '2024-12-01', 1),
+                                     ('year', '2024-01-01', 1), ('all time', '2015-01-01', 7)):
+        result = latency(f"{name} figures over ten years of logs",
+                         lambda: series.since(start).stats(bucket_days).series, repeat=50)
+        assert result['p95'] < 100
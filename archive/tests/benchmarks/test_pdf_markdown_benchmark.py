@@ -0,0 +1,40 @@
+"""
+Throughput of the markdown to flowables conversion: inline_markup alone, and
+markdown_flowables over a long transcript-sized document.
+"""
+import time
+
+import pytest
+from reportlab.lib.styles import getSampleStyleSheet
+
+from pdf_markdown import inline_markup, list_styles, markdown_flowables
+
+pytestmark = pytest.mark.benchmark
+
+# Copies of the sample recommendations in the long document, about as long as a big chat transcript
+COPIES = 200
+
+
+def _styles():
+    sample = getSampleStyleSheet()
+    return {'title': sample['Title'], 'heading': sample['Heading2'], 'body': sample['Normal'],
+            'list': list_styles(sample['Normal'])}
+
+
+def test_inline_markup_throughput(report):
+    lines = [line for line in report[1].splitlines() if line] * 500
+    start = time.perf_counter()
+    for line in lines:
+        inline_markup(line)
+    elapsed = time.perf_counter() - start
+    print(f"\ninline_markup: {len(lines) / elapsed:,.0f} lines/s")
+    assert len(lines) / elapsed > 10_000
+
+
+def test_markdown_flowables_throughput(report, latency):
+    document = "\n".join([report[1]] * COPIES)
+    styles = _styles()
+    result = latency(f"markdown_flowables over {len(document.splitlines()):,} lines",
+                     lambda: markdown_flowables(document, styles), repeat=10)
+    print(f"markdown_flowables: {len(document.splitlines()) / result['p50'] * 1000:,.0f} lines/s")
+    assert result['p95'] < 5000
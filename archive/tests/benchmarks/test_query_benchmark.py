@@ -0,0 +1,60 @@
+"""
+Latency of the app's common reads on each Repository backend, over a user with
+a few years of history. The Supabase run needs SUPABASE_TEST_ENV (see
+tests/conftest.py) and measures the network round trip as well.
+"""
+import datetime
+import uuid
+
+import pytest
+
+pytestmark = pytest.mark.benchmark
+
+MESSAGES = 5000
+MOOD_DAYS = 3 * 365
+ASSESSMENTS = 200
+# Rows sent per write while seeding
+BATCH = 500
+
+
+def _seed(repository, user_id):
+    session_id = str(uuid.uuid4())
+    repository.insert('chat_sessions', {'id': session_id, 'user_id': user_id, 'title': 'Benchmark'})
+    start = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+    messages = [{'id': str(uuid.uuid4()), 'user_id': user_id, 'session_id': session_id,
+                 'message': f'Message {i} about sleep and work', 'sender': 'user' if i % 2 == 0 else 'bot',
+                 'timestamp': (start + datetime.timedelta(minutes=i)).isoformat()} for i in range(MESSAGES)]
+    moods = [{'id': str(uuid.uuid4()), 'user_id': user_id,
+              'date': (start + datetime.timedelta(days=i)).date().isoformat(),
+              'mood': ('happy', 'neutral', 'sad')[i % 3]} for i in range(MOOD_DAYS)]
+    assessments = [{'id': str(uuid.uuid4()), 'user_id': user_id, 'responses': {},
+                    'created_at': (start + datetime.timedelta(days=i * 5)).isoformat()} for i in range(ASSESSMENTS)]
+    for table, rows in (('chat_history', messages), ('mood_logs', moods), ('questionnaire_responses', assessments)):
+        for i in range(0, len(rows), BATCH):
+            repository.upsert(table, rows[i:i + BATCH], on_conflict='id')
+    return session_id, messages
+
+
+def test_common_read_latency(backend, latency):
+    repository, user_id = backend
+    session_id, messages = _seed(repository, user_id)
+    middle = messages[MESSAGES // 2]
+    reads = {
+        'latest chat page': lambda: repository.select(
+            'chat_history', '*', filters={'session_id': session_id}, order=[('timestamp', True), ('id', True)],
+            limit=50),
+        'earlier chat page (keyset)': lambda: repository.select(
+            'chat_history', '*', filters={'session_id': session_id}, order=[('timestamp', True), ('id', True)],
+            limit=50, before=(('timestamp', middle['timestamp']), ('id', middle['id']))),
+        'message count': lambda: repository.count('chat_history', filters={'user_id': user_id}),
+        'daily mood series': lambda: repository.select(
+            'mood_rollups', 'bucket, mood', filters={'user_id': user_id, 'grain': 'day'}, order=[('bucket', False)]),
+        'assessment page': lambda: repository.select(
+            'questionnaire_responses', 'id, created_at, phq2_score, gad2_score', filters={'user_id': user_id},
+            order=[('created_at', True)], limit=10),
+        'search': lambda: repository.rpc('search_user_content', {'p_query': 'sleep work'}),
+    }
+    for name, read in reads.items():
+        read()  # Warm caches and, on SQLite, the search index
+        result = latency(f"{type(repository).__name__} {name}", read)
+        assert result['p95'] < 2000, name
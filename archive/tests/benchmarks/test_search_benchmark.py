@@ -0,0 +1,70 @@
+"""
+Search on the SQLite backend over one user with a million messages: building
+the in-process index on the first search, warm query latency, and how long
+other sessions wait for the shared connection while the index is built.
+"""
+import random
+import threading
+import time
+import uuid
+
+import pytest
+
+from repositories import SQLiteRepository
+
+pytestmark = pytest.mark.benchmark
+
+ROWS = 1_000_000
+# Each message has ten rare words and two common ones, so queries match a few or many rows
+RARE = [f'w{n}' for n in range(5000)]
+COMMON = ['sleep', 'exams', 'anxious', 'walk', 'family', 'tired', 'work']
+
+
+@pytest.fixture(scope='module')
+def repository(tmp_path_factory):
+    user_id = str(uuid.uuid4())
+    repository = SQLiteRepository(str(tmp_path_factory.mktemp('search') / 'animoa.db')).for_user(user_id)
+    session = repository.insert('chat_sessions', {'id': str(uuid.uuid4()), 'user_id': user_id, 'title': 'Chat'})[0]
+    rng = random.Random(0)
+    rows = ((str(uuid.uuid4()), user_id, session['id'], ' '.join(rng.choices(RARE, k=10) + rng.choices(COMMON, k=2)),
+             rng.choice(('user', 'bot')), f'2024-01-01T00:00:00.{i:06d}+00:00') for i in range(ROWS))
+    with repository._lock:
+        repository.conn.execute("BEGIN")
+        repository.conn.executemany("INSERT INTO chat_history (id, user_id, session_id, message, sender, timestamp) "
+                                    "VALUES (?, ?, ?, ?, ?, ?)", rows)
+        repository.conn.execute("COMMIT")
+    yield repository
+    repository.close()
+
+
+def test_first_search_builds_without_holding_the_connection(repository):
+    waits = []
+    done = threading.Event()
+
+    def other_session():
+        while not done.is_set():
+            start = time.perf_counter()
+            repository.select('profiles', 'id', filters={'id': 'someone-else'})
+            waits.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.005)
+
+    reader = threading.Thread(target=other_session)
+    reader.start()
+    start = time.perf_counter()
+    found = repository.rpc('search_user_content', {'p_query': 'sleep exams'})
+    build = time.perf_counter() - start
+    done.set()
+    reader.join()
+
+    print(f"\nfirst search over {ROWS} messages: {build:.1f}s, {found['total']} matches; "
+          f"other session's longest wait {max(waits):.0f}ms over {len(waits)} reads")
+    assert found['total'] > 0
+    # Reading the rows holds the connection, tokenizing them must not
+    assert max(waits) < build * 1000 / 2
+
+
+def test_warm_search_latency(repository, latency):
+    repository.rpc('search_user_content', {'p_query': 'sleep'})
+    for query in ('sleep', 'sleep exams', 'w12', 'anx', 'tired family walk'):
+        result = latency(f"search '{query}'", lambda: repository.rpc('search_user_content', {'p_query': query}))
+        assert result['p95'] < 1000
@@ -0,0 +1,36 @@
+"""
+Cost of one wellness report: the first render, which builds the shared
+template, then the latency and peak allocations of each report after it.
+"""
+import time
+import tracemalloc
+
+import pytest
+
+from wellness_pdf import create_wellness_pdf
+
+pytestmark = pytest.mark.benchmark
+
+
+def _peak_kib(render):
+    tracemalloc.start()
+    try:
+        render()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def test_report_latency_and_allocations(report, latency):
+    responses, recommendations = report
+
+    start = time.perf_counter()
+    first = create_wellness_pdf(responses, recommendations).getvalue()
+    print(f"\nfirst report (builds the template): {(time.perf_counter() - start) * 1000:.1f}ms, "
+          f"{len(first) / 1024:.1f} KiB")
+    assert first.startswith(b'%PDF')
+
+    result = latency("report", lambda: create_wellness_pdf(responses, recommendations), repeat=30)
+    peak = _peak_kib(lambda: create_wellness_pdf(responses, recommendations))
+    print(f"report peak allocations: {peak:.0f} KiB")
+    assert result['p95'] < 1000
@@ -0,0 +1,74 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+# The app's modules sit next to this directory, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repositories import SQLiteRepository, SupabaseRepository  # noqa: E402
+
+# A dedicated Supabase account the conformance suite signs in as; all of its data is deleted
+SUPABASE_TEST_ENV = ('SUPABASE_URL', 'SUPABASE_KEY', 'ANIMOA_TEST_EMAIL', 'ANIMOA_TEST_PASSWORD')
+
+
+def pytest_addoption(parser):
+    parser.addoption('--benchmarks', action='store_true', help="also run the benchmarks in tests/benchmarks")
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', "benchmark: slow measurement, only run with --benchmarks")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--benchmarks'):
+        return
+    skip = pytest.mark.skip(reason="benchmark, run with --benchmarks")
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
+def _sqlite_backend(tmp_path):
+    user_id = str(uuid.uuid4())
+    repository = SQLiteRepository(str(tmp_path / 'animoa.db')).for_user(user_id)
+    yield repository, user_id
+    repository.close()
+
+
+def _supabase_backend():
+    missing = [name for name in SUPABASE_TEST_ENV if not os.getenv(name)]
+    if missing:
+        pytest.skip(f"Supabase conformance run needs {', '.join(missing)}")
+    from supabase import create_client
+    client = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_KEY'))
+    session = client.auth.sign_in_with_password({'email': os.getenv('ANIMOA_TEST_EMAIL'),
+                                                 'password': os.getenv('ANIMOA_TEST_PASSWORD')})
+    repository = SupabaseRepository(client)
+    # Left over by an interrupted run
+    repository.rpc('delete_all_user_data')
+    yield repository, session.user.id
+    repository.rpc('delete_all_user_data')
+    client.auth.sign_out()
+
+
+@pytest.fixture(params=['sqlite', 'supabase'])
+def backend(request, tmp_path):
+    """(repository acting for a test user, that user's id) with only the user's profile stored"""
+    backends = _sqlite_backend(tmp_path) if request.param == 'sqlite' else _supabase_backend()
+    repository, user_id = next(backends)
+    repository.upsert('profiles', {'id': user_id, 'full_name': 'Conformance Test'}, on_conflict='id')
+    yield repository, user_id
+    next(backends, None)
+
+
+@pytest.fixture
+def stop_export_pool():
+    """Shut bulk_export's shared worker pool down after the test; left to interpreter exit it is torn down noisily"""
+    yield
+    import bulk_export
+    pool = bulk_export._pool
+    if pool is not None:
+        bulk_export._reset_pool(pool)
+        pool.shutdown()
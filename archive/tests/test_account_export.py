@@ -0,0 +1,76 @@
+import csv
+import gzip
+import io
+import json
+import uuid
+import zipfile
+
+import pytest
+
+from account_export import export_account
+from chat_archive import pack_messages
+from repositories import SQLiteRepository
+
+
+@pytest.fixture
+def account(tmp_path):
+    """(repository, user id, rows written per table) for a user with a little of everything"""
+    user_id = str(uuid.uuid4())
+    repository = SQLiteRepository(str(tmp_path / 'animoa.db')).for_user(user_id)
+    repository.upsert('profiles', {'id': user_id, 'full_name': 'Export Test'}, on_conflict='id')
+    live = repository.insert('chat_sessions', {'id': str(uuid.uuid4()), 'user_id': user_id, 'title': 'Exams'})[0]
+    archived = repository.insert('chat_sessions', {'id': str(uuid.uuid4()), 'user_id': user_id, 'title': 'Old',
+                                                   'archived_at': '2023-01-01T00:00:00+00:00'})[0]
+    messages = [{'id': str(uuid.uuid4()), 'user_id': user_id, 'session_id': live['id'],
+                 'message': f'Line {i}, "quoted"', 'sender': 'user', 'timestamp': f'2024-01-01T00:00:0{i}+00:00'}
+                for i in range(3)]
+    repository.upsert('chat_history', messages, on_conflict='id')
+    old = [{'id': str(uuid.uuid4()), 'user_id': user_id, 'session_id': archived['id'], 'message': 'Archived',
+            'sender': 'bot', 'timestamp': '2022-12-31T00:00:00+00:00'}]
+    repository.insert('chat_archives', {'session_id': archived['id'], 'user_id': user_id,
+                                        'payload': pack_messages(old), 'archived_at': '2023-01-01T00:00:00+00:00'})
+    repository.insert('mood_logs', {'id': str(uuid.uuid4()), 'user_id': user_id, 'date': '2024-01-01',
+                                    'mood': 'happy', 'note': 'Näher am Meer'})
+    repository.insert('questionnaire_responses', {'id': str(uuid.uuid4()), 'user_id': user_id,
+                                                  'responses': {'mood': 'Several days', 'sleep': 'Fair'}})
+    yield repository, user_id, messages + old
+    repository.close()
+
+
+def test_jsonl_round_trip(account):
+    repository, user_id, messages = account
+    out = io.BytesIO()
+
+    counts = export_account(repository, user_id, out, 'jsonl', page_size=2)
+
+    lines = [json.loads(line) for line in gzip.decompress(out.getvalue()).decode('utf-8').splitlines()]
+    assert counts == {'profiles': 1, 'chat_sessions': 2, 'chat_history': 4, 'mood_logs': 1,
+                      'questionnaire_responses': 1}
+    assert len(lines) == sum(counts.values())
+    exported = {line['row']['id']: line['row'] for line in lines if line['table'] == 'chat_history'}
+    assert {m['id']: m['message'] for m in messages} == {id: row['message'] for id, row in exported.items()}
+    [assessment] = [line['row'] for line in lines if line['table'] == 'questionnaire_responses']
+    assert assessment['responses'] == {'mood': 'Several days', 'sleep': 'Fair'}
+    [mood] = [line['row'] for line in lines if line['table'] == 'mood_logs']
+    assert mood['note'] == 'Näher am Meer'
+
+
+def test_csv_round_trip(account):
+    repository, user_id, messages = account
+    out = io.BytesIO()
+
+    counts = export_account(repository, user_id, out, 'csv', page_size=2)
+
+    with zipfile.ZipFile(io.BytesIO(out.getvalue())) as archive:
+        tables = {name[:-len('.csv')]: list(csv.DictReader(io.TextIOWrapper(archive.open(name), encoding='utf-8')))
+                  for name in archive.namelist()}
+    assert {table: len(rows) for table, rows in tables.items()} == counts
+    assert sorted(row['message'] for row in tables['chat_history']) == sorted(m['message'] for m in messages)
+    assert json.loads(tables['questionnaire_responses'][0]['responses']) == {'mood': 'Several days', 'sleep': 'Fair'}
+    assert tables['mood_logs'][0]['note'] == 'Näher am Meer'
+
+
+def test_unknown_format_is_refused(account):
+    repository, user_id, _ = account
+    with pytest.raises(ValueError):
+        export_account(repository, user_id, io.BytesIO(), 'xml')
@@ -0,0 +1,65 @@
+import io
+import uuid
+import zipfile
+import zlib
+
+import pytest
+
+from bulk_export import ExportJob, account_export_jobs, write_zip
+from repositories import SQLiteRepository
+
+RESPONSES = {"mood": "Several days", "interest": "Not at all", "anxiety": "Several days", "worry": "Not at all",
+             "sleep": "Fair", "support": "Strong", "coping": "Walks"}
+
+
+def _files(out):
+    with zipfile.ZipFile(io.BytesIO(out.getvalue())) as archive:
+        return {name: archive.read(name) for name in archive.namelist()}
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_write_zip(workers, stop_export_pool):
+    jobs = [ExportJob('data/readme.txt', None, data=b'ready'),
+            ExportJob('reports/a.bin', zlib.compress, (b'first',)),
+            ExportJob('reports/a.bin', zlib.compress, (b'second',)),
+            ExportJob('reports/b.bin', zlib.compress, (b'third',))]
+    seen = []
+    out = io.BytesIO()
+
+    written = write_zip(iter(jobs), out, total=len(jobs), workers=workers,
+                        progress=lambda done, total, name: seen.append((done, total)))
+
+    assert written == 4
+    assert seen == [(n, 4) for n in range(1, 5)]
+    files = _files(out)
+    assert files['data/readme.txt'] == b'ready'
+    # Two reports with one name are both kept
+    assert sorted(zlib.decompress(files[name]) for name in ('reports/a.bin', 'reports/a_2.bin')) == [b'first',
+                                                                                                      b'second']
+    assert zlib.decompress(files['reports/b.bin']) == b'third'
+
+
+def test_account_export_writes_every_report(tmp_path):
+    user_id = str(uuid.uuid4())
+    repository = SQLiteRepository(str(tmp_path / 'animoa.db')).for_user(user_id)
+    repository.insert('questionnaire_responses', {'id': str(uuid.uuid4()), 'user_id': user_id,
+                                                  'responses': RESPONSES,
+                                                  'recommendations': 'Take a walk',
+                                                  'created_at': '2024-03-01T10:00:00+00:00'})
+    repository.insert('mood_logs', {'id': str(uuid.uuid4()), 'user_id': user_id, 'date': '2024-03-01',
+                                    'mood': 'happy', 'note': 'Sunny'})
+    session = repository.insert('chat_sessions', {'id': str(uuid.uuid4()), 'user_id': user_id,
+                                                  'title': 'Exams'})[0]
+    repository.insert('chat_history', {'id': str(uuid.uuid4()), 'user_id': user_id, 'session_id': session['id'],
+                                       'message': 'I feel tired', 'sender': 'user',
+                                       'timestamp': '2024-03-01T10:05:00+00:00'})
+    out = io.BytesIO()
+
+    total, jobs = account_export_jobs(repository, user_id)
+    written = write_zip(jobs, out, total=total, workers=1)
+    repository.close()
+
+    assert written == total == 3
+    files = _files(out)
+    assert sorted(name.split('/')[0] for name in files) == ['assessments', 'chats', 'mood']
+    assert all(data.startswith(b'%PDF') for data in files.values())
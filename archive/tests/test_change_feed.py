@@ -0,0 +1,40 @@
+import threading
+
+from change_feed import ChangeFeedHub, PostgresNotifyFeed
+from data_cache import QueryCache
+
+USER = 'user-1'
+
+
+def test_delete_drops_the_matching_reads_in_every_tab():
+    hub = ChangeFeedHub()
+    tabs = [QueryCache(), QueryCache()]
+    for cache in tabs:
+        hub.register(USER, cache)
+        cache.get_or_load('questionnaire_responses', lambda: ['row'], filters={'user_id': USER})
+        cache.get_or_load('mood_logs', lambda: ['log'], filters={'user_id': USER})
+
+    hub.publish(USER, {'table': 'questionnaire_responses', 'type': 'DELETE',
+                       'old_record': {'id': 7, 'user_id': USER}})
+
+    for cache in tabs:
+        assert cache.stats['invalidations'] == 1
+        assert cache.lookup(QueryCache.make_key('mood_logs', filters={'user_id': USER}))[0]
+    assert hub.version(USER, 'questionnaire_responses') == 1
+
+
+def test_notify_feed_reconnects_after_losing_its_connection(monkeypatch):
+    attempts = []
+    reconnected = threading.Event()
+
+    def listen(self):
+        attempts.append(1)
+        if len(attempts) == 3:
+            reconnected.set()
+            threading.Event().wait()  # Stays connected
+        return len(attempts) == 2
+
+    monkeypatch.setattr(PostgresNotifyFeed, '_listen', listen)
+    PostgresNotifyFeed('postgresql://unused', ChangeFeedHub(), retry_delay=0.01)
+
+    assert reconnected.wait(5)
@@ -0,0 +1,33 @@
+import datetime
+import uuid
+
+from chat_archive import archive_inactive_sessions
+from repositories import SQLiteRepository
+
+
+def test_one_failing_session_does_not_stop_the_batch(tmp_path, capsys, monkeypatch):
+    repository = SQLiteRepository(str(tmp_path / 'animoa.db'))
+    old = (datetime.datetime.now() - datetime.timedelta(days=200)).isoformat()
+    user_id = str(uuid.uuid4())
+    sessions = []
+    for i in range(3):
+        session = repository.insert('chat_sessions', {'user_id': user_id, 'title': f'Chat {i}'})[0]
+        repository.insert('chat_history', {'user_id': user_id, 'session_id': session['id'], 'message': 'Hi',
+                                           'sender': 'user', 'timestamp': old})
+        sessions.append(session['id'])
+
+    failing = sessions[1]
+    rpc = SQLiteRepository.rpc
+
+    def flaky_rpc(self, name, params=None):
+        if (params or {}).get('p_session_id') == failing:
+            raise RuntimeError("statement timeout")
+        return rpc(self, name, params)
+
+    monkeypatch.setattr(SQLiteRepository, 'rpc', flaky_rpc)
+    stats = archive_inactive_sessions(repository)
+
+    assert stats == {'sessions': 2, 'messages': 2, 'skipped': 1}
+    assert f"session={failing} failed: statement timeout" in capsys.readouterr().err
+    archived = {row['session_id'] for row in repository.select('chat_archives', 'session_id')}
+    assert archived == set(sessions) - {failing}
@@ -0,0 +1,24 @@
+import time
+
+from data_cache import QueryCache
+
+
+def _load(cache, table, value, ttl=None):
+    return cache.get_or_load(table, lambda: value, filters={'user_id': 'u'}, ttl=ttl)
+
+
+def test_store_past_the_bound_drops_expired_then_least_recently_used():
+    cache = QueryCache(max_entries=3)
+    _load(cache, 'profiles', 'expired', ttl=0.01)
+    _load(cache, 'mood_logs', 'old')
+    _load(cache, 'chat_history', 'used')
+    time.sleep(0.02)
+    _load(cache, 'chat_history', 'reloaded')  # A hit, so mood_logs is now the least recently used
+
+    _load(cache, 'questionnaire_responses', 'new')
+    _load(cache, 'mood_stats', 'newer')
+
+    assert cache.stats['evictions'] == 2
+    assert _load(cache, 'chat_history', 'reloaded') == 'used'
+    assert _load(cache, 'mood_logs', 'reloaded') == 'reloaded'
+    assert 'evictions=' in cache.summary()
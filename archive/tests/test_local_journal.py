@@ -0,0 +1,138 @@
+import datetime
+import json
+import uuid
+
+import pytest
+
+from local_journal import LocalJournal, SyncEngine
+from repositories import SQLiteRepository
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return LocalJournal(str(tmp_path / 'journal'))
+
+
+@pytest.fixture
+def repository(tmp_path):
+    repository = SQLiteRepository(str(tmp_path / 'animoa.db'))
+    yield repository
+    repository.close()
+
+
+USER = str(uuid.uuid4())
+
+
+def _back_date(journal, minutes):
+    """Rewrite the journal as if its entries were recorded `minutes` ago"""
+    path = journal._path(USER)
+    with open(path, encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f]
+    moment = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=minutes)
+    with open(path, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            if 'op' in entry:
+                entry['recorded_at'] = moment.isoformat()
+            f.write(json.dumps(entry) + "\n")
+
+
+def test_sync_stores_sessions_before_their_messages_and_replays_nothing(journal, repository):
+    session = journal.record('chat_sessions', {'id': str(uuid.uuid4()), 'user_id': USER, 'title': 'Offline'})
+    journal.record('chat_history', {'user_id': USER, 'session_id': session['id'], 'message': 'Hi',
+                                    'sender': 'user'})
+    engine = SyncEngine(journal)
+
+    assert engine.sync(repository, USER) == 2
+    assert repository.count('chat_history', filters={'session_id': session['id']}) == 1
+    assert not journal.has_pending(USER)
+    assert engine.sync(repository, USER) == 0
+
+
+def test_refused_row_is_set_aside_and_later_writes_still_sync(journal, repository):
+    # The session was deleted on another device, so the message fails its foreign key every time
+    journal.record('chat_history', {'user_id': USER, 'session_id': str(uuid.uuid4()), 'message': 'Lost',
+                                    'sender': 'user'})
+    journal.record('mood_logs', {'user_id': USER, 'date': '2024-05-01', 'mood': 'happy'})
+    engine = SyncEngine(journal, batch_size=1)
+
+    assert engine.sync(repository, USER) == 2
+    assert USER not in engine.errors
+    assert not journal.has_pending(USER)
+    assert repository.count('mood_logs', filters={'user_id': USER}) == 1
+    rejected = journal.rejected(USER)
+    assert [entry['row']['message'] for entry in rejected] == ['Lost']
+    assert 'FOREIGN KEY' in rejected[0]['error']
+
+    journal.clear_rejected(USER)
+    assert journal.rejected(USER) == []
+
+
+def test_refused_row_in_a_batch_does_not_hold_back_the_others(journal, repository):
+    session = journal.record('chat_sessions', {'id': str(uuid.uuid4()), 'user_id': USER, 'title': 'Chat'})
+    for i, session_id in enumerate([session['id'], str(uuid.uuid4()), session['id']]):
+        journal.record('chat_history', {'user_id': USER, 'session_id': session_id, 'message': f'm{i}',
+                                        'sender': 'user'})
+
+    assert SyncEngine(journal).sync(repository, USER) == 4
+    stored = repository.select('chat_history', 'message', filters={'user_id': USER}, order=[('message', False)])
+    assert [row['message'] for row in stored] == ['m0', 'm2']
+    assert [entry['row']['message'] for entry in journal.rejected(USER)] == ['m1']
+
+
+def test_lost_connection_leaves_entries_pending(journal, repository):
+    journal.record('mood_logs', {'user_id': USER, 'date': '2024-05-01', 'mood': 'happy'})
+
+    class Offline(SQLiteRepository):
+        def upsert(self, table, rows, on_conflict):
+            raise ConnectionError("Network is unreachable")
+
+    offline = Offline(repository.path)
+    engine = SyncEngine(journal)
+    assert engine.sync(offline, USER) == 0
+    assert isinstance(engine.errors[USER], ConnectionError)
+    assert journal.has_pending(USER) and journal.rejected(USER) == []
+
+    assert engine.sync(repository, USER) == 1
+    assert USER not in engine.errors
+
+
+def test_latest_pending_mood_for_a_day_wins(journal, repository):
+    for mood in ('sad', 'neutral', 'happy'):
+        journal.record('mood_logs', {'user_id': USER, 'date': '2024-05-01', 'mood': mood})
+
+    assert SyncEngine(journal).sync(repository, USER) == 3
+    assert [row['mood'] for row in repository.select('mood_logs', 'mood', filters={'user_id': USER})] == ['happy']
+
+
+def test_stale_offline_edit_does_not_overwrite_a_newer_one(journal, repository):
+    # Recorded offline an hour ago; another device has since saved the same day
+    journal.record('mood_logs', {'user_id': USER, 'date': '2024-05-01', 'mood': 'sad'})
+    _back_date(journal, 60)
+    repository.insert('mood_logs', {'user_id': USER, 'date': '2024-05-01', 'mood': 'happy',
+                                    'updated_at': datetime.datetime.now(datetime.timezone.utc).isoformat()})
+
+    assert SyncEngine(journal).sync(repository, USER) == 1
+    assert not journal.has_pending(USER)
+    assert [row['mood'] for row in repository.select('mood_logs', 'mood', filters={'user_id': USER})] == ['happy']
+
+
+def test_newer_offline_edit_replaces_the_stored_one(journal, repository):
+    repository.insert('mood_logs', {'user_id': USER, 'date': '2024-05-01', 'mood': 'happy',
+                                    'updated_at': '2024-05-01T08:00:00+00:00'})
+    journal.record('mood_logs', {'user_id': USER, 'date': '2024-05-01', 'mood': 'sad'})
+
+    assert SyncEngine(journal).sync(repository, USER) == 1
+    stored = repository.select('mood_logs', 'mood, updated_at', filters={'user_id': USER})
+    assert stored[0]['mood'] == 'sad' and stored[0]['updated_at'] > '2024-05-01T08:00:00+00:00'
+
+
+def test_no_sync_runs_while_paused(journal, repository):
+    journal.record('mood_logs', {'user_id': USER, 'date': '2024-05-01', 'mood': 'happy'})
+    engine = SyncEngine(journal)
+
+    with engine.paused(USER):
+        assert engine.sync(repository, USER) == 0
+        journal.discard(USER)
+        repository.for_user(USER).rpc('delete_all_user_data')
+    assert engine.sync(repository, USER) == 0
+    assert repository.count('mood_logs', filters={'user_id': USER}) == 0
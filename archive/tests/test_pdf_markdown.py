@@ -0,0 +1,39 @@
+from hypothesis import given, settings
+from hypothesis import strategies as st
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph
+
+from pdf_markdown import inline_markup
+
+STYLE = getSampleStyleSheet()['Normal']
+
+# Markdown and markup syntax, mixed with arbitrary text so the fragments collide
+_FRAGMENTS = st.sampled_from(['*', '**', '***', '_', '__', '___', '`', '\\', '[', ']', '(', ')', '#', '<', '>',
+                              '&', '"', "'", ' ', '\n', '\t', 'a', 'word', 'snake_case', '&amp;', '<b>', '</i>',
+                              '[link](https://example.com/a_b?x=1&y=2)', '[x](mailto:a@b.c)', '`<code>`'])
+MARKDOWN = st.lists(st.one_of(_FRAGMENTS, st.text(max_size=8)), max_size=40).map(''.join)
+
+
+def _parses(markup):
+    # Paragraph parses its text when constructed and raises ValueError on bad markup
+    Paragraph(markup, STYLE)
+
+
+@settings(max_examples=500, deadline=None)
+@given(MARKDOWN)
+def test_inline_markup_always_parses(text):
+    _parses(inline_markup(text))
+
+
+@given(st.text())
+def test_inline_markup_of_any_text_parses(text):
+    _parses(inline_markup(text))
+
+
+def test_inline_markup_formats_and_escapes():
+    assert inline_markup('**bold** and *it* `a<b`') == (
+        '<b>bold</b> and <i>it</i> <font face="Courier">a&lt;b</font>')
+    assert inline_markup('x < y & **open') == 'x &lt; y &amp; **open'
+    assert inline_markup('my_file_name') == 'my_file_name'
+    assert inline_markup('[site](https://example.com/?a=1&b="2")') == (
+        '<link href="https://example.com/?a=1&amp;b=&quot;2&quot;" color="blue">site</link>')
@@ -0,0 +1,297 @@
+"""
+Behaviour every Repository backend must share, run on SQLite always and on
+Supabase when SUPABASE_TEST_ENV is set (see conftest.py).
+"""
+import uuid
+
+import pytest
+
+from chat_archive import archive_session, hydrate_session, unpack_messages
+from repositories import iter_keyset
+
+
+def _session(repository, user_id, created_at, title='Chat'):
+    return repository.insert('chat_sessions', {'id': str(uuid.uuid4()), 'user_id': user_id, 'title': title,
+                                               'created_at': created_at})[0]
+
+
+def _message(repository, user_id, session_id, text, timestamp, sender='user'):
+    return repository.insert('chat_history', {'user_id': user_id, 'session_id': session_id, 'message': text,
+                                              'sender': sender, 'timestamp': timestamp,
+                                              'client_id': str(uuid.uuid4())})[0]
+
+
+def _rollups(repository, user_id, grain):
+    rows = repository.select('mood_rollups', 'bucket, weekday, mood, count, value_sum',
+                             filters={'user_id': user_id, 'grain': grain})
+    return sorted((str(r['bucket'])[:10], r['weekday'], r['mood'], r['count'], r['value_sum']) for r in rows)
+
+
+def test_select_filters_projection_and_json_columns(backend):
+    repository, user_id = backend
+    responses = {'stress_level': 'High', 'coping': ['walks', 'music']}
+    repository.insert('questionnaire_responses', {'user_id': user_id, 'responses': responses,
+                                                  'recommendations': 'Rest', 'used_chat_history': True,
+                                                  'created_at': '2024-03-01T09:00:00+00:00'})
+    repository.insert('questionnaire_responses', {'user_id': user_id, 'responses': {}, 'used_chat_history': False,
+                                                  'created_at': '2024-03-02T09:00:00+00:00'})
+
+    rows = repository.select('questionnaire_responses', 'responses, used_chat_history',
+                             filters={'user_id': user_id, 'recommendations': 'Rest'})
+    assert rows == [{'responses': responses, 'used_chat_history': True}]
+    assert len(repository.select('questionnaire_responses', 'id', filters={'user_id': user_id,
+                                                                            'recommendations': None})) == 1
+    assert repository.count('questionnaire_responses', filters={'user_id': user_id}) == 2
+
+
+def test_select_ranges_order_limit_and_offset(backend):
+    repository, user_id = backend
+    for day, mood in enumerate(['happy', 'sad', 'neutral', 'happy', 'very_sad'], start=1):
+        repository.insert('mood_logs', {'user_id': user_id, 'date': f'2024-05-0{day}', 'mood': mood})
+
+    dates = [str(r['date'])[:10] for r in repository.select(
+        'mood_logs', 'date', filters={'user_id': user_id}, gte={'date': '2024-05-02'}, lt={'date': '2024-05-05'},
+        order=[('date', True)])]
+    assert dates == ['2024-05-04', '2024-05-03', '2024-05-02']
+
+    page = repository.select('mood_logs', 'date', filters={'user_id': user_id}, order=[('date', False)],
+                             limit=2, offset=1)
+    assert [str(r['date'])[:10] for r in page] == ['2024-05-02', '2024-05-03']
+    assert repository.count('mood_logs', filters={'user_id': user_id}, in_={'mood': ['happy', 'sad']}) == 3
+    assert repository.select('mood_logs', 'id', filters={'user_id': user_id}, in_={'mood': []}) == []
+
+
+def test_keyset_pages_match_one_ordered_read(backend):
+    repository, user_id = backend
+    # Equal created_at values make the id the tie-breaker
+    for created_at in ['2024-01-01T10:00:00+00:00'] * 3 + [f'2024-01-0{d}T10:00:00+00:00' for d in range(2, 9)]:
+        _session(repository, user_id, created_at)
+    newest_first = [r['id'] for r in repository.select(
+        'chat_sessions', 'id', filters={'user_id': user_id}, order=[('created_at', True), ('id', True)])]
+    assert len(newest_first) == 10
+
+    paged, cursor = [], None
+    while True:
+        rows = repository.select('chat_sessions', 'id, created_at', filters={'user_id': user_id},
+                                 order=[('created_at', True), ('id', True)], limit=3, before=cursor)
+        paged.extend(r['id'] for r in rows)
+        if len(rows) < 3:
+            break
+        cursor = (('created_at', rows[-1]['created_at']), ('id', rows[-1]['id']))
+    assert paged == newest_first
+
+    ascending = [r['id'] for r in iter_keyset(repository, 'chat_sessions', 'id, created_at',
+                                              filters={'user_id': user_id}, page_size=4)]
+    assert ascending == newest_first[::-1]
+
+
+def test_keyset_cursor_with_the_smallest_id_pages_from_a_timestamp(backend):
+    # The chat uses (timestamp, nil uuid) for messages it has not read back an id for
+    repository, user_id = backend
+    session = _session(repository, user_id, '2024-01-01T08:00:00+00:00')
+    older = _message(repository, user_id, session['id'], 'Older', '2024-01-01T08:00:00+00:00')
+    _message(repository, user_id, session['id'], 'Same time', '2024-01-01T08:00:05+00:00')
+    rows = repository.select('chat_history', 'id', filters={'session_id': session['id']},
+                             order=[('timestamp', True), ('id', True)],
+                             before=(('timestamp', '2024-01-01T08:00:05+00:00'),
+                                     ('id', '00000000-0000-0000-0000-000000000000')))
+    assert [r['id'] for r in rows] == [older['id']]
+
+
+def test_update_and_delete_report_affected_rows(backend):
+    repository, user_id = backend
+    session = _session(repository, user_id, '2024-02-01T08:00:00+00:00', title='Before')
+    updated = repository.update('chat_sessions', {'title': 'After'}, {'id': session['id']})
+    assert [r['title'] for r in updated] == ['After']
+    assert repository.update('chat_sessions', {'title': 'None'}, {'id': str(uuid.uuid4())}) == []
+    assert repository.delete('chat_sessions', {'id': session['id']}) == 1
+    assert repository.select('chat_sessions', 'id', filters={'user_id': user_id}) == []
+
+
+def test_upsert_updates_on_conflict(backend):
+    repository, user_id = backend
+    repository.upsert('mood_logs', {'user_id': user_id, 'date': '2024-06-01', 'mood': 'sad'},
+                      on_conflict='user_id,date')
+    rows = repository.upsert('mood_logs', [{'user_id': user_id, 'date': '2024-06-01', 'mood': 'happy',
+                                            'note': 'Better'},
+                                           {'user_id': user_id, 'date': '2024-06-02', 'mood': 'neutral'}],
+                             on_conflict='user_id,date')
+    assert len(rows) == 2
+    stored = repository.select('mood_logs', 'date, mood, note', filters={'user_id': user_id},
+                               order=[('date', False)])
+    assert [(str(r['date'])[:10], r['mood'], r['note']) for r in stored] == [
+        ('2024-06-01', 'happy', 'Better'), ('2024-06-02', 'neutral', None)]
+
+    # Replaying a journalled message is a no-op
+    session = _session(repository, user_id, '2024-06-01T08:00:00+00:00')
+    message = {'user_id': user_id, 'session_id': session['id'], 'message': 'Hello', 'sender': 'user',
+               'timestamp': '2024-06-01T08:01:00+00:00', 'client_id': str(uuid.uuid4())}
+    repository.upsert('chat_history', message, on_conflict='client_id')
+    repository.upsert('chat_history', message, on_conflict='client_id')
+    assert repository.count('chat_history', filters={'session_id': session['id']}) == 1
+
+
+def test_delete_chat_session_removes_its_messages(backend):
+    repository, user_id = backend
+    kept = _session(repository, user_id, '2024-07-01T08:00:00+00:00')
+    deleted = _session(repository, user_id, '2024-07-02T08:00:00+00:00')
+    for session in (kept, deleted):
+        _message(repository, user_id, session['id'], 'Hi', '2024-07-02T09:00:00+00:00')
+        _message(repository, user_id, session['id'], 'Hello', '2024-07-02T09:00:01+00:00', sender='bot')
+
+    assert repository.rpc('delete_chat_session', {'p_session_id': deleted['id']}) == 1
+    assert repository.rpc('delete_chat_session', {'p_session_id': str(uuid.uuid4())}) == 0
+    assert [r['id'] for r in repository.select('chat_sessions', 'id', filters={'user_id': user_id})] == [kept['id']]
+    assert repository.count('chat_history', filters={'session_id': deleted['id']}) == 0
+    assert repository.count('chat_history', filters={'session_id': kept['id']}) == 2
+
+
+def test_delete_assessment(backend):
+    repository, user_id = backend
+    first, second = (repository.insert('questionnaire_responses', {'user_id': user_id, 'responses': {'n': n}})[0]
+                     for n in range(2))
+    assert repository.rpc('delete_assessment', {'p_assessment_id': first['id']}) == 1
+    assert repository.rpc('delete_assessment', {'p_assessment_id': first['id']}) == 0
+    assert [r['id'] for r in repository.select('questionnaire_responses', 'id',
+                                               filters={'user_id': user_id})] == [second['id']]
+
+
+def test_delete_all_user_data(backend):
+    repository, user_id = backend
+    session = _session(repository, user_id, '2024-08-01T08:00:00+00:00')
+    _message(repository, user_id, session['id'], 'Hi', '2024-08-01T08:01:00+00:00')
+    repository.insert('mood_logs', {'user_id': user_id, 'date': '2024-08-01', 'mood': 'happy'})
+    repository.insert('questionnaire_responses', {'user_id': user_id, 'responses': {}})
+    repository.insert('user_feedback', {'user_id': user_id, 'rating': 5, 'features_used': ['chat'],
+                                        'anonymous': False})
+
+    counts = repository.rpc('delete_all_user_data')
+    assert counts == {'chat_history': 1, 'chat_sessions': 1, 'mood_logs': 1, 'questionnaire_responses': 1,
+                      'user_feedback': 1, 'profiles': 1}
+    for table, owner in (('profiles', 'id'), ('chat_sessions', 'user_id'), ('chat_history', 'user_id'),
+                         ('mood_logs', 'user_id'), ('questionnaire_responses', 'user_id'),
+                         ('user_feedback', 'user_id'), ('mood_rollups', 'user_id')):
+        assert repository.select(table, '*', filters={owner: user_id}) == [], table
+
+
+def test_archive_and_restore_session(backend):
+    repository, user_id = backend
+    session = _session(repository, user_id, '2024-01-01T08:00:00+00:00')
+    sent = [_message(repository, user_id, session['id'], f'Message {i}', f'2024-01-01T08:00:{i:02d}+00:00',
+                     sender='user' if i % 2 == 0 else 'bot') for i in range(5)]
+
+    # A message newer than the one read makes the archive step back
+    assert repository.rpc('archive_chat_session', {
+        'p_session_id': session['id'], 'p_payload': '', 'p_message_count': 4,
+        'p_last_message_at': sent[3]['timestamp']}) == 0
+    assert repository.count('chat_history', filters={'session_id': session['id']}) == 5
+
+    assert archive_session(repository, session['id']) == 5
+    assert repository.count('chat_history', filters={'session_id': session['id']}) == 0
+    stored = repository.select('chat_sessions', 'archived_at', filters={'id': session['id']})
+    assert stored[0]['archived_at'] is not None
+    assert [r['message_count'] for r in repository.select('chat_archives', 'message_count',
+                                                          filters={'session_id': session['id']})] == [5]
+
+    assert hydrate_session(repository, session['id']) == 5
+    restored = repository.select('chat_history', 'id, message, sender', filters={'session_id': session['id']},
+                                 order=[('timestamp', False), ('id', False)])
+    assert [(r['id'], r['message'], r['sender']) for r in restored] == [
+        (m['id'], m['message'], m['sender']) for m in sent]
+    assert repository.select('chat_sessions', 'archived_at', filters={'id': session['id']}) == [
+        {'archived_at': None}]
+    assert repository.select('chat_archives', 'session_id', filters={'session_id': session['id']}) == []
+
+
+def test_mood_rollups_follow_inserts_updates_and_deletes(backend):
+    repository, user_id = backend
+    # 2024-01-01 is a Monday, weekday 0
+    monday = repository.insert('mood_logs', {'user_id': user_id, 'date': '2024-01-01', 'mood': 'happy'})[0]
+    repository.insert('mood_logs', {'user_id': user_id, 'date': '2024-01-03', 'mood': 'happy'})
+    repository.insert('mood_logs', {'user_id': user_id, 'date': '2024-02-04', 'mood': 'sad'})
+
+    assert _rollups(repository, user_id, 'day') == [
+        ('2024-01-01', 0, 'happy', 1, 4), ('2024-01-03', 2, 'happy', 1, 4), ('2024-02-04', 6, 'sad', 1, 2)]
+    assert _rollups(repository, user_id, 'week') == [
+        ('2024-01-01', -1, 'happy', 2, 8), ('2024-01-29', -1, 'sad', 1, 2)]
+    assert _rollups(repository, user_id, 'month_weekday') == [
+        ('2024-01-01', 0, '', 1, 4), ('2024-01-01', 2, '', 1, 4), ('2024-02-01', 6, '', 1, 2)]
+
+    repository.update('mood_logs', {'mood': 'very_sad'}, {'id': monday['id']})
+    assert _rollups(repository, user_id, 'month') == [
+        ('2024-01-01', -1, 'happy', 1, 4), ('2024-01-01', -1, 'very_sad', 1, 1), ('2024-02-01', -1, 'sad', 1, 2)]
+
+    repository.delete('mood_logs', {'user_id': user_id, 'date': '2024-02-04'})
+    assert _rollups(repository, user_id, 'week') == [
+        ('2024-01-01', -1, 'happy', 1, 4), ('2024-01-01', -1, 'very_sad', 1, 1)]
+
+
+def test_search_returns_own_notes_and_messages_but_not_feedback(backend):
+    repository, user_id = backend
+    session = _session(repository, user_id, '2024-09-01T08:00:00+00:00')
+    said = _message(repository, user_id, session['id'], 'Feeling anxious about exams', '2024-09-01T08:01:00+00:00')
+    _message(repository, user_id, session['id'], 'Anxious thoughts are common', '2024-09-01T08:02:00+00:00',
+             sender='bot')
+    _message(repository, user_id, session['id'], 'anxious rating', '2024-09-01T08:03:00+00:00', sender='feedback')
+    note = repository.insert('mood_logs', {'user_id': user_id, 'date': '2024-09-02', 'mood': 'sad',
+                                           'note': 'Still anxious today'})[0]
+
+    found = repository.rpc('search_user_content', {'p_query': 'anxious', 'p_language': 'en'})
+    assert found['total'] == 3
+    assert [(r['kind'], r['id']) for r in found['results']][::2] == [('mood', note['id']), ('chat', said['id'])]
+    assert all(r['content'] != 'anxious rating' for r in found['results'])
+
+    chats = repository.rpc('search_user_content', {'p_query': 'anxious exams', 'p_kinds': ['chat'], 'p_limit': 1})
+    assert (chats['total'], [r['id'] for r in chats['results']]) == (1, [said['id']])
+
+
+def test_restore_keeps_the_archive_unless_every_message_comes_back(backend):
+    repository, user_id = backend
+    session = _session(repository, user_id, '2024-01-01T08:00:00+00:00')
+    for i in range(3):
+        _message(repository, user_id, session['id'], f'Message {i}', f'2024-01-01T08:00:0{i}+00:00')
+    assert archive_session(repository, session['id']) == 3
+    payload = repository.select('chat_archives', 'payload', filters={'session_id': session['id']})[0]['payload']
+
+    for rows in ([], unpack_messages(payload)[:2]):
+        with pytest.raises(Exception):
+            repository.rpc('restore_chat_session', {'p_session_id': session['id'], 'p_rows': rows})
+        assert repository.select('chat_archives', 'payload', filters={'session_id': session['id']}) == [
+            {'payload': payload}]
+        assert repository.count('chat_history', filters={'session_id': session['id']}) == 0
+
+    assert hydrate_session(repository, session['id']) == 3
+
+
+def test_archive_steps_back_when_the_message_count_changed(backend):
+    repository, user_id = backend
+    session = _session(repository, user_id, '2024-01-01T08:00:00+00:00')
+    for i in range(3):
+        _message(repository, user_id, session['id'], f'Message {i}', f'2024-01-01T08:00:0{i}+00:00')
+
+    # E.g. a message synced late from a journal, older than the last one the job read
+    assert repository.rpc('archive_chat_session', {
+        'p_session_id': session['id'], 'p_payload': '', 'p_message_count': 2,
+        'p_last_message_at': '2024-01-01T08:00:02+00:00'}) == 0
+    assert repository.count('chat_history', filters={'session_id': session['id']}) == 3
+    assert repository.select('chat_archives', 'session_id', filters={'session_id': session['id']}) == []
+
+
+def test_search_drops_rows_deleted_by_id_and_counts_archived_sessions(backend):
+    repository, user_id = backend
+    session = _session(repository, user_id, '2024-09-01T08:00:00+00:00')
+    said = _message(repository, user_id, session['id'], 'Slept badly again', '2024-09-01T08:01:00+00:00')
+    note = repository.insert('mood_logs', {'user_id': user_id, 'date': '2024-09-02', 'mood': 'sad',
+                                           'note': 'Slept four hours'})[0]
+    assert repository.rpc('search_user_content', {'p_query': 'slept'})['total'] == 2
+
+    repository.delete('mood_logs', {'id': note['id']})
+    found = repository.rpc('search_user_content', {'p_query': 'slept'})
+    assert [r['id'] for r in found['results']] == [said['id']]
+    assert found['archived_sessions'] == 0
+
+    assert archive_session(repository, session['id']) == 1
+    found = repository.rpc('search_user_content', {'p_query': 'slept'})
+    assert (found['total'], found['archived_sessions']) == (0, 1)
+    assert repository.rpc('search_user_content', {'p_query': 'slept', 'p_kinds': ['mood']})[
+        'archived_sessions'] == 0
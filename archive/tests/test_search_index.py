@@ -0,0 +1,28 @@
+from search_index import SearchIndex
+
+USER = 'user-1'
+
+
+def _note(id, text, user_id=USER):
+    return {'id': id, 'user_id': user_id, 'note': text, 'date': f'2024-01-{id:02d}'}
+
+
+def test_writes_made_while_an_index_is_built_are_kept():
+    index = SearchIndex()
+    pending = index.start_load(USER)
+    # Written after the rows were read, before the index is installed
+    index.add('mood', _note(2, 'walked by the river'))
+    index.remove('mood', _note(1, ''))
+
+    assert index.load(USER, {'mood': [_note(1, 'river was calm')]}, pending)
+    found = index.search(USER, 'river')
+    assert [r['id'] for r in found['results']] == [2]
+
+
+def test_index_dropped_while_built_is_not_installed():
+    index = SearchIndex()
+    pending = index.start_load(USER)
+    index.forget(USER)
+
+    assert not index.load(USER, {'mood': [_note(1, 'river')]}, pending)
+    assert not index.is_loaded(USER)
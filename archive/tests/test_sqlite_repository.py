@@ -0,0 +1,44 @@
+"""The SQLite stand-ins for the server-side functions act only for the repository's user"""
+import uuid
+
+import pytest
+
+from repositories import SQLiteRepository
+
+
+@pytest.fixture
+def database(tmp_path):
+    database = SQLiteRepository(str(tmp_path / 'animoa.db'))
+    yield database
+    database.close()
+
+
+def _user_with_data(database):
+    user_id = str(uuid.uuid4())
+    repository = database.for_user(user_id)
+    repository.upsert('profiles', {'id': user_id, 'full_name': 'Someone'}, on_conflict='id')
+    session = repository.insert('chat_sessions', {'id': str(uuid.uuid4()), 'user_id': user_id, 'title': 'Chat'})[0]
+    repository.insert('chat_history', {'user_id': user_id, 'session_id': session['id'], 'message': 'Hi',
+                                       'sender': 'user'})
+    assessment = repository.insert('questionnaire_responses', {'user_id': user_id, 'responses': {}})[0]
+    return repository, session, assessment
+
+
+def test_functions_need_a_user(database):
+    with pytest.raises(PermissionError):
+        database.rpc('delete_all_user_data')
+
+
+def test_deletes_leave_other_users_data_alone(database):
+    mine, _, _ = _user_with_data(database)
+    theirs, their_session, their_assessment = _user_with_data(database)
+
+    assert mine.rpc('delete_chat_session', {'p_session_id': their_session['id']}) == 0
+    assert mine.rpc('delete_assessment', {'p_assessment_id': their_assessment['id']}) == 0
+    counts = mine.rpc('delete_all_user_data')
+    assert [counts[table] for table in ('chat_history', 'chat_sessions', 'questionnaire_responses', 'profiles')] == [
+        1, 1, 1, 1]
+
+    assert theirs.count('chat_history', filters={'user_id': theirs.user_id}) == 1
+    assert theirs.count('questionnaire_responses', filters={'user_id': theirs.user_id}) == 1
+    assert theirs.select('profiles', 'id', filters={'id': theirs.user_id}) == [{'id': theirs.user_id}]
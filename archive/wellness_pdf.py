@@ -0,0 +1,210 @@
+import copy
+import datetime
+import os
+import threading
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from pdf_markdown import list_styles, markdown_flowables
+
+# Next to this file, whatever the working directory of the app
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logo.png')
+
+# Answer to readable severity or quality, per assessment table row
+MOOD_SEVERITY = {"Not at all": "None", "Several days": "Mild", "More than half the days": "Moderate",
+                 "Nearly every day": "Severe"}
+SLEEP_QUALITY = {"Very poor": "Very Poor", "Poor": "Poor", "Fair": "Fair", "Good": "Good", "Very good": "Excellent"}
+SUPPORT_LEVEL = {"No support": "None", "Limited support": "Limited", "Moderate support": "Moderate",
+                 "Strong support": "Strong"}
+
+DISCLAIMER = ("Disclaimer: This assessment is generated based on your responses using evidence-based protocols. "
+              "It is not a clinical diagnosis. Animoa AI creates these insights to support your mental wellness "
+              "journey. Please consult with a mental health professional for clinical advice.")
+
+
+class WellnessPdfTemplate:
+    """
+    Everything about the wellness report that does not depend on its content:
+    paragraph styles, the assessment table style and the decoded logo.
+
+    Built once per process (see get_template) and shared by every render; each
+    render only lays out its own paragraphs and table.
+    """
+
+    def __init__(self, logo_path=LOGO_PATH):
+        styles = getSampleStyleSheet()
+        styles['Title'].alignment = TA_CENTER
+        styles['Title'].fontSize = 18
+        styles['Title'].spaceAfter = 12
+        styles.add(ParagraphStyle(name='AnimoaSubtitle', fontName='Helvetica-Bold', fontSize=14,
+                                  alignment=TA_CENTER, spaceAfter=12))
+        styles.add(ParagraphStyle(name='AnimoaSection', fontName='Helvetica-Bold', fontSize=12, spaceAfter=6))
+        styles.add(ParagraphStyle(name='AnimoaNormal', fontName='Helvetica', fontSize=10, spaceAfter=6))
+        self.styles = styles
+        self.markdown_styles = {'title': styles['AnimoaSubtitle'], 'heading': styles['AnimoaSection'],
+                                'body': styles['AnimoaNormal'], 'list': list_styles(styles['AnimoaNormal'])}
+
+        self.table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (2, 0), colors.lightgrey),
+            ('TEXTCOLOR', (0, 0), (2, 0), colors.black),
+            ('ALIGN', (0, 0), (2, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (2, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (2, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (2, 0), 6),
+            ('BACKGROUND', (0, 1), (2, 6), colors.white),
+            ('GRID', (0, 0), (2, 6), 0.5, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (2, -1), 'CENTER'),
+        ])
+        self.column_widths = [2.2 * inch, 2.2 * inch, 1.6 * inch]
+
+        self.journal_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ])
+        self.journal_column_widths = [1.1 * inch, 1.2 * inch, 4.2 * inch]
+
+        # Read and decoded once; renders draw copies sharing the decoded image
+        self.logo = None
+        try:
+            with open(logo_path, 'rb') as f:
+                logo = Image(BytesIO(f.read()))
+            logo.hAlign = 'CENTER'
+            self.logo = logo
+        except Exception as e:
+            print(f"Logo not found: {e}")
+
+    def header(self, title="MENTAL WELLNESS INSIGHTS"):
+        """Logo (or space for it), title and date"""
+        content = []
+        if self.logo is not None:
+            content.append(copy.copy(self.logo))
+            content.append(Spacer(1, 12))
+        else:
+            content.append(Spacer(1, 0.5 * inch))
+        content.append(Paragraph(title, self.styles['Title']))
+        current_date = datetime.datetime.now().strftime("%B %d, %Y")
+        content.append(Paragraph(f"Generated on {current_date}", self.styles['AnimoaSubtitle']))
+        content.append(Spacer(1, 0.25 * inch))
+        return content
+
+    def assessment_table(self, responses):
+        rows = [
+            ["Assessment Area", "Response", "Severity/Quality"],
+            ["Feeling down or depressed", responses["mood"], MOOD_SEVERITY.get(responses["mood"], "-")],
+            ["Little interest or pleasure", responses["interest"], MOOD_SEVERITY.get(responses["interest"], "-")],
+            ["Feeling anxious", responses["anxiety"], MOOD_SEVERITY.get(responses["anxiety"], "-")],
+            ["Uncontrollable worry", responses["worry"], MOOD_SEVERITY.get(responses["worry"], "-")],
+            ["Sleep quality", responses["sleep"], SLEEP_QUALITY.get(responses["sleep"], "-")],
+            ["Social support", responses["support"], SUPPORT_LEVEL.get(responses["support"], "-")]
+        ]
+        table = Table(rows, colWidths=self.column_widths)
+        table.setStyle(self.table_style)
+        return table
+
+    @staticmethod
+    def build(content):
+        """Lay out flowables as a letter-size PDF in a BytesIO, positioned at the start"""
+        buffer = BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72,
+                                topMargin=72, bottomMargin=72)
+        doc.build(content)
+        buffer.seek(0)
+        return buffer
+
+    def render(self, responses, recommendations):
+        """The report as a PDF in a BytesIO, positioned at the start"""
+        styles = self.styles
+
+        content = self.header()
+        content.append(Paragraph("ASSESSMENT SUMMARY", styles['AnimoaSection']))
+        content.append(self.assessment_table(responses))
+        content.append(Spacer(1, 0.1 * inch))
+
+        # Coping strategies can be longer text, so they get their own paragraph; typed by the user, so escaped
+        content.append(Paragraph("Current Coping Strategies:", styles['AnimoaSection']))
+        coping_text = responses["coping"] if responses["coping"] else "No coping strategies provided."
+        content.append(Paragraph(escape(coping_text), styles['AnimoaNormal']))
+        content.append(Spacer(1, 0.2 * inch))
+
+        content.append(Paragraph("PERSONALIZED RECOMMENDATIONS", styles['AnimoaSection']))
+        content.append(Spacer(1, 0.1 * inch))
+        content.extend(markdown_flowables(recommendations, self.markdown_styles))
+
+        content.append(Spacer(1, 0.3 * inch))
+        content.append(Paragraph(DISCLAIMER, styles['AnimoaNormal']))
+        return self.build(content)
+
+    def render_mood_journal(self, logs):
+        """Mood log entries (date, mood, note), oldest first, as one table split across pages"""
+        normal = self.styles['AnimoaNormal']
+        content = self.header("MOOD JOURNAL")
+        if not logs:
+            content.append(Paragraph("No moods logged yet.", normal))
+            return self.build(content)
+        rows = [["Date", "Mood", "Note"]]
+        for log in logs:
+            # Notes are typed by the user and can be long, so they wrap as escaped paragraphs
+            rows.append([str(log['date'])[:10], log.get('mood') or "-",
+                         Paragraph(escape(log.get('note') or ""), normal)])
+        table = Table(rows, colWidths=self.journal_column_widths, repeatRows=1)
+        table.setStyle(self.journal_table_style)
+        content.append(table)
+        return self.build(content)
+
+    def render_transcript(self, title, created_at, messages):
+        """One chat session, oldest message first; Animoa's replies keep their markdown formatting"""
+        styles = self.styles
+        content = self.header(escape(title or "Chat"))
+        content.append(Paragraph(f"Started {escape(str(created_at)[:16].replace('T', ' '))}",
+                                 styles['AnimoaNormal']))
+        for message in messages:
+            speaker = "Animoa" if message.get('sender') == 'bot' else "You"
+            when = str(message.get('timestamp') or '')[:16].replace('T', ' ')
+            content.append(Spacer(1, 6))
+            content.append(Paragraph(f"{speaker} <font color=\"grey\">{escape(when)}</font>",
+                                     styles['AnimoaSection']))
+            text = message.get('message') or ""
+            if speaker == "Animoa":
+                content.extend(markdown_flowables(text, self.markdown_styles))
+            else:
+                content.extend(Paragraph(escape(line), styles['AnimoaNormal'])
+                               for line in text.splitlines() if line.strip())
+        return self.build(content)
+
+
+_template = None
+_template_lock = threading.Lock()
+
+
+def get_template():
+    """The report template, built on first use and then shared by the process"""
+    global _template
+    with _template_lock:
+        if _template is None:
+            _template = WellnessPdfTemplate()
+        return _template
+
+
+def create_wellness_pdf(responses, recommendations):
+    """Create a PDF for wellness insights"""
+    return get_template().render(responses, recommendations)
+
+
+def mood_journal_pdf(logs):
+    return get_template().render_mood_journal(logs)
+
+
+def transcript_pdf(title, created_at, messages):
+    return get_template().render_transcript(title, created_at, messages)